@@ -0,0 +1,82 @@
+import asyncio
+from typing import Any, Dict, Optional
+import openai
+from .guardrails import LatencyMetrics
+from .metrics import IN_FLIGHT
+from .pipeline import WorkflowPipeline, PipelineError, record_outcome, stage
+from . import tracing
+from .usage import BudgetExceededError, collect_usage, summarize
+
+
+class AsyncWorkflowPipeline(WorkflowPipeline):
+    """
+    Asyncio version of WorkflowPipeline.
+
+    LLM generation starts speculatively while the moderation call is in flight
+    and is cancelled if the prompt gets flagged. The generated plan is never
+    used before moderation has passed, so safety semantics are unchanged.
+    """
+    def __init__(self, parser, validator, builder, openai_api_key: str,
+                 client: Optional[openai.AsyncOpenAI] = None):
+        super().__init__(parser, validator, builder, openai_api_key)
+        # SDK retries off: moderation retries go through the validator's endpoint
+        self.client = client or openai.AsyncOpenAI(
+            api_key=openai_api_key, max_retries=0, timeout=validator.moderation_endpoint.policy.timeout,
+        )
+
+    async def arun(self, prompt: str, metrics: Optional[LatencyMetrics] = None) -> Dict[str, Any]:
+        """
+        Turn a prompt into a workflow created in n8n and return the workflow data
+        """
+        metrics = metrics if metrics is not None else LatencyMetrics()
+        with IN_FLIGHT.track_inprogress(mode="async"), record_outcome(), \
+                tracing.span("workflow.run", {"pipeline.mode": "async"}), collect_usage() as calls:
+            workflow = await self._arun(prompt, metrics)
+            workflow["llm_usage"] = summarize(calls)
+            return workflow
+
+    async def _arun(self, prompt: str, metrics: LatencyMetrics) -> Dict[str, Any]:
+        # 1. Pre-moderation (blacklist/length) - local and cheap, no need to overlap
+        with stage("pre_validation", metrics):
+            if not self.validator.validate_input(prompt):
+                raise PipelineError(
+                    "pre_validation",
+                    "Prompt failed safety validation. Please try again with a safer request."
+                )
+
+        # 2 + 3. Moderation API and speculative LLM generation
+        generation = asyncio.create_task(self._generate(prompt, metrics))
+        try:
+            with stage("moderation", metrics):
+                safe = await self.validator.amoderate_prompt(prompt, self.client)
+        except BaseException:
+            await self._cancel(generation)
+            raise
+        if not safe:
+            await self._cancel(generation)
+            raise PipelineError("moderation", "Prompt failed OpenAI moderation. Please try again.")
+
+        try:
+            plan = await generation
+        except BudgetExceededError as e:
+            raise PipelineError("budget", str(e)) from e
+        except Exception as e:
+            raise PipelineError("llm_generation", f"LLM failed to generate a plan: {e}") from e
+
+        # 4 + 5. Post-moderation, build and create workflow (n8n session is blocking)
+        return await asyncio.to_thread(self._build_and_remember, prompt, plan, metrics)
+
+    async def _generate(self, prompt: str, metrics: LatencyMetrics) -> Dict[str, Any]:
+        with stage("llm_generation", metrics):
+            return await self.parser.aparse(prompt)
+
+    @staticmethod
+    async def _cancel(task: asyncio.Task):
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            # Generation result is discarded anyway
+            pass
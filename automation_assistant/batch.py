@@ -0,0 +1,167 @@
+# automation_assistant/batch.py
+
+import argparse
+import asyncio
+import json
+import os
+import time
+from typing import Dict, Iterator, Set, Tuple
+from dotenv import load_dotenv
+from automation_assistant.llm_parser import LLMParser
+from automation_assistant.plan_cache import PlanCache
+from automation_assistant.templates import TemplateEngine
+from automation_assistant.retrieval import ExampleRetriever
+from automation_assistant.guardrails import SafetyValidator, LatencyMetrics
+from automation_assistant.moderation import ModerationClient
+from automation_assistant.workflow_builder import WorkflowBuilder
+from automation_assistant.dedup import DedupIndex
+from automation_assistant.workflow_mirror import WorkflowMirror
+from automation_assistant.async_pipeline import AsyncWorkflowPipeline
+from automation_assistant.pipeline import PipelineError
+from automation_assistant.n8n_session import N8nSessionManager
+from automation_assistant.cookie_cache import CookieCache
+from automation_assistant.metrics_server import start_metrics_server
+from automation_assistant import tracing
+from automation_assistant.usage import BudgetManager
+
+
+def iter_prompts(input_path: str) -> Iterator[Tuple[str, str]]:
+    """
+    Stream (item_id, prompt) pairs from a JSONL file without loading it into memory.
+    Lines may be {"id": ..., "prompt": ...} objects or bare JSON strings; the line
+    number is used as id when none is given.
+    """
+    with open(input_path, encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            item = json.loads(line)
+            if isinstance(item, str):
+                yield str(lineno), item
+            else:
+                yield str(item.get("id", lineno)), item.get("prompt", "")
+
+
+def load_completed(output_path: str, retry_failed: bool = False) -> Set[str]:
+    """
+    Ids already present in the output file, so a crashed run can resume
+    """
+    done = set()
+    if not os.path.exists(output_path):
+        return done
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # Partially written last line from a crash
+                continue
+            if retry_failed and record.get("status") != "ok":
+                continue
+            done.add(str(record["id"]))
+    return done
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+async def run_batch(pipeline, input_path: str, output_path: str,
+                    concurrency: int = 8, retry_failed: bool = False) -> Dict[str, int]:
+    """
+    Run every prompt of input_path through pipeline.arun() with at most
+    `concurrency` prompts in flight, appending one result line per item to output_path.
+    """
+    done = load_completed(output_path, retry_failed)
+    summary = {"ok": 0, "error": 0, "skipped": 0}
+    slots = asyncio.Semaphore(concurrency)
+    tasks = set()
+
+    with open(output_path, "a", encoding="utf-8") as out:
+        if out.tell() > 0 and not _ends_with_newline(output_path):
+            # Terminate a line torn by a crash so the next record starts clean
+            out.write("\n")
+
+        async def process(item_id: str, prompt: str):
+            metrics = LatencyMetrics()
+            started = time.perf_counter()
+            record = {"id": item_id}
+            try:
+                with tracing.request_context() as request_id:
+                    record["request_id"] = request_id
+                    workflow = await pipeline.arun(prompt, metrics)
+                record.update(status="ok", workflow_id=workflow.get("id"), name=workflow.get("name"),
+                              usage=workflow.get("llm_usage"))
+            except PipelineError as e:
+                record.update(status="error", stage=e.stage, error=str(e))
+            except Exception as e:
+                record.update(status="error", stage="unknown", error=str(e))
+            finally:
+                slots.release()
+            record["latency"] = {k: v for k, v in metrics.summary().items() if v is not None}
+            record["total_seconds"] = round(time.perf_counter() - started, 4)
+            # Single event loop thread: whole lines, flushed so a crash loses at most in-flight items
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+            summary[record["status"]] += 1
+
+        for item_id, prompt in iter_prompts(input_path):
+            if item_id in done:
+                summary["skipped"] += 1
+                continue
+            # Backpressure: don't read further ahead than the concurrency limit
+            await slots.acquire()
+            task = asyncio.create_task(process(item_id, prompt))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        if tasks:
+            await asyncio.gather(*tasks)
+
+    return summary
+
+
+def main(argv=None):
+    cli = argparse.ArgumentParser(description="Generate n8n workflows for a JSONL file of prompts")
+    cli.add_argument("input", help="JSONL file with one {\"id\", \"prompt\"} object per line")
+    cli.add_argument("output", help="JSONL file results are appended to (also used to resume)")
+    cli.add_argument("--concurrency", type=int, default=int(os.getenv("BATCH_CONCURRENCY", "8")))
+    cli.add_argument("--retry-failed", action="store_true", help="Re-run items that previously failed")
+    args = cli.parse_args(argv)
+
+    load_dotenv()
+    start_metrics_server()
+    n8n_url = os.getenv("N8N_API_URL")
+    email = os.getenv("N8N_USER_EMAIL")
+    pwd = os.getenv("N8N_USER_PASSWORD")
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not (n8n_url and email and pwd and openai_api_key):
+        print("ERROR: Missing N8N_API_URL, login credentials, or OpenAI API key")
+        return
+
+    session = N8nSessionManager(
+        n8n_url, email, pwd, cookie_cache=CookieCache.from_env(n8n_url, email, pwd)
+    )
+    if not session.connect():
+        print("ERROR: Could not log into n8n in time.")
+        return
+
+    parser = LLMParser(
+        cache=PlanCache.from_env(), budget=BudgetManager.from_env(),
+        templates=TemplateEngine.from_env(), retriever=ExampleRetriever.from_env(),
+    )
+    validator = SafetyValidator(moderation_client=ModerationClient(openai_api_key))
+    builder = WorkflowBuilder(
+        n8n_url, session, dedup=DedupIndex.from_env(), mirror=WorkflowMirror.from_env()
+    )
+    pipeline = AsyncWorkflowPipeline(parser, validator, builder, openai_api_key)
+    summary = asyncio.run(run_batch(pipeline, args.input, args.output, args.concurrency, args.retry_failed))
+    print(f"Batch finished: {summary['ok']} ok, {summary['error']} failed, {summary['skipped']} skipped")
+    return summary
+
+
+if __name__ == "__main__":
+    main()
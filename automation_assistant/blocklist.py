@@ -0,0 +1,138 @@
+import re
+import unicodedata
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+
+class BlocklistMatch(NamedTuple):
+    term: str
+    start: int
+    end: int
+
+
+def load_blocklist(*paths: str) -> List[str]:
+    """
+    Read blocklist files: one term per line, blank lines and '#' comments ignored
+    """
+    terms = []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                term = line.split("#", 1)[0].strip()
+                if term:
+                    terms.append(term)
+    return terms
+
+
+class BlocklistMatcher:
+    """
+    Multi-term matcher compiled once into a single trie-shaped regex.
+
+    Terms sharing a prefix share a regex branch, so matching cost depends on the
+    text length and the alphabet, not on how many terms are in the list.
+    Text and terms are case-folded (and NFKC-normalized when `normalize` is set);
+    with `word_boundary` a term only matches as a whole word. Reported offsets
+    always refer to the original text.
+    """
+    def __init__(self, terms: Iterable[str], word_boundary: bool = False, normalize: bool = True):
+        self.word_boundary = word_boundary
+        self.normalize = normalize
+        self._terms: Dict[str, str] = {}
+        for term in terms:
+            key = self._fold(term)
+            if key:
+                self._terms.setdefault(key, term)
+
+        trie = {}
+        for key in self._terms:
+            node = trie
+            for ch in key:
+                node = node.setdefault(ch, {})
+            node[""] = True
+        body = self._trie_pattern(trie) if self._terms else "(?!)"
+        if word_boundary:
+            body = rf"(?<!\w)(?:{body})(?!\w)"
+        self._regex = re.compile(body)
+
+    def __len__(self) -> int:
+        return len(self._terms)
+
+    def search(self, text: str) -> Optional[BlocklistMatch]:
+        """
+        First match in text, or None
+        """
+        folded, offsets = self._prepare(text)
+        m = self._regex.search(folded)
+        return self._to_match(m, offsets) if m else None
+
+    def find_all(self, text: str) -> List[BlocklistMatch]:
+        """
+        All non-overlapping matches (longest term at each position) with offsets into text
+        """
+        folded, offsets = self._prepare(text)
+        return [self._to_match(m, offsets) for m in self._regex.finditer(folded)]
+
+    @staticmethod
+    def _clusters(text: str):
+        """
+        (start, end) of each base character with the combining marks (and Hangul
+        vowel/final jamo) that follow it; normalization never crosses these edges
+        """
+        i, n = 0, len(text)
+        while i < n:
+            j = i + 1
+            while j < n and (unicodedata.combining(text[j]) or "\u1160" <= text[j] <= "\u11ff"):
+                j += 1
+            yield i, j
+            i = j
+
+    def _fold_piece(self, text: str) -> str:
+        if self.normalize:
+            return unicodedata.normalize("NFKC", text).casefold()
+        return text.lower()
+
+    def _fold(self, text: str) -> str:
+        return self._prepare(text)[0]
+
+    def _prepare(self, text: str):
+        """
+        Folded text plus, unless it maps 1:1, the (start, end) in text of every folded
+        character. Terms are folded the same way, so both sides always agree.
+        """
+        if text.isascii():
+            # NFKC is the identity on ASCII and case folding keeps the length
+            return text.lower(), None
+        parts, offsets = [], []
+        for start, end in self._clusters(text):
+            piece = self._fold_piece(text[start:end])
+            parts.append(piece)
+            offsets.extend([(start, end)] * len(piece))
+        return "".join(parts), offsets
+
+    def _to_match(self, m, offsets) -> BlocklistMatch:
+        start, end = m.span()
+        if offsets is not None:
+            start, end = offsets[start][0], offsets[end - 1][1]
+        return BlocklistMatch(self._terms[m.group(0)], start, end)
+
+    @staticmethod
+    def _trie_pattern(trie: dict) -> str:
+        # Bottom-up with an explicit stack: long terms would otherwise recurse once per character
+        patterns = {}
+        stack = [(trie, False)]
+        while stack:
+            node, ready = stack.pop()
+            children = [(ch, child) for ch, child in sorted(node.items()) if ch != ""]
+            if not ready:
+                stack.append((node, True))
+                stack.extend((child, False) for _, child in children)
+                continue
+            branches = [re.escape(ch) + patterns.pop(id(child)) for ch, child in children]
+            if not branches:
+                patterns[id(node)] = ""
+                continue
+            pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+            if "" in node:
+                # Greedy optional tail: prefer the longest term, fall back to the shorter one
+                pattern = "(?:" + pattern + ")?"
+            patterns[id(node)] = pattern
+        return patterns[id(trie)]
@@ -0,0 +1,95 @@
+import base64
+import hashlib
+import json
+import os
+import time
+from typing import List, Optional
+from cryptography.fernet import Fernet, InvalidToken
+
+DEFAULT_CACHE_PATH = os.path.join("~", ".cache", "automation_assistant", "n8n_cookie")
+# Used when n8n sends a session cookie without an expiry
+DEFAULT_TTL = 3600
+
+
+class CookieCache:
+    """
+    Encrypted on-disk cache of the n8n auth cookie, so new processes can skip /rest/login.
+
+    The file holds a Fernet token whose key is either given explicitly
+    (N8N_COOKIE_CACHE_KEY) or derived with scrypt from the n8n credentials,
+    so only someone who already knows the password can read the cookie.
+    """
+    def __init__(self, path: str, n8n_url: str, email: str, password: str,
+                 key: Optional[str] = None):
+        self.path = os.path.expanduser(path)
+        self.n8n_url = n8n_url
+        self.email = email
+        self.password = password
+        self.key = key
+        # Identifies which instance/account the cached cookie belongs to
+        self.identity = hashlib.sha256(f"{n8n_url}\n{email}".encode()).hexdigest()
+
+    @classmethod
+    def from_env(cls, n8n_url: str, email: str, password: str) -> Optional["CookieCache"]:
+        """
+        Build the cache from N8N_COOKIE_CACHE / N8N_COOKIE_CACHE_KEY; N8N_COOKIE_CACHE=off disables it
+        """
+        path = os.getenv("N8N_COOKIE_CACHE", DEFAULT_CACHE_PATH)
+        if path.lower() in ("", "0", "off", "false"):
+            return None
+        return cls(path, n8n_url, email, password, key=os.getenv("N8N_COOKIE_CACHE_KEY"))
+
+    def load(self) -> Optional[List[dict]]:
+        """
+        Return cached cookies if present, decryptable, for this account and not expired
+        """
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                envelope = json.load(f)
+            if envelope.get("identity") != self.identity:
+                return None
+            fernet = self._fernet(base64.b64decode(envelope["salt"]))
+            entry = json.loads(fernet.decrypt(envelope["token"].encode()))
+        except (OSError, ValueError, KeyError, InvalidToken):
+            return None
+        if entry["expires"] <= time.time():
+            return None
+        return entry["cookies"]
+
+    def save(self, cookies: List[dict]):
+        """
+        Persist cookies (dicts with name/value/domain/path/expires) atomically with 0600 permissions
+        """
+        if not cookies:
+            return
+        now = time.time()
+        expiries = [c["expires"] for c in cookies if c.get("expires")]
+        expires = min(expiries) if expiries else now + DEFAULT_TTL
+        salt = os.urandom(16)
+        token = self._fernet(salt).encrypt(json.dumps({"cookies": cookies, "expires": expires}).encode())
+        envelope = {
+            "identity": self.identity,
+            "salt": base64.b64encode(salt).decode(),
+            "token": token.decode(),
+        }
+
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(envelope, f)
+        os.replace(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _fernet(self, salt: bytes) -> Fernet:
+        if self.key:
+            return Fernet(self.key)
+        derived = hashlib.scrypt(
+            f"{self.email}\n{self.password}".encode(), salt=salt, n=2**14, r=8, p=1, dklen=32
+        )
+        return Fernet(base64.urlsafe_b64encode(derived))
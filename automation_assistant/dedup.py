@@ -0,0 +1,138 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from .metrics import CACHE_REQUESTS
+
+DEFAULT_DEDUP_PATH = os.path.join("~", ".cache", "automation_assistant", "dedup.sqlite")
+# Node fields that don't change what a workflow does
+IGNORED_NODE_FIELDS = ("id", "name", "position", "notes", "notesInFlow", "webhookId")
+# Label refinement rounds; two tell apart identical nodes at different places in the graph
+REFINE_ROUNDS = 2
+
+
+def _digest(value: Any) -> str:
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=list)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _edges(workflow: Dict[str, Any]) -> List[Tuple[str, int, str, int]]:
+    edges = []
+    for source, ports in (workflow.get("connections") or {}).items():
+        for output, targets in enumerate((ports or {}).get("main") or []):
+            for target in targets or []:
+                edges.append((source, output, target["node"], target.get("index", 0)))
+    return edges
+
+
+def canonical_hash(workflow: Dict[str, Any]) -> str:
+    """
+    Content hash of an n8n workflow that ignores node ids, names, positions
+    and order. Nodes start out labelled by their content (type, version,
+    parameters, credentials); each round adds the labels of their inputs and
+    outputs, and connections are hashed by those labels instead of by name.
+    """
+    nodes = workflow.get("nodes") or []
+    labels = {
+        node["name"]: _digest({k: v for k, v in node.items() if k not in IGNORED_NODE_FIELDS})
+        for node in nodes
+    }
+    edges = [e for e in _edges(workflow) if e[0] in labels and e[2] in labels]
+    incoming, outgoing = defaultdict(list), defaultdict(list)
+    for source, output, target, index in edges:
+        outgoing[source].append((output, index, target))
+        incoming[target].append((output, index, source))
+    for _ in range(REFINE_ROUNDS):
+        labels = {
+            name: _digest([
+                label,
+                sorted((o, i, labels[n]) for o, i, n in incoming[name]),
+                sorted((o, i, labels[n]) for o, i, n in outgoing[name]),
+            ])
+            for name, label in labels.items()
+        }
+    return _digest({
+        "nodes": sorted(labels.values()),
+        "edges": sorted((labels[s], o, labels[t], i) for s, o, t, i in edges),
+    })
+
+
+class DedupIndex:
+    """
+    canonical_hash -> n8n workflow id for workflows this process created.
+
+    Lookups hit an in-memory dict; entries are persisted to SQLite (when
+    `path` is set) and loaded back on start.
+    """
+    def __init__(self, path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, str]] = {}
+        self.stats = {"hits": 0, "misses": 0, "stores": 0}
+
+        self._db = None
+        if path:
+            path = os.path.expanduser(path)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS workflows ("
+                "hash TEXT PRIMARY KEY, workflow_id TEXT NOT NULL, name TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS workflows_id ON workflows(workflow_id)")
+            self._db.commit()
+            for key, workflow_id, name in self._db.execute("SELECT hash, workflow_id, name FROM workflows"):
+                self._entries[key] = {"id": workflow_id, "name": name}
+
+    @classmethod
+    def from_env(cls) -> Optional["DedupIndex"]:
+        """
+        WORKFLOW_DEDUP_PATH (off disables deduplication, memory keeps it in-process)
+        """
+        path = os.getenv("WORKFLOW_DEDUP_PATH", DEFAULT_DEDUP_PATH)
+        if path.lower() in ("", "0", "off", "false"):
+            return None
+        if path.lower() == "memory":
+            path = None
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, str]]:
+        """
+        {"id", "name"} of the workflow created for this hash, if any
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            self.stats["hits" if entry else "misses"] += 1
+        CACHE_REQUESTS.inc(cache="dedup", result="hit" if entry else "miss")
+        return dict(entry) if entry else None
+
+    def put(self, key: str, workflow_id: str, name: str = ""):
+        workflow_id = str(workflow_id)
+        with self._lock:
+            self._entries[key] = {"id": workflow_id, "name": name}
+            self.stats["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO workflows (hash, workflow_id, name, created) VALUES (?, ?, ?, ?)",
+                    (key, workflow_id, name, time.time()),
+                )
+                self._db.commit()
+
+    def forget(self, workflow_id: str):
+        """
+        Drop entries pointing at a workflow that was edited or deleted in n8n
+        """
+        workflow_id = str(workflow_id)
+        with self._lock:
+            for key in [k for k, entry in self._entries.items() if entry["id"] == workflow_id]:
+                del self._entries[key]
+            if self._db is not None:
+                self._db.execute("DELETE FROM workflows WHERE workflow_id = ?", (workflow_id,))
+                self._db.commit()
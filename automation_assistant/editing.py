@@ -0,0 +1,242 @@
+import json
+import re
+import uuid
+from typing import Any, Dict, List, Optional
+from .node_registry import NODES, thaw
+from .normalize import normalize_node
+from .graph import GraphError, WorkflowGraph
+from .layout import X_GAP, Y_GAP, layered_layout
+from .workflow_builder import WorkflowBuilder
+
+PATCH_OPS = ("add", "remove", "replace", "move", "copy", "test")
+# Parameter values longer than this are cut in the summary sent to the LLM
+MAX_SUMMARY_VALUE = 120
+# "modify workflow <id>: <instruction>" (CLI and batch prompts)
+MODIFY_RE = re.compile(r"^\s*modify\s+workflow\s+([\w-]+)\s*[:,-]?\s*(.*)$", re.I | re.S)
+
+
+class PatchError(ValueError):
+    """
+    Raised when a JSON Patch is malformed or can't be applied to the workflow
+    """
+
+
+def _parse_pointer(path: str) -> List[str]:
+    """
+    RFC 6901 JSON Pointer -> reference tokens
+    """
+    if path == "":
+        return []
+    if not isinstance(path, str) or not path.startswith("/"):
+        raise PatchError(f"Invalid JSON Pointer: {path!r}")
+    return [token.replace("~1", "/").replace("~0", "~") for token in path[1:].split("/")]
+
+
+def _array_index(container: list, token: str, allow_end: bool) -> int:
+    if token == "-" and allow_end:
+        return len(container)
+    if not token.isdigit() or (len(token) > 1 and token.startswith("0")):
+        raise PatchError(f"Invalid array index: {token!r}")
+    index = int(token)
+    if index > len(container) or (index == len(container) and not allow_end):
+        raise PatchError(f"Array index out of range: {index}")
+    return index
+
+
+def _resolve(doc: Any, tokens: List[str]) -> Any:
+    for token in tokens:
+        if isinstance(doc, dict):
+            if token not in doc:
+                raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+            doc = doc[token]
+        elif isinstance(doc, list):
+            doc = doc[_array_index(doc, token, allow_end=False)]
+        else:
+            raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+    return doc
+
+
+def _add(doc: Any, tokens: List[str], value: Any) -> Any:
+    if not tokens:
+        return value
+    parent = _resolve(doc, tokens[:-1])
+    if isinstance(parent, dict):
+        parent[tokens[-1]] = value
+    elif isinstance(parent, list):
+        parent.insert(_array_index(parent, tokens[-1], allow_end=True), value)
+    else:
+        raise PatchError(f"Cannot add to a scalar at /{'/'.join(tokens[:-1])}")
+    return doc
+
+
+def _remove(doc: Any, tokens: List[str]) -> Any:
+    if not tokens:
+        raise PatchError("Cannot remove the whole document")
+    parent = _resolve(doc, tokens[:-1])
+    if isinstance(parent, dict):
+        if tokens[-1] not in parent:
+            raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+        return parent.pop(tokens[-1])
+    if isinstance(parent, list):
+        return parent.pop(_array_index(parent, tokens[-1], allow_end=False))
+    raise PatchError(f"Path not found: /{'/'.join(tokens)}")
+
+
+def apply_patch(doc: Any, patch: List[Dict[str, Any]]) -> Any:
+    """
+    Apply an RFC 6902 JSON Patch and return the patched copy. The input is
+    never modified, so a failing operation leaves nothing half-applied.
+    """
+    doc = thaw(doc)
+    for i, op in enumerate(patch):
+        if not isinstance(op, dict) or op.get("op") not in PATCH_OPS or "path" not in op:
+            raise PatchError(f"Operation {i} is not a valid JSON Patch operation: {op!r}")
+        tokens = _parse_pointer(op["path"])
+        kind = op["op"]
+        if kind in ("add", "replace", "test") and "value" not in op:
+            raise PatchError(f"Operation {i} ({kind}) needs a value")
+        if kind == "add":
+            doc = _add(doc, tokens, thaw(op["value"]))
+        elif kind == "remove":
+            _remove(doc, tokens)
+        elif kind == "replace":
+            _resolve(doc, tokens)
+            if tokens:
+                _remove(doc, tokens)
+            doc = _add(doc, tokens, thaw(op["value"]))
+        elif kind == "test":
+            if _resolve(doc, tokens) != op["value"]:
+                raise PatchError(f"Test failed at {op['path']}")
+        else:
+            source = _parse_pointer(op.get("from"))
+            if kind == "move":
+                if tokens[:len(source)] == source and tokens != source:
+                    raise PatchError(f"Cannot move {op['from']} into itself")
+                value = _remove(doc, source)
+            else:
+                value = thaw(_resolve(doc, source))
+            doc = _add(doc, tokens, value)
+    return doc
+
+
+def parse_patch(content: str) -> List[Dict[str, Any]]:
+    """
+    Patch operations from an LLM reply: {"patch": [...]} or a bare list
+    """
+    try:
+        data = json.loads(content)
+    except json.JSONDecodeError as e:
+        raise PatchError(f"Invalid JSON from LLM: {e}") from e
+    if isinstance(data, dict):
+        data = data.get("patch", data.get("operations"))
+    if not isinstance(data, list):
+        raise PatchError("LLM reply contains no list of patch operations")
+    return data
+
+
+def _compact(value: Any) -> str:
+    text = json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return text if len(text) <= MAX_SUMMARY_VALUE else text[:MAX_SUMMARY_VALUE] + "…"
+
+
+def summarize_workflow(workflow: Dict[str, Any]) -> str:
+    """
+    Compact description of a workflow for edit prompts: one line per node with
+    its array index (for patch paths) and only the parameters that differ from
+    the registry defaults. Credentials, positions and ids are left out.
+    """
+    lines = [f"Workflow {json.dumps(workflow.get('name', ''), ensure_ascii=False)}", "Nodes (index name type parameters):"]
+    for idx, node in enumerate(workflow.get("nodes") or []):
+        node_type = node.get("type", "")
+        defaults = NODES.defaults(node_type, node.get("typeVersion"))
+        params = node.get("parameters") or {}
+        changed = {k: v for k, v in params.items() if k not in defaults or thaw(defaults[k]) != v}
+        shown = " ".join(f"{k}={_compact(v)}" for k, v in changed.items())
+        omitted = len(params) - len(changed)
+        if omitted:
+            shown += f" (+{omitted} defaults)"
+        lines.append(f"{idx} {json.dumps(node.get('name'), ensure_ascii=False)} {node_type} {shown}".rstrip())
+    lines.append("Connections (source -> output: targets):")
+    for source, outputs in (workflow.get("connections") or {}).items():
+        for output, targets in enumerate(outputs.get("main") or []):
+            names = ", ".join(json.dumps(t.get("node"), ensure_ascii=False) for t in targets or [])
+            if names:
+                lines.append(f"{json.dumps(source, ensure_ascii=False)} -> {output}: {names}")
+    return "\n".join(lines)
+
+
+def complete_new_nodes(workflow: Dict[str, Any], previous_ids, validator=None) -> List[str]:
+    """
+    Fill in nodes a patch added (defaults, credentials, id, position) in place,
+    leaving existing nodes, with their real credentials, untouched. Nodes are
+    matched by id, so renaming an existing node doesn't make it new. Returns
+    the new node names.
+    """
+    nodes = workflow.get("nodes")
+    if not isinstance(nodes, list) or not all(isinstance(n, dict) for n in nodes):
+        raise PatchError("Patched workflow has no valid node list")
+    added = []
+    for idx, node in enumerate(nodes):
+        if node.get("id") is not None and node["id"] in previous_ids:
+            continue
+        node.setdefault("id", str(uuid.uuid4()))
+        normalize_node(node, idx)
+        if validator is not None and not validator.validate_node(node):
+            raise PatchError(f"New node '{node.get('name')}' failed validation")
+        nodes[idx] = WorkflowBuilder._n8n_node({**node, "position": node.get("position")})
+        added.append(node["name"])
+
+    if added:
+        _place_new_nodes(nodes, workflow.get("connections"))
+    return added
+
+
+def _place_new_nodes(nodes: List[Dict[str, Any]], connections) -> None:
+    """
+    Position unplaced nodes one column right of their furthest placed input,
+    so the existing canvas is left as the user arranged it. Nodes without a
+    placed input fall back to their auto-layout position.
+    """
+    try:
+        graph = WorkflowGraph.from_plan(nodes, connections)
+    except GraphError as e:
+        raise PatchError(str(e)) from e
+    layout = layered_layout(graph)
+    preds: Dict[str, List[str]] = {name: [] for name in layout}
+    for edge in graph.edges():
+        preds[edge.target].append(edge.source)
+    by_name = {node["name"]: node for node in nodes}
+    occupied = {tuple(node["position"]) for node in nodes if node.get("position")}
+    for name in sorted((n["name"] for n in nodes if not n.get("position")), key=lambda n: layout[n][0]):
+        placed = [by_name[p]["position"] for p in preds[name] if by_name[p].get("position")]
+        if placed:
+            x, y = max(placed)
+            position = [x + X_GAP, y]
+        else:
+            position = list(layout[name])
+        while tuple(position) in occupied:
+            position[1] += Y_GAP
+        occupied.add(tuple(position))
+        by_name[name]["position"] = position
+
+
+def apply_edit(workflow: Dict[str, Any], patch: List[Dict[str, Any]], validator=None) -> Dict[str, Any]:
+    """
+    Patched copy of an n8n workflow with any added nodes completed
+    """
+    previous_ids = {node["id"] for node in workflow.get("nodes") or [] if node.get("id") is not None}
+    updated = apply_patch(workflow, patch)
+    if not isinstance(updated, dict):
+        raise PatchError("Patch replaced the workflow with a non-object")
+    complete_new_nodes(updated, previous_ids, validator)
+    return updated
+
+
+def parse_modify_request(prompt: str) -> Optional[Dict[str, str]]:
+    """
+    {"workflow_id", "instruction"} for "modify workflow <id>: <instruction>", else None
+    """
+    match = MODIFY_RE.match(prompt or "")
+    if match is None:
+        return None
+    return {"workflow_id": match.group(1), "instruction": match.group(2).strip()}
@@ -0,0 +1,224 @@
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional
+from .node_registry import NODES
+
+
+class GraphError(ValueError):
+    """
+    Invalid workflow graph (duplicate node names, cycles, unreachable nodes, bad ports)
+    """
+
+
+class Edge(NamedTuple):
+    source: str
+    output: int
+    target: str
+    input: int = 0
+
+
+class WorkflowGraph:
+    """
+    Directed graph of workflow nodes keyed by node name (ids resolve to names).
+
+    Edges leave a numbered output port, so IF nodes can route their true (0)
+    and false (1) branches separately. Every lookup is a dict access and every
+    walk is O(nodes + edges), so building and validating stay linear for
+    workflows with thousands of nodes.
+    """
+    def __init__(self, nodes: Iterable[Dict[str, Any]] = ()):
+        self._nodes: Dict[str, Dict[str, Any]] = {}
+        self._ids: Dict[str, str] = {}
+        self._out: Dict[str, List[Edge]] = {}
+        self._in_degree: Dict[str, int] = {}
+        self._edges = set()
+        for node in nodes:
+            self.add_node(node)
+
+    @classmethod
+    def from_plan(cls, nodes: Iterable[Dict[str, Any]], connections: Optional[Dict[str, Any]]) -> "WorkflowGraph":
+        """
+        Build from a plan's nodes and connections. Accepted connection shapes per
+        source node (by name or id):
+          n8n:    {"main": [[{"node": "B", "type": "main", "index": 0}], [...output 1...]]}
+          ports:  {"true": ["B"], "false": ["C"]}  (output names from the node spec)
+          list:   ["B", "C"]  (all from output 0)
+        References to unknown nodes are skipped.
+        """
+        graph = cls(nodes)
+        for source_ref, targets in (connections or {}).items():
+            source = graph.resolve(source_ref)
+            if source is None:
+                continue
+            for output, port_targets in graph._ports(source, targets):
+                for target in port_targets:
+                    if isinstance(target, dict):
+                        target_name, target_input = graph.resolve(target.get("node")), target.get("index", 0)
+                    else:
+                        target_name, target_input = graph.resolve(target), 0
+                    if target_name is not None:
+                        graph.connect(source, target_name, output, target_input or 0)
+        return graph
+
+    def _ports(self, source: str, targets: Any) -> Iterator:
+        if isinstance(targets, dict):
+            if "main" in targets:
+                for output, port_targets in enumerate(targets["main"] or []):
+                    yield output, port_targets or []
+                return
+            outputs = self.outputs(source) or ()
+            for port, port_targets in targets.items():
+                if port in outputs:
+                    yield outputs.index(port), port_targets if isinstance(port_targets, list) else [port_targets]
+        elif isinstance(targets, list):
+            yield 0, targets
+        elif isinstance(targets, str):
+            yield 0, [targets]
+
+    def __len__(self) -> int:
+        return len(self._nodes)
+
+    def __contains__(self, ref: str) -> bool:
+        return self.resolve(ref) is not None
+
+    def add_node(self, node: Dict[str, Any]):
+        name = node["name"]
+        if name in self._nodes:
+            raise GraphError(f"Duplicate node name: {name}")
+        self._nodes[name] = node
+        if node.get("id") is not None:
+            self._ids.setdefault(node["id"], name)
+        self._out[name] = []
+        self._in_degree[name] = 0
+
+    def resolve(self, ref: Any) -> Optional[str]:
+        """
+        Node name for a name or id, None if unknown
+        """
+        if not isinstance(ref, str):
+            return None
+        if ref in self._nodes:
+            return ref
+        return self._ids.get(ref)
+
+    def names(self) -> List[str]:
+        """
+        Node names in insertion (plan) order
+        """
+        return list(self._nodes)
+
+    def node(self, ref: str) -> Dict[str, Any]:
+        return self._nodes[self.resolve(ref)]
+
+    def outputs(self, ref: str) -> Optional[tuple]:
+        """
+        Output port names from the node spec, None for node types the registry doesn't know
+        """
+        node = self.node(ref)
+        spec = NODES.get(node.get("type"))
+        return spec.version(node.get("typeVersion")).outputs if spec else None
+
+    def connect(self, source: str, target: str, output: int = 0, input: int = 0):
+        edge = Edge(self.resolve(source), output, self.resolve(target), input)
+        if edge.source is None or edge.target is None:
+            raise GraphError(f"Connection references non-existent node: {source if edge.source is None else target}")
+        if edge in self._edges:
+            return
+        self._edges.add(edge)
+        self._out[edge.source].append(edge)
+        self._in_degree[edge.target] += 1
+
+    def edges(self) -> Iterator[Edge]:
+        for out in self._out.values():
+            yield from out
+
+    def successors(self, ref: str) -> List[str]:
+        return [edge.target for edge in self._out[self.resolve(ref)]]
+
+    def roots(self) -> List[str]:
+        """
+        Trigger nodes, or every node without incoming edges if there is no trigger
+        """
+        triggers = [name for name, node in self._nodes.items() if _is_trigger(node)]
+        return triggers or [name for name, degree in self._in_degree.items() if degree == 0]
+
+    def topological_order(self) -> List[str]:
+        """
+        Kahn's algorithm; raises GraphError naming the nodes left in cycles
+        """
+        in_degree = dict(self._in_degree)
+        queue = deque(name for name, degree in in_degree.items() if degree == 0)
+        order = []
+        while queue:
+            name = queue.popleft()
+            order.append(name)
+            for edge in self._out[name]:
+                in_degree[edge.target] -= 1
+                if in_degree[edge.target] == 0:
+                    queue.append(edge.target)
+        if len(order) < len(self._nodes):
+            cyclic = [name for name, degree in in_degree.items() if degree > 0]
+            raise GraphError(f"Workflow contains a cycle (nodes in or after it: {', '.join(cyclic)})")
+        return order
+
+    def orphans(self) -> List[str]:
+        """
+        Nodes no root reaches, plus nodes without any connection in a multi-node
+        workflow, in plan order
+        """
+        isolated = set()
+        if len(self._nodes) > 1:
+            isolated = {name for name, out in self._out.items() if not out and not self._in_degree[name]}
+        seen = set()
+        queue = deque(self.roots())
+        seen.update(queue)
+        while queue:
+            for edge in self._out[queue.popleft()]:
+                if edge.target not in seen:
+                    seen.add(edge.target)
+                    queue.append(edge.target)
+        return [name for name in self._nodes if name not in seen or name in isolated]
+
+    def errors(self) -> List[str]:
+        """
+        Every structural problem: cycles, unreachable nodes and unknown output ports
+        """
+        errors = []
+        try:
+            self.topological_order()
+        except GraphError as e:
+            errors.append(str(e))
+        orphans = self.orphans()
+        if orphans:
+            errors.append(f"Nodes not reachable from the workflow's start: {', '.join(orphans)}")
+        for name, out in self._out.items():
+            outputs = self.outputs(name) if out else None
+            if outputs is None:
+                continue
+            for edge in out:
+                if edge.output >= len(outputs):
+                    errors.append(f"Node '{name}' has no output {edge.output} (outputs: {', '.join(outputs)})")
+        return errors
+
+    def validate(self):
+        errors = self.errors()
+        if errors:
+            raise GraphError("; ".join(errors))
+
+    def to_connections(self) -> Dict[str, Any]:
+        """
+        n8n `connections` JSON: one list of targets per output port
+        """
+        connections = {}
+        for name, out in self._out.items():
+            if not out:
+                continue
+            ports = [[] for _ in range(max(edge.output for edge in out) + 1)]
+            for edge in out:
+                ports[edge.output].append({"node": edge.target, "type": "main", "index": edge.input})
+            connections[name] = {"main": ports}
+        return connections
+
+
+def _is_trigger(node: Dict[str, Any]) -> bool:
+    spec = NODES.get(node.get("type"))
+    return spec is not None and spec.trigger
@@ -1,7 +1,14 @@
+import os
 import requests
 import time
-from jsonschema import validate, ValidationError
-from .prompts import COMPLETE_PARAMS
+from typing import List
+from jsonschema.validators import validator_for
+from .node_registry import NODES
+from .blocklist import BlocklistMatcher, load_blocklist
+from .metrics import REGISTRY, STAGE_LATENCY
+from .moderation import MODERATION_URL, moderation_endpoint
+
+DEFAULT_BLACKLIST = {"delete", "shutdown", "format", "rm -rf", "destroy"}
 
 PLAN_SCHEMA = {
     "type": "object",
@@ -49,10 +56,154 @@ PLAN_SCHEMA = {
 }
 
 
+# Checked and compiled once at import instead of on every validate() call
+PLAN_VALIDATOR = validator_for(PLAN_SCHEMA)(PLAN_SCHEMA)
+PLAN_VALIDATOR.check_schema(PLAN_SCHEMA)
+
+
+def schema_errors(plan) -> List[str]:
+    """
+    Every PLAN_SCHEMA violation, using the precompiled jsonschema validator
+    """
+    errors = []
+    for error in PLAN_VALIDATOR.iter_errors(plan):
+        path = "/".join(str(p) for p in error.absolute_path) or "<plan>"
+        errors.append(f"{path}: {error.message}")
+    return errors
+
+
+def plan_errors(plan, fast: bool = True) -> List[str]:
+    """
+    Every problem with a plan: PLAN_SCHEMA violations plus missing required node parameters.
+
+    fast=True uses the hand-rolled structural checker (single pass, no jsonschema
+    machinery); fast=False uses the precompiled jsonschema validator. Both agree
+    on which plans are valid (see tests/test_plan_validation.py).
+    """
+    if fast:
+        return structural_errors(plan)
+    errors = schema_errors(plan)
+    nodes = plan.get("nodes") if isinstance(plan, dict) else None
+    if isinstance(nodes, list):
+        for idx, node in enumerate(nodes):
+            if isinstance(node, dict) and isinstance(node.get("type"), str):
+                _missing_param_errors(node, f"nodes/{idx}", errors)
+    return errors
+
+
+def structural_errors(plan) -> List[str]:
+    """
+    Hand-rolled equivalent of PLAN_SCHEMA with required-parameter checks in the same pass
+    """
+    if not isinstance(plan, dict):
+        return ["<plan>: must be an object"]
+    errors = []
+    for key in plan:
+        if key not in ("nodes", "connections"):
+            errors.append(f"<plan>: additional property '{key}' is not allowed")
+
+    if "nodes" not in plan:
+        errors.append("<plan>: 'nodes' is a required property")
+    else:
+        nodes = plan["nodes"]
+        if not isinstance(nodes, list):
+            errors.append("nodes: must be an array")
+        elif not nodes:
+            errors.append("nodes: must contain at least one node")
+        else:
+            for idx, node in enumerate(nodes):
+                _node_errors(node, f"nodes/{idx}", errors)
+
+    if "connections" not in plan:
+        errors.append("<plan>: 'connections' is a required property")
+    else:
+        connections = plan["connections"]
+        if not isinstance(connections, dict):
+            errors.append("connections: must be an object")
+        else:
+            for source, conn in connections.items():
+                _connection_errors(conn, f"connections/{source}", errors)
+    return errors
+
+
+def _node_errors(node, path: str, errors: List[str]):
+    if not isinstance(node, dict):
+        errors.append(f"{path}: must be an object")
+        return
+    type_ok = True
+    for key in ("id", "type"):
+        if key not in node:
+            errors.append(f"{path}: '{key}' is a required property")
+            type_ok = type_ok and key != "type"
+        elif not isinstance(node[key], str):
+            errors.append(f"{path}/{key}: must be a string")
+            type_ok = type_ok and key != "type"
+    if "parameters" in node and not isinstance(node["parameters"], dict):
+        errors.append(f"{path}/parameters: must be an object")
+    elif type_ok:
+        _missing_param_errors(node, path, errors)
+
+
+def _missing_param_errors(node: dict, path: str, errors: List[str]):
+    params = node.get("parameters", {})
+    if not isinstance(params, dict):
+        return
+    for key in NODES.defaults(node["type"], node.get("typeVersion")):
+        if key not in params:
+            errors.append(f"{path}: node '{node.get('id')}' missing parameter '{key}'")
+
+
+def _connection_errors(conn, path: str, errors: List[str]):
+    if not isinstance(conn, dict):
+        errors.append(f"{path}: must be an object")
+        return
+    if "main" not in conn:
+        errors.append(f"{path}: 'main' is a required property")
+        return
+    outputs = conn["main"]
+    if not isinstance(outputs, list):
+        errors.append(f"{path}/main: must be an array")
+        return
+    for out_idx, targets in enumerate(outputs):
+        if not isinstance(targets, list):
+            errors.append(f"{path}/main/{out_idx}: must be an array")
+            continue
+        for t_idx, target in enumerate(targets):
+            t_path = f"{path}/main/{out_idx}/{t_idx}"
+            if not isinstance(target, dict):
+                errors.append(f"{t_path}: must be an object")
+                continue
+            for key in ("node", "type"):
+                if key not in target:
+                    errors.append(f"{t_path}: '{key}' is a required property")
+                elif not isinstance(target[key], str):
+                    errors.append(f"{t_path}/{key}: must be a string")
+            if "index" not in target:
+                errors.append(f"{t_path}: 'index' is a required property")
+            elif not isinstance(target["index"], (int, float)) or isinstance(target["index"], bool):
+                errors.append(f"{t_path}/index: must be a number")
+
+
 class SafetyValidator:
-    def __init__(self):
-        self.blacklist = {"delete", "shutdown", "format", "rm -rf", "destroy"}
+    def __init__(self, moderation_client=None, blocklist_files=None, word_boundary=None,
+                 fast_plan_check=True):
+        self.blacklist = set(DEFAULT_BLACKLIST)
+        # Extra terms from files, e.g. BLOCKLIST_FILES=/etc/aa/compliance.txt:/etc/aa/local.txt
+        if blocklist_files is None:
+            blocklist_files = [p for p in os.getenv("BLOCKLIST_FILES", "").split(os.pathsep) if p]
+        if blocklist_files:
+            self.blacklist.update(load_blocklist(*blocklist_files))
+        if word_boundary is None:
+            word_boundary = os.getenv("BLOCKLIST_WORD_BOUNDARY", "").lower() in ("1", "true", "yes")
+        # Compiled once; rebuild via SafetyValidator(...) if the list changes
+        self.blocklist_matcher = BlocklistMatcher(self.blacklist, word_boundary=word_boundary)
         self.max_prompt_length = 1000
+        # Hand-rolled plan checker instead of jsonschema (same verdicts, one pass)
+        self.fast_plan_check = fast_plan_check
+        # Optional batching/caching ModerationClient shared across requests
+        self.moderation_client = moderation_client
+        # Retries and circuit breaker for moderation calls made without the client
+        self.moderation_endpoint = moderation_client.endpoint if moderation_client is not None else moderation_endpoint()
 
     def validate_input(self, prompt: str) -> bool:
         if not isinstance(prompt, str):
@@ -60,40 +211,62 @@ class SafetyValidator:
         if len(prompt) > self.max_prompt_length:
             print("Validation error: Prompt too long")
             return False
-        prompt_lower = prompt.lower()
-        for bad_word in self.blacklist:
-            if bad_word in prompt_lower:
-                print(f"Validation error: Forbidden keyword '{bad_word}'")
-                return False
+        match = self.blocklist_matcher.search(prompt)
+        if match:
+            print(f"Validation error: Forbidden keyword '{match.term}'")
+            return False
         return True
 
+    def find_forbidden(self, prompt: str) -> list:
+        """
+        Every blocklist match in the prompt as (term, start, end)
+        """
+        return self.blocklist_matcher.find_all(prompt)
+
     def validate_plan(self, plan: dict) -> bool:
-        # JSON Schema check
-        try:
-            validate(instance=plan, schema=PLAN_SCHEMA)
-        except ValidationError as ve:
-            print("Schema validation error:", ve)
-            return False
-        # Required parameters
-        for node in plan.get("nodes", []):
-            params_required = COMPLETE_PARAMS.get(node["type"], {})
-            for key in params_required:
-                if key not in node.get("parameters", {}):
-                    print(f"Validation error: node '{node['id']}' missing parameter '{key}'")
-                    return False
-        return True
+        errors = self.plan_errors(plan)
+        for error in errors:
+            print("Validation error:", error)
+        return not errors
+
+    def plan_errors(self, plan: dict) -> List[str]:
+        """
+        Every schema violation and missing required parameter, not just the first
+        """
+        return plan_errors(plan, fast=self.fast_plan_check)
+
+    def validate_node(self, node: dict) -> bool:
+        """
+        Per-node subset of validate_plan(), usable while a plan is still streaming in
+        """
+        errors = []
+        _node_errors(node, f"node '{node.get('id')}'", errors)
+        for error in errors:
+            print("Validation error:", error)
+        return not errors
 
     def moderate_prompt(self, prompt: str, openai_api_key: str) -> bool:
         """
         Use OpenAI Moderation API to check for unsafe or restricted content in the prompt.
         Returns True if safe, False if flagged.
         """
+        if self.moderation_client is not None:
+            try:
+                safe = self.moderation_client.check(prompt)
+            except Exception as e:
+                print(f"Moderation API call failed: {e}")
+                # If API fails, block by default for safety
+                return False
+            if not safe:
+                print("Moderation: Prompt flagged as unsafe by OpenAI API")
+            return safe
         try:
-            resp = requests.post(
-                "https://api.openai.com/v1/moderations",
+            resp = self.moderation_endpoint.call(lambda: requests.post(
+                MODERATION_URL,
                 headers={"Authorization": f"Bearer {openai_api_key}"},
-                json={"input": prompt}
-            )
+                json={"input": prompt},
+                timeout=self.moderation_endpoint.policy.timeout,
+            ))
             resp.raise_for_status()
             flagged = resp.json()['results'][0]['flagged']
             if flagged:
@@ -104,8 +277,32 @@ class SafetyValidator:
             # If API fails, block by default for safety
             return False
 
+    async def amoderate_prompt(self, prompt: str, client) -> bool:
+        """
+        Async variant of moderate_prompt() using a shared openai.AsyncOpenAI client
+        (built with max_retries=0; retries go through self.moderation_endpoint).
+        Same fail-closed semantics: returns True only if the API says the prompt is safe.
+        """
+        try:
+            if self.moderation_client is not None:
+                flagged = not await self.moderation_client.acheck(prompt)
+            else:
+                resp = await self.moderation_endpoint.acall(lambda: client.moderations.create(input=prompt))
+                flagged = resp.results[0].flagged
+            if flagged:
+                print("Moderation: Prompt flagged as unsafe by OpenAI API")
+            return not flagged
+        except Exception as e:
+            print(f"Moderation API call failed: {e}")
+            # If API fails, block by default for safety
+            return False
+
 # Latency logger
 class LatencyMetrics:
+    """
+    Per-run stage timer. Every stopped step is also observed into the
+    process-wide latency_seconds histogram, so runs accumulate.
+    """
     def __init__(self):
         self.timings = {}
 
@@ -115,7 +312,9 @@ class LatencyMetrics:
     def stop(self, step):
         end = time.perf_counter()
         if step in self.timings and self.timings[step]["start"]:
-            self.timings[step]["latency"] = end - self.timings[step]["start"]
+            latency = end - self.timings[step]["start"]
+            self.timings[step]["latency"] = latency
+            STAGE_LATENCY.observe(latency, step=step)
 
     def get(self, step):
         return self.timings.get(step, {}).get("latency")
@@ -124,9 +323,5 @@ class LatencyMetrics:
         return {step: data["latency"] for step, data in self.timings.items()}
 
     def export_prometheus(self):
-        # Export as Prometheus-style text (gauge per step)
-        output = []
-        for step, data in self.timings.items():
-            if data["latency"] is not None:
-                output.append(f"latency_seconds{{step=\"{step}\"}} {data['latency']:.4f}")
-        return "\n".join(output)
+        # Export the whole registry: stage histograms, counters and gauges
+        return REGISTRY.export_prometheus()
@@ -0,0 +1,110 @@
+import json
+from typing import Any, Dict, List
+
+
+class StreamParseError(ValueError):
+    """
+    Raised as soon as streamed text can no longer become a valid workflow object
+    """
+
+
+class NodeStreamParser:
+    """
+    Incremental scanner for a streamed `{"nodes": [...], ...}` JSON document.
+
+    feed() takes raw text chunks as they arrive and returns every element of the
+    top-level "nodes" array that has just been completed, already decoded.
+    Only the new characters are scanned on each call. Structural errors (text
+    that doesn't start with an object, mismatched brackets, trailing garbage)
+    raise StreamParseError immediately instead of after the whole completion.
+    """
+    def __init__(self):
+        self._buffer = ""
+        self._pos = 0
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+        self._last_key = None
+        self._expect_value_for = None
+        self._nodes_depth = None
+        self._node_start = None
+        self._done = False
+
+    @property
+    def text(self) -> str:
+        return self._buffer
+
+    def feed(self, chunk: str) -> List[Dict[str, Any]]:
+        self._buffer += chunk
+        completed = []
+        buf = self._buffer
+        i = self._pos
+        n = len(buf)
+        while i < n:
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1 and self._stack[0] == "{":
+                        # Candidate key of the root object
+                        self._last_key = buf[self._string_start + 1:i]
+                i += 1
+                continue
+
+            if ch in " \t\r\n":
+                i += 1
+                continue
+            if self._done:
+                raise StreamParseError(f"Unexpected data after JSON object at offset {i}")
+            if not self._stack and ch != "{":
+                raise StreamParseError(f"Expected '{{' at offset {i}, got {ch!r}")
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == ":":
+                if len(self._stack) == 1:
+                    self._expect_value_for = self._last_key
+            elif ch == ",":
+                if len(self._stack) == 1:
+                    self._expect_value_for = None
+            elif ch in "{[":
+                if ch == "[" and len(self._stack) == 1 and self._expect_value_for == "nodes":
+                    self._nodes_depth = 2
+                elif ch == "{" and self._nodes_depth is not None and len(self._stack) == self._nodes_depth:
+                    self._node_start = i
+                self._stack.append(ch)
+            elif ch in "}]":
+                if not self._stack or self._stack[-1] != ("{" if ch == "}" else "["):
+                    raise StreamParseError(f"Mismatched {ch!r} at offset {i}")
+                self._stack.pop()
+                if (ch == "}" and self._node_start is not None
+                        and len(self._stack) == self._nodes_depth):
+                    try:
+                        completed.append(json.loads(buf[self._node_start:i + 1]))
+                    except json.JSONDecodeError as e:
+                        raise StreamParseError(f"Invalid node JSON: {e}") from e
+                    self._node_start = None
+                elif ch == "]" and self._nodes_depth is not None and len(self._stack) == 1:
+                    self._nodes_depth = None
+                if not self._stack:
+                    self._done = True
+            i += 1
+        self._pos = i
+        return completed
+
+    def close(self) -> Dict[str, Any]:
+        """
+        Decode the complete document once the stream has ended
+        """
+        if not self._done:
+            raise StreamParseError("Stream ended before the JSON object was complete")
+        try:
+            return json.loads(self._buffer)
+        except json.JSONDecodeError as e:
+            raise StreamParseError(f"Invalid JSON: {e}") from e
@@ -0,0 +1,121 @@
+from collections import deque
+from typing import Any, Dict, List
+from .graph import GraphError, WorkflowGraph
+
+# Editor canvas geometry: first node at (X_START, Y_CENTER), one column per layer
+X_START = 240
+Y_CENTER = 300
+X_GAP = 220
+Y_GAP = 160
+# Layers per row before a long workflow wraps onto a new row below
+MAX_COLUMNS = 20
+
+
+def _layers(preds: Dict[str, List[str]], succs: Dict[str, List[str]]) -> Dict[str, int]:
+    """
+    Longest-path layering, computed while walking in topological order. Nodes
+    stuck in cycles are released one at a time in plan order (the edge closing
+    the cycle is ignored).
+    """
+    in_degree = {name: len(p) for name, p in preds.items()}
+    layer = dict.fromkeys(preds, 0)
+    queue = deque(name for name, degree in in_degree.items() if degree == 0)
+    done = 0
+    while True:
+        while queue:
+            name = queue.popleft()
+            done += 1
+            next_layer = layer[name] + 1
+            for target in succs[name]:
+                if layer[target] < next_layer:
+                    layer[target] = next_layer
+                in_degree[target] -= 1
+                if in_degree[target] == 0:
+                    queue.append(target)
+        if done == len(preds):
+            return layer
+        # Break a cycle at its first node in plan order
+        stuck = next(name for name, degree in in_degree.items() if degree > 0)
+        in_degree[stuck] = 0
+        queue.append(stuck)
+
+
+def _order_layers(layer: Dict[str, int], preds: Dict[str, List[str]],
+                  succs: Dict[str, List[str]]) -> List[List[str]]:
+    """
+    Group nodes by layer, then reduce crossings with one barycenter sweep down
+    (by predecessors) and one up (by successors)
+    """
+    layers: List[List[str]] = [[] for _ in range(max(layer.values()) + 1)]
+    for name, i in layer.items():
+        layers[i].append(name)
+
+    index = {name: i for nodes in layers for i, name in enumerate(nodes)}
+
+    def sweep(rows, neighbours):
+        for nodes in rows:
+            if len(nodes) == 1:
+                continue
+            keys = {}
+            for name in nodes:
+                linked = [index[n] for n in neighbours[name]]
+                keys[name] = sum(linked) / len(linked) if linked else index[name]
+            nodes.sort(key=keys.__getitem__)
+            for i, name in enumerate(nodes):
+                index[name] = i
+
+    sweep(layers[1:], preds)
+    sweep(reversed(layers[:-1]), succs)
+    return layers
+
+
+def layered_layout(graph: WorkflowGraph) -> Dict[str, List[int]]:
+    """
+    Sugiyama-style positions for every node: columns by longest path from the
+    start, branches stacked vertically around the trigger's row, merges after
+    all their inputs. O(nodes + edges) apart from the per-layer sorts.
+    """
+    if not len(graph):
+        return {}
+    preds: Dict[str, List[str]] = {name: [] for name in graph.names()}
+    succs: Dict[str, List[str]] = {name: [] for name in preds}
+    for edge in graph.edges():
+        preds[edge.target].append(edge.source)
+        succs[edge.source].append(edge.target)
+
+    layers = _order_layers(_layers(preds, succs), preds, succs)
+
+    # Wrap long workflows into rows of MAX_COLUMNS layers, stacked top to bottom
+    positions = {}
+    row_center = Y_CENTER
+    previous_height = None
+    for start in range(0, len(layers), MAX_COLUMNS):
+        row = layers[start:start + MAX_COLUMNS]
+        height = max(len(nodes) for nodes in row)
+        if previous_height is not None:
+            row_center += ((previous_height + height) / 2 + 1) * Y_GAP
+        previous_height = height
+        for column, nodes in enumerate(row):
+            x = X_START + column * X_GAP
+            top = row_center - (len(nodes) - 1) * Y_GAP / 2
+            for i, name in enumerate(nodes):
+                positions[name] = [x, round(top + i * Y_GAP)]
+    return positions
+
+
+def apply_layout(plan: Dict[str, Any], force: bool = False) -> Dict[str, Any]:
+    """
+    Position every node of a plan from its connections, unless all nodes
+    already have positions (and `force` is not set)
+    """
+    nodes = plan.get("nodes") or []
+    if not force and all("position" in node for node in nodes):
+        return plan
+    try:
+        positions = layered_layout(WorkflowGraph.from_plan(nodes, plan.get("connections")))
+    except GraphError:
+        # Duplicate names can't be laid out by name; the builder rejects them anyway
+        positions = {}
+    for idx, node in enumerate(nodes):
+        node["position"] = positions.get(node.get("name")) or [X_START + idx * X_GAP, Y_CENTER]
+    return plan
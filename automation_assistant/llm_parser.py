@@ -1,183 +1,402 @@
+import asyncio
 import openai
 import os
 import json
-from typing import Dict, List, Any
-from .prompts import LLM_SYSTEM_PROMPT, COMPLETE_PARAMS, FAKE_CREDENTIALS
+import time
+from typing import Callable, Dict, List, Any, Optional, Sequence, Tuple
+from .prompts import LLM_SYSTEM_PROMPT
+from .node_registry import NODES
+from .normalize import NormalizedPlan, normalize_node, normalize_plan
+from .layout import apply_layout
+from .editing import parse_patch, summarize_workflow
+from .plan_cache import PlanCache, normalize_prompt, fingerprint
+from .json_stream import NodeStreamParser, StreamParseError
+from .metrics import LLM_FALLBACKS
+from .prompt_builder import edit_system_prompt_for, prompt_fingerprint_parts, system_prompt_for
+from .templates import TemplateEngine
+from .retrieval import ExampleRetriever
+from .usage import BudgetManager, Reservation, current_tenant, estimate_tokens, record_usage
+from .resilience import Endpoint, RetryPolicy, is_unavailable
+from . import tracing
 
 
 class LLMParser:
-    def __init__(self):
+    def __init__(self, cache: Optional[PlanCache] = None, budget: Optional[BudgetManager] = None,
+                 templates: Optional[TemplateEngine] = None, retriever: Optional[ExampleRetriever] = None,
+                 dynamic_prompt: Optional[bool] = None):
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required")
         
-        self.client = openai.OpenAI(api_key=api_key)
+        self.api_key = api_key
+        # Retries, backoff and the circuit breaker live in self.endpoint, not in the SDK
+        self.endpoint = Endpoint("openai.chat", RetryPolicy.from_env(
+            "openai.chat", max_attempts=3, base_delay=0.5, max_delay=20, timeout=60, deadline=150,
+        ))
+        self.client = openai.OpenAI(api_key=api_key, max_retries=0, timeout=self.endpoint.policy.timeout)
+        self._async_client = None
         
+        self.model = "gpt-4o-mini"
         self.system_prompt = LLM_SYSTEM_PROMPT
+        # Assemble the system prompt per request from node fragments instead of sending all of it
+        if dynamic_prompt is None:
+            dynamic_prompt = os.getenv("DYNAMIC_SYSTEM_PROMPT", "1").lower() not in ("0", "off", "false", "no")
+        self.dynamic_prompt = dynamic_prompt
+        self.cache = cache
+        self.budget = budget
+        self.templates = templates
+        self.retriever = retriever
+        self._context_fingerprint = None
 
 
     def parse(self, prompt: str) -> Dict[str, Any]:
         """
         Parse user prompt into complete n8n workflow JSON
         """
+        with tracing.span("llm.parse", {"llm.model": self.model}):
+            return self._parse(prompt)
+
+    def _parse(self, prompt: str) -> Dict[str, Any]:
+        local, examples = self._local_plan(prompt)
+        if local is not None:
+            return local
+        kwargs = self._completion_kwargs(prompt, examples)
+        # Raises BudgetExceededError before any tokens are spent
+        reservation = self._reserve(kwargs)
+        call = None
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": f"Create an n8n workflow for: {prompt}"}
-                ],
-                response_format={"type": "json_object"},
-                temperature=0.1,
-                max_tokens=3000,
-                top_p=1,
-                frequency_penalty=0,
-                presence_penalty=0
-            )
-            
-            raw_content = response.choices[0].message.content
-            print(f"DEBUG: Raw LLM response length: {len(raw_content)}", flush=True)
-            
-            plan = json.loads(raw_content)
-            enhanced_plan = self._enhance_workflow(plan)
-            
-            print(f"DEBUG: Enhanced workflow has {len(enhanced_plan.get('nodes', []))} nodes", flush=True)
-            return enhanced_plan
-            
+            response = self.endpoint.call(lambda: self.client.chat.completions.create(**kwargs))
+            call = record_usage(self.model, getattr(response, "usage", None))
+            plan = self._plan_from_content(response.choices[0].message.content)
+            self._cache_store(prompt, plan)
+            return plan
+
         except json.JSONDecodeError as e:
             print(f"ERROR: Invalid JSON from LLM: {e}")
             return self._create_fallback_workflow(prompt)
         except Exception as e:
+            if is_unavailable(e):
+                # An outage is reported as one, not papered over with a placeholder workflow
+                raise
             print(f"ERROR: LLM parsing failed: {e}")
             return self._create_fallback_workflow(prompt)
+        finally:
+            self._settle(reservation, call)
 
-    def _enhance_workflow(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+    async def aparse(self, prompt: str) -> Dict[str, Any]:
         """
-        Enhance workflow with complete parameters and auto-connections
+        Async variant of parse() using the shared AsyncOpenAI client
         """
-        if "nodes" not in plan or not plan["nodes"]:
-            return self._create_fallback_workflow("Default workflow")
-            
-        enhanced_nodes = []
-        
-        for idx, node in enumerate(plan["nodes"]):
-            # Ensure required fields
-            node.setdefault("id", f"node{idx+1}")
-            node.setdefault("name", self._generate_node_name(node.get("type", ""), idx))
-            node.setdefault("typeVersion", 1)
-            node.setdefault("position", [240 + idx*220, 300])
-            node.setdefault("disabled", False)
-            
-            node_type = node.get("type", "")
-
-            # --- AUTO-FIX FOR AGGREGATE NODE ---
-            if node_type == "n8n-nodes-base.aggregate":
-                # If wrong/legacy params present, replace with valid structure
-                params = node.get("parameters", {})
-                if ("operation" in params or "fieldsToAggregate" in params or "outputType" in params
-                    or "aggregation" not in params):
-                    node["parameters"] = {
-                        "aggregation": {
-                            "mode": "append",
-                            "fields": [
-                                {
-                                    "fieldName": "*",
-                                    "aggregatedAs": "emails",
-                                    "aggregationFunction": "append"
-                                }
-                            ]
-                        },
-                        "options": {}
-                    }
-            # Merge complete parameters for all nodes
-            if node_type in COMPLETE_PARAMS:
-                complete_params = self._deep_merge(
-                    COMPLETE_PARAMS[node_type].copy(),
-                    node.get("parameters", {})
-                )
-                node["parameters"] = complete_params
-            
-            # Add credentials if needed
-            if node_type in FAKE_CREDENTIALS:
-                node["credentials"] = FAKE_CREDENTIALS[node_type]
-            
-            enhanced_nodes.append(node)
-        
-        plan["nodes"] = enhanced_nodes
-        
-        # Auto-create connections if missing or incomplete
-        existing_connections = plan.get("connections", {})
-        if not existing_connections or len(existing_connections) < len(enhanced_nodes) - 1:
-            plan["connections"] = self._create_auto_connections(enhanced_nodes)
-        
-        return plan
+        with tracing.span("llm.parse", {"llm.model": self.model, "llm.async": True}):
+            return await self._aparse(prompt)
 
+    async def _aparse(self, prompt: str) -> Dict[str, Any]:
+        local, examples = self._local_plan(prompt)
+        if local is not None:
+            return local
+        kwargs = self._completion_kwargs(prompt, examples)
+        # Raises BudgetExceededError before any tokens are spent
+        reservation = self._reserve(kwargs)
+        call = None
+        cancelled = False
+        try:
+            response = await self.endpoint.acall(lambda: self.async_client.chat.completions.create(**kwargs))
+            call = record_usage(self.model, getattr(response, "usage", None))
+            plan = self._plan_from_content(response.choices[0].message.content)
+            self._cache_store(prompt, plan)
+            return plan
 
-    def _deep_merge(self, base: Dict, override: Dict) -> Dict:
+        except json.JSONDecodeError as e:
+            print(f"ERROR: Invalid JSON from LLM: {e}")
+            return self._create_fallback_workflow(prompt)
+        except asyncio.CancelledError:
+            # e.g. speculative generation for a prompt moderation flagged: the request was already sent
+            cancelled = True
+            raise
+        except Exception as e:
+            if is_unavailable(e):
+                raise
+            print(f"ERROR: LLM parsing failed: {e}")
+            return self._create_fallback_workflow(prompt)
+        finally:
+            self._settle(reservation, call, spent=cancelled)
+
+    def parse_stream(self, prompt: str,
+                     on_node: Optional[Callable[[Dict[str, Any]], None]] = None,
+                     node_validator: Optional[Callable[[Dict[str, Any]], bool]] = None,
+                     metrics=None) -> Dict[str, Any]:
         """
-        Deep merge two dictionaries
+        Streaming variant of parse(): each node is enhanced and validated as soon as it
+        is complete in the token stream, and malformed output aborts the stream early.
+        With `metrics` (LatencyMetrics), records "llm_time_to_first_node".
         """
-        result = base.copy()
-        
-        for key, value in override.items():
-            if key in result and isinstance(result[key], dict) and isinstance(value, dict):
-                result[key] = self._deep_merge(result[key], value)
-            else:
-                result[key] = value
-        
-        return result
+        with tracing.span("llm.parse", {"llm.model": self.model, "llm.stream": True}):
+            return self._parse_stream(prompt, on_node, node_validator, metrics)
+
+    def _parse_stream(self, prompt: str, on_node, node_validator, metrics) -> Dict[str, Any]:
+        local, examples = self._local_plan(prompt)
+        if local is not None:
+            return local
+        if metrics is not None:
+            metrics.start("llm_time_to_first_node")
+        started = time.perf_counter()
+        kwargs = self._completion_kwargs(prompt, examples)
+        reservation = self._reserve(kwargs)
+        call = None
+        stream = None
+        try:
+            stream = self.endpoint.call(lambda: self.client.chat.completions.create(
+                **kwargs, stream=True, stream_options={"include_usage": True}
+            ))
+            scanner = NodeStreamParser()
+            nodes = []
+            for chunk in stream:
+                # With include_usage the last chunk carries usage and no choices
+                if getattr(chunk, "usage", None) is not None:
+                    call = record_usage(self.model, chunk.usage)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                for node in scanner.feed(chunk.choices[0].delta.content):
+                    if not isinstance(node, dict):
+                        raise StreamParseError("Workflow node is not a JSON object")
+                    node = self._enhance_node(node, len(nodes))
+                    if node_validator is not None and not node_validator(node):
+                        raise StreamParseError(f"Node '{node.get('id')}' failed validation")
+                    if not nodes:
+                        tracing.set_attribute("llm.time_to_first_node_ms", (time.perf_counter() - started) * 1000)
+                        if metrics is not None:
+                            metrics.stop("llm_time_to_first_node")
+                    nodes.append(node)
+                    if on_node is not None:
+                        on_node(node)
+
+            plan = scanner.close()
+            print(f"DEBUG: Raw LLM response length: {len(scanner.text)}", flush=True)
+            if not nodes:
+                return self._enhance_workflow(plan)
+            plan = normalize_plan(plan, nodes)
+            tracing.set_attribute("plan.node_count", len(nodes))
+            print(f"DEBUG: Enhanced workflow has {len(nodes)} nodes", flush=True)
+            self._cache_store(prompt, plan)
+            return plan
 
-    def _generate_node_name(self, node_type: str, index: int) -> str:
+        except StreamParseError as e:
+            print(f"ERROR: Aborting LLM stream, invalid output: {e}")
+            return self._create_fallback_workflow(prompt)
+        except Exception as e:
+            if is_unavailable(e):
+                raise
+            print(f"ERROR: LLM parsing failed: {e}")
+            return self._create_fallback_workflow(prompt)
+        finally:
+            # Closing the HTTP stream stops token generation when we bail out early
+            if stream is not None and hasattr(stream, "close"):
+                stream.close()
+            # An opened stream generated tokens even if it ended before the usage chunk
+            self._settle(reservation, call, spent=stream is not None)
+
+    def generate_patch(self, instruction: str, workflow: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
-        Generate human-readable node names
+        JSON Patch operations that apply a change request to an existing n8n
+        workflow. Only a compact summary goes in and only the diff comes out;
+        there is no fallback, a bad reply raises PatchError.
         """
-        name_mapping = {
-            "n8n-nodes-base.cron": "Schedule Trigger",
-            "n8n-nodes-base.googleGmail": "Gmail",
-            "n8n-nodes-base.openai": "OpenAI",
-            "n8n-nodes-base.emailSend": "Send Email",
-            "n8n-nodes-base.if": "Conditional",
-            "n8n-nodes-base.httpRequest": "HTTP Request"
-        }
-        
-        base_name = name_mapping.get(node_type, f"Node {index + 1}")
-        return base_name
+        with tracing.span("llm.patch", {"llm.model": self.model}):
+            summary = summarize_workflow(workflow)
+            kwargs = dict(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": edit_system_prompt_for(instruction)},
+                    {"role": "user", "content": f"Current workflow:\n{summary}\n\nChange request: {instruction}"}
+                ],
+                response_format={"type": "json_object"},
+                temperature=0.1,
+                max_tokens=1000,
+            )
+            tracing.set_attribute("llm.summary_chars", len(summary))
+            # Raises BudgetExceededError before any tokens are spent
+            reservation = self._reserve(kwargs)
+            call = None
+            try:
+                response = self.endpoint.call(lambda: self.client.chat.completions.create(**kwargs))
+                call = record_usage(self.model, getattr(response, "usage", None))
+                patch = parse_patch(response.choices[0].message.content)
+                tracing.set_attribute("patch.op_count", len(patch))
+                return patch
+            finally:
+                self._settle(reservation, call)
 
-    def _create_auto_connections(self, nodes: List[Dict]) -> Dict[str, Any]:
+    def cache_key(self, prompt: str) -> str:
         """
-        Create sequential connections between nodes
+        Key on the normalized prompt, the model and everything else that shapes the output
         """
-        if len(nodes) < 2:
-            return {}
-            
-        connections = {}
-        
-        for i in range(len(nodes) - 1):
-            current_name = nodes[i]["name"]
-            next_name = nodes[i + 1]["name"]
-            
-            connections[current_name] = {
-                "main": [[{"node": next_name, "type": "main", "index": 0}]]
-            }
-        
-        print(f"DEBUG: Auto-created {len(connections)} connections", flush=True)
-        return connections
+        context = prompt_fingerprint_parts() if self.dynamic_prompt else self.system_prompt
+        # Compared by value: the parts dict is new on every call, its members are the same objects
+        if self._context_fingerprint is None or self._context_fingerprint[0] != context:
+            self._context_fingerprint = (
+                context,
+                fingerprint(context, NODES.fingerprint()),
+            )
+        return fingerprint(normalize_prompt(prompt), self.model, self._context_fingerprint[1])
+
+    def _cache_lookup(self, prompt: str) -> Optional[Dict[str, Any]]:
+        if self.cache is None:
+            return None
+        plan = self.cache.get(self.cache_key(prompt))
+        tracing.set_attribute("cache.hit", plan is not None)
+        if plan is None:
+            return None
+        print("DEBUG: Plan cache hit", flush=True)
+        # Stored after normalization, under a key covering the node specs
+        return NormalizedPlan(plan)
+
+    def _local_plan(self, prompt: str) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, str]]]:
+        """
+        A plan that needs no LLM call (template, cache, same past prompt),
+        otherwise (None, few-shot example messages for the LLM call)
+        """
+        plan = self._template_lookup(prompt)
+        if plan is None:
+            plan = self._cache_lookup(prompt)
+        if plan is not None or self.retriever is None:
+            return plan, []
+        plan = self.retriever.exact_match(prompt)
+        if plan is not None:
+            print("DEBUG: Same prompt found in workflow index, skipping LLM", flush=True)
+            # Indexed in compact form: normalize (defaults, credentials, layout) again
+            return self._enhance_workflow(plan), []
+        neighbors = self.retriever.retrieve(prompt)
+        tracing.set_attribute("retrieval.neighbors", len(neighbors))
+        if neighbors:
+            tracing.set_attribute("retrieval.top_score", neighbors[0].score)
+        return None, self.retriever.examples(neighbors)
+
+    def remember_success(self, prompt: str, plan: Dict[str, Any]):
+        """
+        Add a plan that became a workflow in n8n to the retrieval index
+        """
+        if self.retriever is not None and not plan.get("fallback"):
+            self.retriever.remember(prompt, plan)
+
+    def _template_lookup(self, prompt: str) -> Optional[Dict[str, Any]]:
+        if self.templates is None:
+            return None
+        plan = self.templates.plan_for(prompt)
+        if plan is None:
+            return None
+        print("DEBUG: Template fast path hit, skipping LLM", flush=True)
+        return self._enhance_workflow(plan)
+
+    def _cache_store(self, prompt: str, plan: Dict[str, Any]):
+        # Fallback plans are never stored: they come from errors, not the model
+        if self.cache is not None and not plan.get("fallback"):
+            self.cache.put(self.cache_key(prompt), plan)
+
+    @property
+    def async_client(self) -> openai.AsyncOpenAI:
+        """
+        Lazily created so sync-only callers never build an async HTTP pool
+        """
+        if self._async_client is None:
+            self._async_client = openai.AsyncOpenAI(
+                api_key=self.api_key, max_retries=0, timeout=self.endpoint.policy.timeout
+            )
+        return self._async_client
+
+    @async_client.setter
+    def async_client(self, client):
+        self._async_client = client
+
+    def _reserve(self, kwargs: Dict[str, Any]) -> Optional[Reservation]:
+        """
+        Hold the call's worst-case cost against the tenant budget, downshifting max_tokens if needed
+        """
+        if self.budget is None:
+            return None
+        prompt_tokens = sum(estimate_tokens(m["content"]) for m in kwargs["messages"])
+        reservation = self.budget.reserve(current_tenant(), self.model, prompt_tokens, kwargs["max_tokens"])
+        if reservation.max_tokens != kwargs["max_tokens"]:
+            print(f"WARNING: LLM budget low, max_tokens reduced to {reservation.max_tokens}", flush=True)
+            kwargs["max_tokens"] = reservation.max_tokens
+        tracing.set_attribute("llm.max_tokens", kwargs["max_tokens"])
+        return reservation
+
+    @staticmethod
+    def _settle(reservation: Optional[Reservation], call, spent: bool = False):
+        """
+        Replace the reservation with the call's cost; `spent` charges the reserved
+        estimate when tokens were generated but no usage was reported
+        """
+        if reservation is None:
+            return
+        if call is None and spent:
+            reservation.charge()
+        else:
+            reservation.commit(call)
+
+    def _completion_kwargs(self, prompt: str, examples: Sequence[Dict[str, str]] = ()) -> Dict[str, Any]:
+        system_prompt = system_prompt_for(prompt) if self.dynamic_prompt else self.system_prompt
+        tracing.set_attribute("llm.system_prompt_chars", len(system_prompt))
+        # Few-shot examples go after the system prompt so its shared prefix stays cacheable
+        return dict(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                *examples,
+                {"role": "user", "content": f"Create an n8n workflow for: {prompt}"}
+            ],
+            response_format={"type": "json_object"},
+            temperature=0.1,
+            max_tokens=3000,
+            top_p=1,
+            frequency_penalty=0,
+            presence_penalty=0
+        )
+
+    def _plan_from_content(self, raw_content: str) -> Dict[str, Any]:
+        print(f"DEBUG: Raw LLM response length: {len(raw_content)}", flush=True)
+
+        plan = json.loads(raw_content)
+        enhanced_plan = self._enhance_workflow(plan)
+        tracing.set_attribute("plan.node_count", len(enhanced_plan.get("nodes", [])))
+
+        print(f"DEBUG: Enhanced workflow has {len(enhanced_plan.get('nodes', []))} nodes", flush=True)
+        return enhanced_plan
+
+    def _enhance_workflow(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Enhance workflow with complete parameters and auto-connections
+        """
+        if "nodes" not in plan or not plan["nodes"]:
+            return self._create_fallback_workflow("Default workflow")
+
+        with tracing.span("llm.enhance_workflow", {"plan.node_count": len(plan["nodes"])}):
+            enhanced_nodes = [self._enhance_node(node, idx) for idx, node in enumerate(plan["nodes"])]
+
+            return normalize_plan(plan, enhanced_nodes)
+
+    def _enhance_node(self, node: Dict[str, Any], idx: int) -> Dict[str, Any]:
+        """
+        Fill defaults, complete parameters and credentials of a single node
+        """
+        return normalize_node(node, idx)
 
     def _create_fallback_workflow(self, prompt: str) -> Dict[str, Any]:
         """
         Create basic workflow when LLM fails or returns invalid data
         """
         print(f"WARNING: Creating fallback workflow for prompt: {prompt[:50]}...", flush=True)
+        LLM_FALLBACKS.inc()
+        tracing.set_attribute("llm.fallback", True)
         
-        return {
+        return apply_layout(NormalizedPlan({
             "nodes": [
                 {
                     "id": "schedule1",
                     "name": "Schedule Trigger", 
                     "type": "n8n-nodes-base.cron",
                     "typeVersion": 1,
-                    "parameters": COMPLETE_PARAMS["n8n-nodes-base.cron"],
-                    "position": [240, 300],
+                    "parameters": dict(NODES.defaults("n8n-nodes-base.cron")),
                     "disabled": False
                 },
                 {
@@ -186,12 +405,11 @@ class LLMParser:
                     "type": "n8n-nodes-base.emailSend", 
                     "typeVersion": 1,
                     "parameters": {
-                        **COMPLETE_PARAMS["n8n-nodes-base.emailSend"],
+                        **NODES.defaults("n8n-nodes-base.emailSend"),
                         "subject": f"Workflow: {prompt[:30]}...",
                         "message": f"This is a fallback workflow created for: {prompt}"
                     },
-                    "credentials": FAKE_CREDENTIALS["n8n-nodes-base.emailSend"],
-                    "position": [460, 300],
+                    "credentials": NODES.credentials("n8n-nodes-base.emailSend"),
                     "disabled": False
                 }
             ],
@@ -202,7 +420,7 @@ class LLMParser:
             },
             "fallback": True,
             "original_prompt": prompt
-        }
+        }))
 
     def validate_workflow(self, workflow: Dict[str, Any]) -> bool:
         """
@@ -242,10 +460,10 @@ class LLMParser:
         """
         Get list of supported node types
         """
-        return list(COMPLETE_PARAMS.keys())
+        return NODES.types()
 
     def get_node_parameters(self, node_type: str) -> Dict[str, Any]:
         """
-        Get default parameters for a specific node type
+        Get default parameters for a specific node type (read-only)
         """
-        return COMPLETE_PARAMS.get(node_type, {})
\ No newline at end of file
+        return NODES.defaults(node_type)
\ No newline at end of file
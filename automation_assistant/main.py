@@ -1,11 +1,20 @@
 import os
-import time
 from dotenv import load_dotenv
 import requests
 from automation_assistant.llm_parser import LLMParser
+from automation_assistant.plan_cache import PlanCache
+from automation_assistant.templates import TemplateEngine
+from automation_assistant.retrieval import ExampleRetriever
 from automation_assistant.guardrails import SafetyValidator, LatencyMetrics
 from automation_assistant.workflow_builder import WorkflowBuilder
-from automation_assistant.metrics_server import MetricsServer
+from automation_assistant.dedup import DedupIndex
+from automation_assistant.metrics_server import start_metrics_server
+from automation_assistant.pipeline import WorkflowPipeline, PipelineError
+from automation_assistant.n8n_session import N8nSessionManager, post_login
+from automation_assistant.cookie_cache import CookieCache
+from automation_assistant.usage import BudgetManager
+from automation_assistant.editing import parse_modify_request
+from automation_assistant.workflow_mirror import WorkflowMirror, iter_workflows
 
 def login_and_fetch_session(n8n_url: str, email: str, password: str) -> requests.Session:
     """
@@ -13,25 +22,15 @@ def login_and_fetch_session(n8n_url: str, email: str, password: str) -> requests
     """
     
     sess = requests.Session()
-    resp = sess.post(
-        f"{n8n_url}/rest/login",
-        data={
-            "emailOrLdapLoginId": email,
-            "password": password,
-        },
-        headers={"Content-Type": "application/x-www-form-urlencoded"},
-    )
-    resp.raise_for_status()
+    post_login(sess, n8n_url, email, password)
     return sess
 
 def fetch_workflows(session: requests.Session, n8n_url: str) -> list:
     """
-    Fetch workflows using the authenticated session.
+    Fetch workflows using the authenticated session, page by page.
+    Prefer iter_workflows() or WorkflowMirror for large instances.
     """
-    resp = session.get(f"{n8n_url}/rest/workflows")
-    resp.raise_for_status()
-    return resp.json().get("data", [])
-
+    return list(iter_workflows(session, n8n_url))
 
 def main():
     load_dotenv()
@@ -43,6 +42,10 @@ def main():
     if not prompt:
         prompt = input("Enter your workflow request (in English): ")
     print("DEBUG: prompt =", prompt)
+    # "modify workflow <id>: <change>" edits an existing workflow instead of creating one
+    edit = parse_modify_request(prompt)
+    if edit and not edit["instruction"]:
+        edit["instruction"] = input(f"What should change in workflow {edit['workflow_id']}? ")
     
     if not (n8n_url and email and pwd and openai_api_key):
         print("ERROR: Missing N8N_API_URL, login credentials, or OpenAI API key")
@@ -50,77 +53,51 @@ def main():
 
     # Metrics object for latency
     metrics = LatencyMetrics()
-    validator = SafetyValidator()
-    
+
     # 1. Login
     metrics.start("login")
-    for i in range(1, 7):
-        try:
-            session = login_and_fetch_session(n8n_url, email, pwd)
-            break
-        except Exception as e:
-            print(f"[Attempt {i}] Login failed ({e}), retrying in 5s…")
-            time.sleep(5)
-    else:
+    session = N8nSessionManager(
+        n8n_url, email, pwd, cookie_cache=CookieCache.from_env(n8n_url, email, pwd)
+    )
+    if not session.connect():
         print("ERROR: Could not log into n8n in time.")
         return
     metrics.stop("login")
-    time.sleep(2)
-
-    # 2. Pre-moderation (blacklist/length)
-    metrics.start("pre_validation")
-    if not validator.validate_input(prompt):
-        print("Prompt failed safety validation. Please try again with a safer request.")
-        return
-    metrics.stop("pre_validation")
-
-    # 3. Moderation API
-    metrics.start("moderation")
-    if not validator.moderate_prompt(prompt, openai_api_key):
-        print("Prompt failed OpenAI moderation. Please try again.")
-        return
-    metrics.stop("moderation")
 
-    # 4. LLM
-    metrics.start("llm_generation")
-    parser = LLMParser()
-    try:
-        plan = parser.parse(prompt)
-        print("Generated plan:", plan)
-    except Exception as e:
-        print(f"LLM failed to generate a plan: {e}")
-        return
-    metrics.stop("llm_generation")
-
-    # 5. Post-moderation
-    metrics.start("post_validation")
-    if not validator.validate_plan(plan):
-        print("Workflow plan failed schema validation. Please check your input.")
-        return
-    metrics.stop("post_validation")
-
-    # 6. Build and create workflow in n8n
-    metrics.start("workflow_creation")
-    builder = WorkflowBuilder(n8n_url, session)
+    # 2-6. Guardrails, LLM, build and create workflow in n8n
+    parser = LLMParser(
+        cache=PlanCache.from_env(), budget=BudgetManager.from_env(),
+        templates=TemplateEngine.from_env(), retriever=ExampleRetriever.from_env(),
+    )
+    builder = WorkflowBuilder(
+        n8n_url, session, dedup=DedupIndex.from_env(), mirror=WorkflowMirror.from_env()
+    )
+    pipeline = WorkflowPipeline(
+        parser, SafetyValidator(), builder, openai_api_key,
+        stream=os.getenv("LLM_STREAMING", "").lower() in ("1", "true", "yes"),
+    )
     try:
-        workflow = builder.create_workflow(plan)
-    except Exception as e:
-        print(f"Workflow creation failed: {e}")
+        if edit:
+            workflow_data = pipeline.modify(edit["workflow_id"], edit["instruction"], metrics)
+        else:
+            workflow_data = pipeline.run(prompt, metrics)
+    except PipelineError as e:
+        print(e)
         return
-    metrics.stop("workflow_creation")
 
     # 7. Show result + metrics
-    if "data" in workflow:
-        workflow_data = workflow["data"]
-    else:
-        workflow_data = workflow
-    print(f"\nWorkflow created successfully in n8n!")
+    print(f"\nWorkflow {'updated' if edit else 'created'} successfully in n8n!")
     print(f"Workflow ID: {workflow_data.get('id')}")
     print(f"Workflow name: {workflow_data.get('name')}")
     print(f"Check it in the n8n UI: {n8n_url}/workflow/{workflow_data.get('id')}")
+    usage = workflow_data.get("llm_usage") or {}
+    if usage.get("calls"):
+        print(f"LLM usage: {usage['prompt_tokens']} prompt + {usage['completion_tokens']} completion tokens"
+              f" (~${usage['cost_usd']:.4f})")
     print("\n=== Latency Metrics ===")
     for step, latency in metrics.summary().items():
-        print(f"{step}: {latency:.3f} sec")
+        if latency is not None:
+            print(f"{step}: {latency:.3f} sec")
         
     # (Optional) write metrics to file for Prometheus server
     with open("metrics.prom", "w") as f:
@@ -130,6 +107,8 @@ def main():
 
 
 if __name__ == "__main__":
-    metrics = main()
-    metrics_server = MetricsServer(metrics)
-    metrics_server.run(host="0.0.0.0", port=8001)
\ No newline at end of file
+    # Serve /metrics from process start so in-flight stages are scrapeable
+    metrics_server = start_metrics_server()
+    main()
+    if metrics_server:
+        metrics_server.join()
\ No newline at end of file
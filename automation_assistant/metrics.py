@@ -0,0 +1,228 @@
+import bisect
+import math
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def buckets_from_env(name: str, default: Sequence[float] = DEFAULT_BUCKETS) -> Tuple[float, ...]:
+    """
+    Histogram buckets from a comma-separated env var, e.g. LATENCY_BUCKETS=0.1,0.5,1,5
+    """
+    raw = os.getenv(name)
+    if not raw:
+        return tuple(default)
+    return tuple(sorted(float(b) for b in raw.split(",") if b.strip()))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence, extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, object] = {}
+
+    def _key(self, labels: Dict[str, object]) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only increase")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    @contextmanager
+    def track_inprogress(self, **labels):
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        bounds = sorted(float(b) for b in buckets)
+        if not bounds or bounds[-1] != math.inf:
+            bounds.append(math.inf)
+        self.buckets = tuple(bounds)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            # First bucket whose upper bound is >= value (le is inclusive)
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels) -> int:
+        with self._lock:
+            state = self._values.get(self._key(labels))
+            return state[2] if state else 0
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, ([*v[0]], v[1], v[2])) for k, v in self._values.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Thread-safe, process-wide collection of counters, gauges and histograms.
+
+    Metrics are get-or-create by name, so modules can declare the ones they
+    update at import time and share them.
+    """
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Metric {name} already registered with a different type or labels")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def export_prometheus(self) -> str:
+        """
+        Prometheus text exposition format (0.0.4) with HELP/TYPE lines
+        """
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda m: m.name)
+        output = []
+        for metric in metrics:
+            output.extend(metric.header())
+            output.extend(metric.samples())
+        return "\n".join(output) + "\n"
+
+
+# Default registry shared by the whole process
+REGISTRY = MetricsRegistry()
+
+STAGE_LATENCY = REGISTRY.histogram(
+    "latency_seconds", "Latency of pipeline stages", ["step"], buckets=buckets_from_env("LATENCY_BUCKETS")
+)
+WORKFLOWS = REGISTRY.counter(
+    "workflows_total", "Prompts processed by the pipeline, by outcome and failing stage", ["outcome", "stage"]
+)
+IN_FLIGHT = REGISTRY.gauge("workflows_in_flight", "Prompts currently being processed", ["mode"])
+LLM_FALLBACKS = REGISTRY.counter("llm_fallbacks_total", "Fallback workflows returned instead of LLM output")
+CACHE_REQUESTS = REGISTRY.counter("cache_requests_total", "Cache lookups by cache and result", ["cache", "result"])
+LLM_TOKENS = REGISTRY.counter("llm_tokens_total", "LLM tokens used, by model and kind (prompt/completion)", ["model", "kind"])
+LLM_COST = REGISTRY.counter("llm_cost_usd_total", "Estimated LLM spend in USD, by model and tenant", ["model", "tenant"])
+LLM_BUDGET_EVENTS = REGISTRY.counter(
+    "llm_budget_events_total", "Budget enforcement actions (downshift/reject), by tenant", ["tenant", "action"]
+)
+TEMPLATE_REQUESTS = REGISTRY.counter(
+    "template_requests_total", "Template fast-path lookups by template and result (hit/low_confidence/miss)",
+    ["template", "result"]
+)
+RETRIEVAL_REQUESTS = REGISTRY.counter(
+    "retrieval_requests_total", "Workflow index lookups by result (exact_hit/few_shot/miss)", ["result"]
+)
+OUTBOUND_CALLS = REGISTRY.counter(
+    "outbound_calls_total", "Outbound call attempts by endpoint and outcome (ok/retry/error/rejected)",
+    ["endpoint", "outcome"]
+)
+OUTBOUND_LATENCY = REGISTRY.histogram("outbound_call_seconds", "Latency of outbound call attempts", ["endpoint"])
+CIRCUIT_OPEN = REGISTRY.gauge("circuit_breaker_open", "1 while the endpoint's circuit breaker is open", ["endpoint"])
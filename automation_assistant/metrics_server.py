@@ -1,18 +1,111 @@
 # automation_assistant/metrics_server.py
 
+import os
+import threading
+import time
+from typing import Optional
 from flask import Flask, Response
+from werkzeug.serving import make_server
+from .metrics import REGISTRY
+
+try:
+    import waitress
+except ImportError:  # pragma: no cover - werkzeug's threaded server is used instead
+    waitress = None
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
 
 class MetricsServer:
-    def __init__(self, metrics):
+    """
+    Serves /metrics for a registry (anything with export_prometheus()).
+
+    `start()` runs the server on a daemon thread so scrapes see in-flight
+    work while the pipeline is running. The rendered exposition is reused for
+    `cache_ttl` seconds, so frequent scrapes don't contend with the metric
+    locks that request handling takes. Uses waitress when installed and
+    werkzeug's threaded server otherwise.
+    """
+    def __init__(self, metrics=REGISTRY, cache_ttl: float = 1.0, threads: int = 4):
         self.metrics = metrics
+        self.cache_ttl = cache_ttl
+        self.threads = threads
+        self.port: Optional[int] = None
         self.app = Flask(__name__)
+        self._render_lock = threading.Lock()
+        self._rendered = ""
+        self._rendered_at = float("-inf")
+        self._server = None
+        self._thread: Optional[threading.Thread] = None
         self._setup_routes()
 
     def _setup_routes(self):
         @self.app.route("/metrics")
         def metrics_endpoint():
-            return Response(self.metrics.export_prometheus(), mimetype="text/plain")
+            return Response(self.render(), content_type=CONTENT_TYPE)
+
+    def render(self) -> str:
+        """
+        Current exposition text, re-rendered at most once per cache_ttl
+        """
+        with self._render_lock:
+            now = time.monotonic()
+            if now - self._rendered_at >= self.cache_ttl:
+                self._rendered = self.metrics.export_prometheus()
+                self._rendered_at = now
+            return self._rendered
+
+    def start(self, host: str = "0.0.0.0", port: int = 8001) -> "MetricsServer":
+        """
+        Serve in the background and return immediately (port=0 picks a free port)
+        """
+        if self._thread is not None:
+            return self
+        if waitress is not None:
+            self._server = waitress.create_server(self.app, host=host, port=port, threads=self.threads)
+            self.port = self._server.effective_port
+            target = self._server.run
+        else:
+            self._server = make_server(host, port, self.app, threaded=True)
+            self.port = self._server.port
+            target = self._server.serve_forever
+        self._thread = threading.Thread(target=target, name="metrics-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is None:
+            return
+        if waitress is not None:
+            self._server.close()
+        else:
+            self._server.shutdown()
+        self._thread.join(timeout=5)
+        self._server = None
+        self._thread = None
+
+    def join(self):
+        """
+        Block until the background server stops (keeps a finished CLI run scrapeable)
+        """
+        if self._thread is not None:
+            self._thread.join()
+
+    def run(self, host: str = "0.0.0.0", port: int = 8001):
+        self.start(host, port)
+        self.join()
 
-    def run(self, *args, **kwargs):
-        self.app.run(*args, **kwargs)
 
+def start_metrics_server(metrics=REGISTRY) -> Optional[MetricsServer]:
+    """
+    Start the background metrics server on METRICS_PORT (default 8001, 'off' disables it)
+    """
+    port = os.getenv("METRICS_PORT", "8001")
+    if port.lower() in ("off", "none", ""):
+        return None
+    cache_ttl = float(os.getenv("METRICS_CACHE_TTL", "1.0"))
+    try:
+        return MetricsServer(metrics, cache_ttl=cache_ttl).start(os.getenv("METRICS_HOST", "0.0.0.0"), int(port))
+    except OSError as e:
+        print(f"WARNING: metrics server not started on port {port}: {e}")
+        return None
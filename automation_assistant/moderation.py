@@ -0,0 +1,166 @@
+import asyncio
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Optional, Tuple
+import requests
+from .metrics import CACHE_REQUESTS
+from .resilience import Endpoint, RetryPolicy
+
+MODERATION_URL = "https://api.openai.com/v1/moderations"
+
+
+def moderation_endpoint(timeout: float = 10) -> Endpoint:
+    """
+    The "openai.moderation" endpoint: retry policy and circuit breaker for moderation calls
+    """
+    return Endpoint("openai.moderation", RetryPolicy.from_env(
+        "openai.moderation", max_attempts=3, timeout=timeout, deadline=2 * timeout,
+    ))
+
+
+class ModerationClient:
+    """
+    Micro-batching, caching client for the OpenAI moderation endpoint.
+
+    Prompts submitted within `max_wait` seconds of each other are coalesced
+    into one request (the endpoint accepts an array of inputs), and verdicts
+    are cached by prompt hash for `cache_ttl` seconds so repeated prompts
+    skip the network entirely. Transient errors are retried with backoff
+    behind a circuit breaker; whatever remains propagates to the caller,
+    which is expected to fail closed (see SafetyValidator.moderate_prompt).
+    Up to `max_in_flight` batches are sent concurrently, so one slow request
+    does not hold up the batches queued behind it.
+    """
+    def __init__(self, openai_api_key: str, max_batch: int = 32, max_wait: float = 0.005,
+                 cache_ttl: float = 3600, cache_size: int = 10_000, timeout: float = 10,
+                 session: Optional[requests.Session] = None, url: str = MODERATION_URL,
+                 endpoint: Optional[Endpoint] = None, max_in_flight: int = 4):
+        self.openai_api_key = openai_api_key
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self.url = url
+        self.session = session or requests.Session()
+        self.endpoint = endpoint or moderation_endpoint(timeout)
+        self.stats = {"cache_hits": 0, "cache_misses": 0, "requests": 0, "inputs": 0}
+
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._pending: List[Tuple[str, str, Future]] = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._senders = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="moderation")
+        self._worker = threading.Thread(target=self._run, name="moderation-batcher", daemon=True)
+        self._worker.start()
+
+    def check(self, prompt: str) -> bool:
+        """
+        Return True if the prompt is safe, False if flagged
+        """
+        return self.submit(prompt).result(timeout=self.endpoint.policy.deadline + self.timeout)
+
+    async def acheck(self, prompt: str) -> bool:
+        return await asyncio.wrap_future(self.submit(prompt))
+
+    def submit(self, prompt: str) -> Future:
+        key = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        future = Future()
+        cached = self._cache_get(key)
+        if cached is not None:
+            future.set_result(not cached)
+            return future
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("ModerationClient is closed")
+            self._pending.append((key, prompt, future))
+            self._cond.notify()
+        return future
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._worker.join(timeout=self.timeout)
+        # Batches already handed off still complete their futures
+        self._senders.shutdown(wait=False)
+
+    def _cache_get(self, key: str) -> Optional[bool]:
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._cache.move_to_end(key)
+                self.stats["cache_hits"] += 1
+                CACHE_REQUESTS.inc(cache="moderation", result="hit")
+                return entry[1]
+            if entry is not None:
+                del self._cache[key]
+            self.stats["cache_misses"] += 1
+            CACHE_REQUESTS.inc(cache="moderation", result="miss")
+            return None
+
+    def _cache_put(self, key: str, flagged: bool):
+        with self._cache_lock:
+            self._cache[key] = (time.monotonic() + self.cache_ttl, flagged)
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _next_batch(self) -> List[Tuple[str, str, Future]]:
+        with self._cond:
+            while not self._pending and not self._closed:
+                self._cond.wait()
+            if not self._pending:
+                return []
+            # Give concurrent callers a few ms to join this request
+            deadline = time.monotonic() + self.max_wait
+            while len(self._pending) < self.max_batch and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = self._pending[:self.max_batch]
+            del self._pending[:self.max_batch]
+            return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if not batch:
+                return
+            self._senders.submit(self._send, batch)
+
+    def _send(self, batch: List[Tuple[str, str, Future]]):
+        # Identical prompts in one batch share a single input slot
+        inputs = OrderedDict()
+        for key, prompt, _ in batch:
+            inputs.setdefault(key, prompt)
+        try:
+            resp = self.endpoint.call(lambda: self.session.post(
+                self.url,
+                headers={"Authorization": f"Bearer {self.openai_api_key}"},
+                json={"input": list(inputs.values())},
+                timeout=self.timeout,
+            ))
+            resp.raise_for_status()
+            results = resp.json()["results"]
+            if len(results) != len(inputs):
+                raise ValueError(f"Expected {len(inputs)} moderation results, got {len(results)}")
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        with self._cache_lock:
+            self.stats["requests"] += 1
+            self.stats["inputs"] += len(inputs)
+
+        verdicts = {}
+        for key, result in zip(inputs, results):
+            verdicts[key] = bool(result["flagged"])
+            self._cache_put(key, verdicts[key])
+        for key, _, future in batch:
+            future.set_result(not verdicts[key])
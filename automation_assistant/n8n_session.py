@@ -0,0 +1,175 @@
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+from . import tracing
+from .resilience import IDEMPOTENT_METHODS, Backoff, Endpoint, RetryPolicy
+
+
+def post_login(session: requests.Session, n8n_url: str, email: str, password: str) -> requests.Response:
+    """
+    POST the /rest/login form so that `session` receives the n8n auth cookie
+    """
+    resp = session.post(
+        f"{n8n_url}/rest/login",
+        data={
+            "emailOrLdapLoginId": email,
+            "password": password,
+        },
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+    )
+    resp.raise_for_status()
+    return resp
+
+
+class N8nSessionManager:
+    """
+    One authenticated, connection-pooled session to n8n shared by all callers.
+
+    Logs in once, re-authenticates transparently when n8n answers 401 and waits
+    for the instance with jittered exponential backoff. Every request goes
+    through the shared "n8n" Endpoint (retries, Retry-After, circuit breaker). Exposes
+    get/post/put/delete so it can be passed anywhere a requests.Session is used
+    (e.g. WorkflowBuilder). With a CookieCache the auth cookie survives process
+    restarts, so most starts cost one cheap validity check instead of a login.
+    """
+    def __init__(self, n8n_url: str, email: str, password: str,
+                 pool_size: int = 20, timeout: float = 30, cookie_cache=None):
+        self.n8n_url = n8n_url.rstrip("/")
+        self.email = email
+        self.password = password
+        self.timeout = timeout
+        self.cookie_cache = cookie_cache
+        self.endpoint = Endpoint("n8n", RetryPolicy.from_env("n8n", max_attempts=4, timeout=timeout, deadline=2 * timeout))
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._lock = threading.Lock()
+        # Bumped on every successful login so concurrent 401s trigger a single re-login
+        self._generation = 0
+        self._logged_in = False
+
+    def connect(self, max_wait: float = 60, initial_delay: float = 0.1, max_delay: float = 5) -> bool:
+        """
+        Wait for n8n to become ready and log in, backing off exponentially (with jitter) between probes.
+        Returns False if that didn't succeed within max_wait seconds.
+        """
+        if self.cookie_cache is not None and self._restore_cached_cookie():
+            return True
+
+        deadline = time.monotonic() + max_wait
+        backoff = Backoff(initial_delay, max_delay)
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                if self.is_ready():
+                    self.login()
+                    return True
+                reason = "not ready"
+            except requests.HTTPError as e:
+                if e.response is not None and e.response.status_code in (401, 403):
+                    # Wrong credentials won't fix themselves
+                    print(f"ERROR: n8n rejected login: {e}")
+                    return False
+                reason = str(e)
+            except requests.RequestException as e:
+                reason = str(e)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            delay = min(backoff.next(), remaining)
+            print(f"[Attempt {attempt}] n8n {reason}, retrying in {delay:.1f}s…")
+            time.sleep(delay)
+
+    def is_ready(self) -> bool:
+        """
+        Readiness probe against n8n's /healthz endpoint
+        """
+        try:
+            resp = self.session.get(f"{self.n8n_url}/healthz", timeout=self.timeout)
+        except requests.RequestException:
+            return False
+        return resp.status_code == 200
+
+    def _restore_cached_cookie(self) -> bool:
+        cookies = self.cookie_cache.load()
+        if not cookies:
+            return False
+        for c in cookies:
+            self.session.cookies.set(c["name"], c["value"], domain=c["domain"],
+                                     path=c["path"], expires=c["expires"])
+        try:
+            # GET /rest/login returns the current user for a valid cookie, 401 otherwise
+            resp = self.session.get(f"{self.n8n_url}/rest/login", timeout=self.timeout)
+        except requests.RequestException:
+            self.session.cookies.clear()
+            return False
+        if resp.status_code != 200:
+            self.session.cookies.clear()
+            self.cookie_cache.clear()
+            return False
+        with self._lock:
+            self._generation += 1
+            self._logged_in = True
+        print("DEBUG: Reusing cached n8n session cookie", flush=True)
+        return True
+
+    def _save_cookies(self):
+        self.cookie_cache.save([
+            {"name": c.name, "value": c.value, "domain": c.domain, "path": c.path, "expires": c.expires}
+            for c in self.session.cookies
+        ])
+
+    def login(self):
+        with self._lock:
+            self._login_locked()
+
+    def _login_locked(self):
+        with tracing.span("n8n.login", kind=tracing.KIND_CLIENT):
+            self.endpoint.call(lambda: post_login(self.session, self.n8n_url, self.email, self.password))
+        self._generation += 1
+        self._logged_in = True
+        if self.cookie_cache is not None:
+            self._save_cookies()
+
+    def _reauthenticate(self, stale_generation: int):
+        with self._lock:
+            # Another thread already refreshed the cookie after our request was sent
+            if self._generation == stale_generation:
+                print("DEBUG: n8n session expired, logging in again", flush=True)
+                self._login_locked()
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if not self._logged_in:
+            with self._lock:
+                if not self._logged_in:
+                    self._login_locked()
+        if not url.startswith("http"):
+            url = f"{self.n8n_url}/{url.lstrip('/')}"
+        kwargs.setdefault("timeout", self.timeout)
+        request_id = tracing.current_request_id()
+        if request_id:
+            # Lets n8n-side logs be correlated with our traces
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "X-Request-ID": request_id}
+        idempotent = method.upper() in IDEMPOTENT_METHODS
+        generation = self._generation
+        resp = self.endpoint.call(lambda: self.session.request(method, url, **kwargs), idempotent)
+        if resp.status_code == 401:
+            tracing.set_attribute("n8n.reauthenticated", True)
+            self._reauthenticate(generation)
+            resp = self.endpoint.call(lambda: self.session.request(method, url, **kwargs), idempotent)
+        return resp
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
@@ -0,0 +1,224 @@
+import hashlib
+import json
+import os
+import threading
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+SPEC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "node_specs")
+INDEX_FILE = "_index.json"
+
+
+class FrozenDict(dict):
+    """
+    Read-only dict. Still a dict for isinstance checks and json.dumps, so frozen
+    defaults can be handed out without defensive copies. deepcopy() and thaw()
+    return plain, mutable structures.
+    """
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("FrozenDict is read-only; use thaw() for a mutable copy")
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __hash__(self):
+        return hash(tuple(sorted(self.items())))
+
+    def __deepcopy__(self, memo):
+        return thaw(self)
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+EMPTY = FrozenDict()
+
+
+def freeze(value: Any) -> Any:
+    """
+    Recursively turn dicts into FrozenDicts and lists into tuples
+    """
+    if isinstance(value, dict):
+        return value if isinstance(value, FrozenDict) else FrozenDict((k, freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def thaw(value: Any) -> Any:
+    """
+    Mutable deep copy of a (possibly frozen) tree: dicts and lists all the way down
+    """
+    if isinstance(value, dict):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [thaw(v) for v in value]
+    return value
+
+
+class NodeVersion:
+    __slots__ = ("version", "parameters", "credentials", "required", "outputs")
+
+    def __init__(self, version: int, data: Dict[str, Any]):
+        self.version = version
+        self.parameters: FrozenDict = freeze(data.get("parameters", {}))
+        self.credentials: FrozenDict = freeze(data.get("credentials", {}))
+        self.required: Tuple[str, ...] = tuple(data.get("required", ()))
+        # Output port names, by index (IF: true, false)
+        self.outputs: Tuple[str, ...] = tuple(data.get("outputs", ("main",)))
+
+
+class NodeSpec:
+    """
+    One n8n node type: display name, aliases, prompt notes, whether it starts a
+    workflow, and one NodeVersion per typeVersion
+    """
+    def __init__(self, data: Dict[str, Any]):
+        self.type: str = data["type"]
+        self.display_name: str = data.get("displayName", self.type.split(".")[-1])
+        self.aliases: Tuple[str, ...] = tuple(data.get("aliases", ()))
+        self.prompt: str = data.get("prompt", "")
+        self.trigger: bool = data.get("trigger", False)
+        self.versions: Dict[int, NodeVersion] = {
+            int(v): NodeVersion(int(v), d) for v, d in data.get("versions", {}).items()
+        }
+        if not self.versions:
+            raise ValueError(f"Node spec {self.type} has no versions")
+        self.default_version: int = int(data.get("defaultVersion", max(self.versions)))
+        self._sorted_versions = sorted(self.versions)
+
+    def version(self, version: Optional[int] = None) -> NodeVersion:
+        """
+        Exact typeVersion if known, else the newest older one, else the default
+        """
+        if version is None:
+            return self.versions[self.default_version]
+        try:
+            version = int(version)
+        except (TypeError, ValueError):
+            return self.versions[self.default_version]
+        if version in self.versions:
+            return self.versions[version]
+        older = [v for v in self._sorted_versions if v <= version]
+        return self.versions[older[-1] if older else self.default_version]
+
+
+class NodeRegistry:
+    """
+    Node specs loaded on demand from per-node JSON files in `spec_dir`.
+
+    Only the small index (type -> file, aliases) is read up front; a spec file
+    is parsed the first time its type is looked up, and its parameter trees
+    are frozen once so every caller shares them.
+    """
+    def __init__(self, spec_dir: str = SPEC_DIR):
+        self.spec_dir = spec_dir
+        self._lock = threading.Lock()
+        self._files: Optional[Dict[str, str]] = None
+        self._aliases: Dict[str, str] = {}
+        self._specs: Dict[str, NodeSpec] = {}
+        self._fingerprint: Optional[str] = None
+
+    def _load_index(self):
+        index_path = os.path.join(self.spec_dir, INDEX_FILE)
+        if os.path.exists(index_path):
+            with open(index_path, encoding="utf-8") as f:
+                index = json.load(f)
+        else:
+            index = build_index(self.spec_dir)
+        files, aliases = {}, {}
+        for node_type, entry in index.items():
+            files[node_type] = entry["file"]
+            for alias in entry.get("aliases", ()):
+                aliases[alias] = node_type
+        self._aliases = aliases
+        self._files = files
+
+    def _index(self) -> Dict[str, str]:
+        if self._files is None:
+            with self._lock:
+                if self._files is None:
+                    self._load_index()
+        return self._files
+
+    def types(self) -> List[str]:
+        return list(self._index())
+
+    def __contains__(self, name: str) -> bool:
+        return self.resolve(name) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.types())
+
+    def resolve(self, name: Optional[str]) -> Optional[str]:
+        """
+        Canonical node type for a type name or alias, None if unknown
+        """
+        files = self._index()
+        if name in files:
+            return name
+        return self._aliases.get(name)
+
+    def get(self, name: Optional[str]) -> Optional[NodeSpec]:
+        node_type = self.resolve(name)
+        if node_type is None:
+            return None
+        spec = self._specs.get(node_type)
+        if spec is None:
+            with self._lock:
+                spec = self._specs.get(node_type)
+                if spec is None:
+                    with open(os.path.join(self.spec_dir, self._files[node_type]), encoding="utf-8") as f:
+                        spec = self._specs[node_type] = NodeSpec(json.load(f))
+        return spec
+
+    def defaults(self, name: Optional[str], version: Optional[int] = None) -> FrozenDict:
+        """
+        Frozen default parameters (empty for unknown types)
+        """
+        spec = self.get(name)
+        return spec.version(version).parameters if spec else EMPTY
+
+    def credentials(self, name: Optional[str], version: Optional[int] = None) -> FrozenDict:
+        spec = self.get(name)
+        return spec.version(version).credentials if spec else EMPTY
+
+    def required(self, name: Optional[str], version: Optional[int] = None) -> Tuple[str, ...]:
+        spec = self.get(name)
+        return spec.version(version).required if spec else ()
+
+    def fingerprint(self) -> str:
+        """
+        Digest of every spec file, for cache keys; changes whenever a spec is edited
+        """
+        if self._fingerprint is None:
+            digest = hashlib.sha256()
+            for node_type, filename in sorted(self._index().items()):
+                digest.update(node_type.encode("utf-8"))
+                with open(os.path.join(self.spec_dir, filename), "rb") as f:
+                    digest.update(f.read())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+
+def build_index(spec_dir: str = SPEC_DIR) -> Dict[str, Dict[str, Any]]:
+    """
+    Scan every spec file; used to (re)generate _index.json after adding specs
+    """
+    index = {}
+    for filename in sorted(os.listdir(spec_dir)):
+        if not filename.endswith(".json") or filename == INDEX_FILE:
+            continue
+        with open(os.path.join(spec_dir, filename), encoding="utf-8") as f:
+            data = json.load(f)
+        index[data["type"]] = {"file": filename, "aliases": sorted(data.get("aliases", []))}
+    return index
+
+
+# Shared registry for the bundled specs
+NODES = NodeRegistry()
+
+
+if __name__ == "__main__":
+    with open(os.path.join(SPEC_DIR, INDEX_FILE), "w", encoding="utf-8") as f:
+        json.dump(build_index(), f, indent=2)
+        f.write("\n")
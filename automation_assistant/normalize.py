@@ -0,0 +1,127 @@
+from typing import Any, Dict, List, Optional
+from .node_registry import NODES, freeze
+from .graph import GraphError, WorkflowGraph
+from .layout import apply_layout
+from .prompts import VALIDATE_EMAILS_CODE
+
+# Replaces wrong/legacy Aggregate parameters (the deprecated Item Lists shape)
+AGGREGATE_EMAILS_PARAMS = freeze({
+    "aggregation": {
+        "mode": "append",
+        "fields": [
+            {
+                "fieldName": "*",
+                "aggregatedAs": "emails",
+                "aggregationFunction": "append"
+            }
+        ]
+    },
+    "options": {}
+})
+LEGACY_AGGREGATE_KEYS = ("operation", "fieldsToAggregate", "outputType")
+
+
+class NormalizedPlan(dict):
+    """
+    A plan that already went through normalize_plan(): node types resolved,
+    defaults and credentials merged, connections completed. WorkflowBuilder
+    uses its nodes as they are instead of merging defaults a second time.
+    """
+
+
+def merge_defaults(defaults: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Deep merge of a node's parameters over its (frozen) defaults, copy-on-write:
+    keys the node doesn't set keep referencing the shared default subtree, and
+    only dicts present on both sides are rebuilt. Neither argument is modified.
+    """
+    if not defaults:
+        return params
+    merged = dict(defaults)
+    for key, value in params.items():
+        base = merged.get(key)
+        if isinstance(base, dict) and isinstance(value, dict):
+            merged[key] = merge_defaults(base, value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def normalize_node(node: Dict[str, Any], idx: int) -> Dict[str, Any]:
+    """
+    Fill ids and names, resolve the node type and merge registry defaults and
+    credentials, in place. Running it twice gives the same node. Positions are
+    assigned per plan, once connections are known (see layout.py).
+    """
+    node_type = NODES.resolve(node.get("type")) or node.get("type", "")
+    spec = NODES.get(node_type)
+    node["type"] = node_type
+    node.setdefault("id", f"node{idx+1}")
+    node.setdefault("name", spec.display_name if spec else f"Node {idx + 1}")
+    node.setdefault("typeVersion", spec.default_version if spec else 1)
+    node.setdefault("disabled", False)
+
+    params = node.get("parameters")
+    if not isinstance(params, dict):
+        params = {}
+    if node_type == "n8n-nodes-base.aggregate":
+        if any(key in params for key in LEGACY_AGGREGATE_KEYS) or "aggregation" not in params:
+            params = AGGREGATE_EMAILS_PARAMS
+    # The modular system prompt leaves the guardrail code to us
+    elif node_type == "n8n-nodes-base.code" and node["name"] == "Validate Emails" and "functionCode" not in params:
+        params = {**params, "functionCode": VALIDATE_EMAILS_CODE}
+
+    if spec is None:
+        node["parameters"] = params
+        return node
+    version = spec.version(node["typeVersion"])
+    node["parameters"] = merge_defaults(version.parameters, params)
+    if version.credentials:
+        node["credentials"] = version.credentials
+    else:
+        # Triggers and other credential-less nodes: n8n rejects stray credentials
+        node.pop("credentials", None)
+    return node
+
+
+def sequential_connections(nodes: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Connect every node to the next one, in plan order
+    """
+    return {
+        a["name"]: {"main": [[{"node": b["name"], "type": "main", "index": 0}]]}
+        for a, b in zip(nodes, nodes[1:])
+    }
+
+
+def _leaves_nodes_unreachable(nodes: List[Dict[str, Any]], connections: Dict[str, Any]) -> bool:
+    try:
+        return bool(WorkflowGraph.from_plan(nodes, connections).orphans())
+    except GraphError:
+        # Duplicate names: leave the plan for the builder to reject
+        return False
+
+
+def complete_connections(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Auto-create connections if missing or incomplete (some node unreachable)
+    """
+    nodes = plan["nodes"]
+    existing_connections = plan.get("connections", {})
+    if not existing_connections or _leaves_nodes_unreachable(nodes, existing_connections):
+        plan["connections"] = sequential_connections(nodes)
+        if plan["connections"]:
+            print(f"DEBUG: Auto-created {len(plan['connections'])} connections", flush=True)
+    return plan
+
+
+def normalize_plan(plan: Dict[str, Any], nodes: Optional[List[Dict[str, Any]]] = None) -> NormalizedPlan:
+    """
+    The single normalization pass between the LLM (or template, cache, retrieval)
+    and the builder. `nodes` are already-normalized nodes, e.g. from streaming.
+    """
+    if nodes is None:
+        nodes = [normalize_node(node, idx) for idx, node in enumerate(plan.get("nodes") or [])]
+    normalized = plan if isinstance(plan, NormalizedPlan) else NormalizedPlan(plan)
+    normalized["nodes"] = nodes
+    return apply_layout(complete_connections(normalized))
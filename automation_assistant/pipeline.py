@@ -0,0 +1,182 @@
+import copy
+from contextlib import contextmanager
+from typing import Any, Dict, Optional
+from .guardrails import LatencyMetrics
+from .editing import apply_edit
+from .metrics import IN_FLIGHT, WORKFLOWS
+from . import tracing
+from .usage import BudgetExceededError, collect_usage, summarize
+
+
+class PipelineError(Exception):
+    """
+    Raised when a prompt is rejected or fails at one of the pipeline stages
+    """
+    def __init__(self, stage: str, message: str):
+        super().__init__(message)
+        self.stage = stage
+
+
+@contextmanager
+def record_outcome():
+    """
+    Count the prompt in workflows_total as a success or as a failure at its stage
+    """
+    try:
+        yield
+    except PipelineError as e:
+        WORKFLOWS.inc(outcome="failure", stage=e.stage)
+        raise
+    except Exception:
+        WORKFLOWS.inc(outcome="failure", stage="unknown")
+        raise
+    else:
+        WORKFLOWS.inc(outcome="success", stage="")
+
+
+@contextmanager
+def stage(name: str, metrics: LatencyMetrics):
+    """
+    Time a pipeline stage in LatencyMetrics and as a "pipeline.<name>" span.
+    A stage that raises keeps no latency, as before.
+    """
+    metrics.start(name)
+    with tracing.span(f"pipeline.{name}") as span:
+        yield span
+    metrics.stop(name)
+
+
+class WorkflowPipeline:
+    """
+    Guardrails -> LLMParser -> WorkflowBuilder pipeline.
+
+    Holds one parser, validator and builder so they can be reused across
+    many prompts (CLI run, server mode, batch jobs).
+    """
+    def __init__(self, parser, validator, builder, openai_api_key: str, stream: bool = False):
+        self.parser = parser
+        self.validator = validator
+        self.builder = builder
+        self.openai_api_key = openai_api_key
+        # Stream LLM output and validate nodes as they arrive (LLMParser.parse_stream)
+        self.stream = stream
+
+    def run(self, prompt: str, metrics: Optional[LatencyMetrics] = None) -> Dict[str, Any]:
+        """
+        Turn a prompt into a workflow created in n8n and return the workflow data
+        """
+        metrics = metrics if metrics is not None else LatencyMetrics()
+        with IN_FLIGHT.track_inprogress(mode="sync"), record_outcome(), \
+                tracing.span("workflow.run", {"pipeline.mode": "sync", "llm.stream": self.stream}), \
+                collect_usage() as calls:
+            workflow = self._run(prompt, metrics)
+            workflow["llm_usage"] = summarize(calls)
+            return workflow
+
+    def _run(self, prompt: str, metrics: LatencyMetrics) -> Dict[str, Any]:
+        self._check_prompt(prompt, metrics)
+
+        # 3. LLM
+        with stage("llm_generation", metrics):
+            try:
+                if self.stream:
+                    plan = self.parser.parse_stream(
+                        prompt, node_validator=self.validator.validate_node, metrics=metrics
+                    )
+                else:
+                    plan = self.parser.parse(prompt)
+            except BudgetExceededError as e:
+                raise PipelineError("budget", str(e)) from e
+            except Exception as e:
+                raise PipelineError("llm_generation", f"LLM failed to generate a plan: {e}") from e
+
+        return self._build_and_remember(prompt, plan, metrics)
+
+    def _check_prompt(self, prompt: str, metrics: LatencyMetrics):
+        # 1. Pre-moderation (blacklist/length)
+        with stage("pre_validation", metrics):
+            if not self.validator.validate_input(prompt):
+                raise PipelineError(
+                    "pre_validation",
+                    "Prompt failed safety validation. Please try again with a safer request."
+                )
+
+        # 2. Moderation API
+        with stage("moderation", metrics):
+            if not self.validator.moderate_prompt(prompt, self.openai_api_key):
+                raise PipelineError("moderation", "Prompt failed OpenAI moderation. Please try again.")
+
+    def modify(self, workflow_id: str, instruction: str,
+               metrics: Optional[LatencyMetrics] = None) -> Dict[str, Any]:
+        """
+        Apply a natural-language change to an existing n8n workflow via a JSON
+        Patch from the LLM, and return the updated workflow data
+        """
+        metrics = metrics if metrics is not None else LatencyMetrics()
+        with IN_FLIGHT.track_inprogress(mode="edit"), record_outcome(), \
+                tracing.span("workflow.modify", {"pipeline.mode": "edit", "workflow.id": workflow_id}), \
+                collect_usage() as calls:
+            workflow = self._modify(workflow_id, instruction, metrics)
+            workflow["llm_usage"] = summarize(calls)
+            return workflow
+
+    def _modify(self, workflow_id: str, instruction: str, metrics: LatencyMetrics) -> Dict[str, Any]:
+        self._check_prompt(instruction, metrics)
+
+        with stage("fetch", metrics):
+            try:
+                current = self.builder.get_workflow(workflow_id)
+            except Exception as e:
+                raise PipelineError("fetch", f"Could not load workflow {workflow_id}: {e}") from e
+
+        with stage("llm_generation", metrics):
+            try:
+                patch = self.parser.generate_patch(instruction, current)
+            except BudgetExceededError as e:
+                raise PipelineError("budget", str(e)) from e
+            except Exception as e:
+                raise PipelineError("llm_generation", f"LLM failed to generate a patch: {e}") from e
+
+        with stage("post_validation", metrics) as span:
+            span.set_attribute("patch.op_count", len(patch))
+            try:
+                updated = apply_edit(current, patch, self.validator)
+                self.builder.check_workflow(updated, current)
+            except ValueError as e:
+                raise PipelineError("post_validation", f"Edited workflow is invalid: {e}") from e
+
+        with stage("workflow_update", metrics):
+            try:
+                return self.builder.update_workflow(workflow_id, updated)
+            except Exception as e:
+                raise PipelineError("workflow_update", f"Workflow update failed: {e}") from e
+
+    def _build_and_remember(self, prompt: str, plan: Dict[str, Any], metrics: LatencyMetrics) -> Dict[str, Any]:
+        # The builder fills parameters in place; index the plan as the parser produced it
+        remember = getattr(self.parser, "remember_success", None)
+        snapshot = copy.deepcopy(plan) if remember is not None else None
+        workflow = self._build(plan, metrics)
+        if remember is not None:
+            remember(prompt, snapshot)
+        return workflow
+
+    def _build(self, plan: Dict[str, Any], metrics: LatencyMetrics) -> Dict[str, Any]:
+        # 4. Post-moderation
+        with stage("post_validation", metrics) as span:
+            span.set_attribute("plan.node_count", len(plan.get("nodes") or []))
+            if not self.validator.validate_plan(plan):
+                raise PipelineError(
+                    "post_validation",
+                    "Workflow plan failed schema validation. Please check your input."
+                )
+
+        # 5. Build and create workflow in n8n
+        with stage("workflow_creation", metrics):
+            try:
+                workflow = self.builder.create_workflow(plan)
+            except Exception as e:
+                raise PipelineError("workflow_creation", f"Workflow creation failed: {e}") from e
+
+        if "data" in workflow:
+            return workflow["data"]
+        return workflow
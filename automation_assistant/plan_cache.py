@@ -0,0 +1,150 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from .metrics import CACHE_REQUESTS
+
+DEFAULT_CACHE_PATH = os.path.join("~", ".cache", "automation_assistant", "plans.sqlite")
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    Canonical form used for cache keys: NFKC, case-folded, single-spaced, no trailing punctuation
+    """
+    text = unicodedata.normalize("NFKC", prompt).casefold()
+    return " ".join(text.split()).rstrip(".!? ")
+
+
+def fingerprint(*parts: Any) -> str:
+    """
+    Stable sha256 over JSON-serializable parts (prompt text, catalogs, ...)
+    """
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """
+    Two-tier prompt -> plan cache: in-memory LRU in front of a SQLite file.
+
+    Entries expire after `ttl` seconds; each tier is capped by entry count and
+    evicts least recently used entries first. Plans are stored as JSON text so
+    every hit returns a fresh copy that callers may mutate.
+    """
+    def __init__(self, path: Optional[str] = None, max_memory_entries: int = 1024,
+                 max_disk_entries: int = 100_000, ttl: float = 7 * 24 * 3600):
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._puts_since_evict = 0
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+        self._db = None
+        if path:
+            path = os.path.expanduser(path)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS plans ("
+                "key TEXT PRIMARY KEY, plan TEXT NOT NULL, expires REAL NOT NULL, accessed REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS plans_accessed ON plans(accessed)")
+            self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["PlanCache"]:
+        """
+        Build the cache from PLAN_CACHE_PATH / PLAN_CACHE_TTL; PLAN_CACHE_PATH=off disables it
+        """
+        path = os.getenv("PLAN_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if path.lower() in ("", "0", "off", "false"):
+            return None
+        if path.lower() == "memory":
+            path = None
+        return cls(path, ttl=float(os.getenv("PLAN_CACHE_TTL", str(7 * 24 * 3600))))
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires, raw = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    self.stats["memory_hits"] += 1
+                    CACHE_REQUESTS.inc(cache="plan", result="memory_hit")
+                    return json.loads(raw)
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT plan, expires FROM plans WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None:
+                    raw, expires = row
+                    if expires > now:
+                        self._db.execute("UPDATE plans SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, expires, raw)
+                        self.stats["disk_hits"] += 1
+                        CACHE_REQUESTS.inc(cache="plan", result="disk_hit")
+                        return json.loads(raw)
+                    self._db.execute("DELETE FROM plans WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.stats["misses"] += 1
+            CACHE_REQUESTS.inc(cache="plan", result="miss")
+            return None
+
+    def put(self, key: str, plan: Dict[str, Any]):
+        now = time.time()
+        expires = now + self.ttl
+        raw = json.dumps(plan, ensure_ascii=False)
+        with self._lock:
+            self._remember(key, expires, raw)
+            self.stats["stores"] += 1
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO plans (key, plan, expires, accessed) VALUES (?, ?, ?, ?)",
+                    (key, raw, expires, now),
+                )
+                self._puts_since_evict += 1
+                # Amortize the COUNT(*) scan instead of paying it on every store
+                if self._puts_since_evict >= max(1, min(64, self.max_disk_entries // 16)):
+                    self._evict_disk(now)
+                    self._puts_since_evict = 0
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM plans")
+                self._db.commit()
+
+    def _remember(self, key: str, expires: float, raw: str):
+        self._memory[key] = (expires, raw)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def _evict_disk(self, now: float):
+        self._db.execute("DELETE FROM plans WHERE expires <= ?", (now,))
+        (count,) = self._db.execute("SELECT COUNT(*) FROM plans").fetchone()
+        overflow = count - self.max_disk_entries
+        if overflow > 0:
+            self._db.execute(
+                "DELETE FROM plans WHERE key IN (SELECT key FROM plans ORDER BY accessed LIMIT ?)",
+                (overflow,),
+            )
+            self.stats["evictions"] += overflow
+
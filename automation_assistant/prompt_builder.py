@@ -0,0 +1,124 @@
+import json
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Iterable, Tuple
+from .prompts import EDIT_SYSTEM_PROMPT_PREFIX, SYSTEM_PROMPT_PREFIX
+from .node_registry import NODES
+
+# Fragment order is fixed so requests needing the same node types share the same prompt
+NODE_ORDER = (
+    "n8n-nodes-base.cron",
+    "n8n-nodes-base.googleGmail",
+    "n8n-nodes-base.code",
+    "n8n-nodes-base.aggregate",
+    "n8n-nodes-base.openai",
+    "n8n-nodes-base.emailSend",
+    "n8n-nodes-base.if",
+    "n8n-nodes-base.httpRequest",
+)
+
+# A workflow always needs a trigger, and cron is the only one supported
+ALWAYS_INCLUDED = frozenset({"n8n-nodes-base.cron"})
+
+# Node types the prompt's own rules pull in (Gmail -> Validate Emails -> Aggregate)
+IMPLIED_NODES = {
+    "n8n-nodes-base.googleGmail": ("n8n-nodes-base.code", "n8n-nodes-base.aggregate"),
+}
+
+NODE_KEYWORDS = {
+    "n8n-nodes-base.googleGmail": r"gmail|inbox|e-?mails?\b(?! (me|us)\b)|mailbox|unread",
+    "n8n-nodes-base.openai": r"summar|openai|gpt|\bai\b|llm|classif|translat|generat|analy[sz]|rewrite|sentiment|extract",
+    "n8n-nodes-base.emailSend": r"\bsend\b|e-?mail (me|us|it|them|the)|mail me|notify|notification|report|[\w.+-]+@[\w-]+\.",
+    "n8n-nodes-base.if": r"\bif\b|\bwhen\b|\bonly\b|unless|condition|otherwise|threshold|greater|less than|more than",
+    "n8n-nodes-base.httpRequest": r"https?://|\bhttp\b|\bapi\b|\burl\b|webhook|endpoint|website|download|\bget request",
+    "n8n-nodes-base.code": r"\bcode\b|javascript|script|validat|filter|transform",
+    "n8n-nodes-base.aggregate": r"aggregat|combine|merge|collect|batch",
+}
+
+_KEYWORD_RES = {node_type: re.compile(pattern) for node_type, pattern in NODE_KEYWORDS.items()}
+
+
+def classify_node_types(prompt: str) -> FrozenSet[str]:
+    """
+    Node types a prompt is likely to need, by keyword. Cheap enough to run on
+    every request; over-selecting only costs tokens, so the patterns are loose.
+    """
+    text = prompt.lower()
+    selected = set(ALWAYS_INCLUDED)
+    for node_type, regex in _KEYWORD_RES.items():
+        if regex.search(text):
+            selected.add(node_type)
+    for node_type in list(selected):
+        selected.update(IMPLIED_NODES.get(node_type, ()))
+    if selected == ALWAYS_INCLUDED:
+        # Nothing recognized: let the model see every node type
+        return frozenset(NODE_ORDER)
+    return frozenset(selected)
+
+
+# Defaults longer than this are inlined as a skeleton: the full nesting of keys,
+# one example per list and short scalar values, with long strings replaced by
+# "<string>". LLMParser merges the full registry defaults into every node anyway
+MAX_INLINE_PARAMS = 160
+MAX_INLINE_VALUE = 24
+
+
+def _skeleton(value):
+    if isinstance(value, dict):
+        return {key: _skeleton(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_skeleton(value[0])] if value else []
+    if isinstance(value, str) and len(value) > MAX_INLINE_VALUE:
+        return "<string>"
+    return value
+
+
+def node_fragment(node_type: str) -> str:
+    spec = NODES.get(node_type)
+    lines = [f"### {node_type}", spec.prompt if spec else ""]
+    defaults = NODES.defaults(node_type)
+    if defaults:
+        params = json.dumps(defaults, ensure_ascii=False, separators=(",", ":"))
+        if len(params) > MAX_INLINE_PARAMS:
+            params = json.dumps(_skeleton(defaults), ensure_ascii=False, separators=(",", ":"))
+        lines.append(f"parameters: {params}")
+    return "\n".join(line for line in lines if line)
+
+
+@lru_cache(maxsize=256)
+def _assemble(node_types: Tuple[str, ...]) -> str:
+    return SYSTEM_PROMPT_PREFIX + "\n\n".join(node_fragment(t) for t in node_types)
+
+
+def build_system_prompt(node_types: Iterable[str]) -> str:
+    """
+    Shared prefix followed by one fragment per node type in NODE_ORDER.
+    Identical node sets return the identical (cached) string.
+    """
+    wanted = set(node_types)
+    ordered = tuple(t for t in NODE_ORDER if t in wanted)
+    ordered += tuple(sorted(wanted - set(NODE_ORDER)))
+    return _assemble(ordered)
+
+
+def system_prompt_for(prompt: str) -> str:
+    return build_system_prompt(classify_node_types(prompt))
+
+
+def edit_system_prompt_for(instruction: str) -> str:
+    """
+    Edit-mode prompt: the patch instructions plus fragments for node types the
+    change request mentions (none when it mentions no recognizable type)
+    """
+    node_types = classify_node_types(instruction) - ALWAYS_INCLUDED
+    if node_types == frozenset(NODE_ORDER) - ALWAYS_INCLUDED:
+        node_types = frozenset()
+    ordered = [t for t in NODE_ORDER if t in node_types]
+    return EDIT_SYSTEM_PROMPT_PREFIX + "\n\n".join(node_fragment(t) for t in ordered)
+
+
+def prompt_fingerprint_parts() -> Dict[str, object]:
+    """
+    Everything assembled prompts are derived from, for cache keys
+    """
+    return {"prefix": SYSTEM_PROMPT_PREFIX, "nodes": NODES.fingerprint(), "keywords": NODE_KEYWORDS}
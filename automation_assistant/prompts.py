@@ -143,121 +143,96 @@ IMPORTANT NOTES:
 - Ensure all required fields are present
 - Generate only valid JSON without any markdown formatting"""
 
-N8N_NODE_TYPES = {
-    "schedule": "n8n-nodes-base.cron",
-    "gmail": "n8n-nodes-base.googleGmail",
-    "openai": "n8n-nodes-base.openai",
-    "sendEmail": "n8n-nodes-base.emailSend",
-    "if": "n8n-nodes-base.if",
-    "aggregate": "n8n-nodes-base.aggregate",
-}
+# 'Validate Emails' Code node body required by LLM_SYSTEM_PROMPT (also used by the template fast path)
+VALIDATE_EMAILS_CODE = (
+    "// Filters emails with forbidden words\n"
+    "const forbidden = ['spam','scam','viagra','offensive'];\n"
+    "let clean = [];\n"
+    "let flagged = [];\n"
+    "for (const item of items) {\n"
+    "  const subject = (item.json.subject || '').toLowerCase();\n"
+    "  const snippet = (item.json.snippet || '').toLowerCase();\n"
+    "  let bad = false;\n"
+    "  for (const word of forbidden) {\n"
+    "    if (subject.includes(word) || snippet.includes(word)) {\n"
+    "      bad = true;\n"
+    "      break;\n"
+    "    }\n"
+    "  }\n"
+    "  if (bad) {\n"
+    "    flagged.push(item);\n"
+    "  } else {\n"
+    "    clean.push(item);\n"
+    "  }\n"
+    "}\n"
+    "return [{ json: { filtered: clean.length, flagged: flagged.length } }, ...clean];"
+)
+
+
+# Modular system prompt (see prompt_builder.py). The prefix is identical for every
+# request so provider-side prompt caching can reuse it; node fragments follow.
+SYSTEM_PROMPT_PREFIX = """You are an expert n8n workflow architect. Generate complete, production-ready n8n workflow JSON.
+
+CRITICAL REQUIREMENTS:
+1. Always include ALL required parameters for each node type.
+2. Use proper n8n expression syntax: ={{$json.field}} or ={{$node("NodeName").json.field}}.
+3. Create sequential connections between nodes automatically.
+4. Use modern n8n parameter structure (v1.0+).
+5. Generate only valid JSON - no explanations or comments.
+6. Set the parameters the request specifies; omitted defaults and credentials are filled in automatically.
+
+OUTPUT FORMAT:
+{"nodes": [{"id": "trigger1", "name": "Schedule Trigger", "type": "n8n-nodes-base.cron", "typeVersion": 1,
+  "parameters": {...}, "disabled": false}, ...],
+ "connections": {"Schedule Trigger": {"main": [[{"node": "<next node name>", "type": "main", "index": 0}]]}}}
+
+IMPORTANT NOTES:
+- Always use node NAMES in connections, not IDs
+- Omit node positions; the workflow is laid out automatically from its connections
+- Use realistic parameter values
+- Generate only valid JSON without any markdown formatting
+
+NODE TYPES (only use the types listed here):
+"""
+
+# Edit mode (see editing.py): the model sees a compact summary of an existing
+# workflow and answers with a JSON Patch instead of regenerating all of it.
+EDIT_SYSTEM_PROMPT_PREFIX = """You are an expert n8n workflow architect. You edit existing n8n workflows.
+
+You get a summary of the current workflow and a change request. Reply with ONLY an RFC 6902 JSON Patch
+that makes the requested change, as JSON: {"patch": [{"op": "replace", "path": "/nodes/1/parameters/url", "value": "..."}]}
+
+RULES:
+1. Paths are JSON Pointers into the n8n workflow: /nodes/<index>/... using the index shown in the summary,
+   /connections/<node name>/main/<output>/... for connections.
+2. Change only what the request asks for; never repeat unchanged nodes or parameters.
+3. Add new nodes with {"op": "add", "path": "/nodes/-", "value": {"name": ..., "type": ..., "parameters": {...}}}.
+   Omit ids, positions and credentials; they are filled in automatically.
+4. Connect nodes by NAME: {"op": "add", "path": "/connections/<source name>", "value": {"main": [[{"node": "<target name>", "type": "main", "index": 0}]]}}
+   (use "replace" when the source already has connections). Keep the workflow connected.
+5. When removing a node, also remove its connections and anything pointing at it.
+6. Parameters marked "(+N defaults)" in the summary are set to their defaults and don't need repeating.
+
+NODE TYPES you may add (defaults are filled in automatically):
+"""
+
+# Per-node-type catalogs now live in node_specs/ (see node_registry.py). These
+# names are kept as plain-dict snapshots for older callers, built on first use.
+_COMPAT_VIEWS = ("N8N_NODE_TYPES", "COMPLETE_PARAMS", "FAKE_CREDENTIALS", "NODE_PROMPT_NOTES")
 
-COMPLETE_PARAMS = {
-    "n8n-nodes-base.cron": {
-        
-                "mode": "custom",
-                "cronExpression": "0 10 * * 1",
-                "timezone": "UTC"       
-    },
-    "n8n-nodes-base.googleGmail": {
-        "resource": "message",
-        "operation": "getAll",
-        "returnAll": True,
-        "limit": 50,
-        "simple": False,
-        "filters": {
-            "labelIds": ["UNREAD"],
-            "includeSpamTrash": False
-        },
-        "options": {
-            "attachments": False,
-            "format": "full"
-        }
-    },
-    "n8n-nodes-base.aggregate": {
-    "aggregation": {
-        "mode": "append",
-        "fields": [
-            {
-                "fieldName": "*",            
-                "aggregatedAs": "emails",    
-                "aggregationFunction": "append"
-            }
-        ]
-    },
-    "options": {}
-    },
-    "n8n-nodes-base.openai": {
-        "resource": "chat",
-        "operation": "chat",
-        "model": "gpt-4o-mini",
-        "options": {
-            "temperature": 0.3,
-            "maxTokens": 1000,
-            "topP": 1,
-            "frequencyPenalty": 0,
-            "presencePenalty": 0
-        },
-        "messagesUi": {
-            "messageValues": [
-                {
-                    "role": "system", 
-                    "content": "You are a helpful assistant that summarizes emails. Create a concise summary in markdown format."
-                },
-                {
-                    "role": "user", 
-                    "content": "={{$json.emails.map(email => `Subject: ${email.subject}\\nFrom: ${email.from}\\nSnippet: ${email.snippet}`).join('\\n\\n')}}"
-                }
-            ]
-        },
-        "simplifyOutput": False
-    },
-    "n8n-nodes-base.emailSend": {
-        "fromEmail": "noreply@yourdomain.com",
-        "toEmail": "user@example.com",
-        "subject": "📧 Weekly Email Summary - {{$now.format('YYYY-MM-DD')}}",
-        "message": "={{$json.message.content || $json}}",
-        "options": {
-            "allowUnauthorizedCerts": False,
-            "replyTo": "",
-            "cc": "",
-            "bcc": "",
-            "priority": "normal"
-        },
-        "transport": "smtp"
-    },
-    "n8n-nodes-base.if": {
-        "conditions": {
-            "boolean": [],
-            "number": [
-                {
-                    "value1": "={{$json.count}}",
-                    "operation": "larger",
-                    "value2": 0
-                }
-            ],
-            "string": []
-        },
-        "combineOperation": "all"
-    },
-    "n8n-nodes-base.httpRequest": {
-        "method": "GET",
-        "url": "",
-        "authentication": "none",
-        "options": {
-            "response": {
-                "response": {
-                    "responseFormat": "json"
-                }
-            }
-        }
-    }
-}
 
-FAKE_CREDENTIALS = {
-    "n8n-nodes-base.googleGmail": {"googleApi": {"id": "1", "name": "Fake Google Account"}},
-    "n8n-nodes-base.openai": {"openAiApi": {"id": "1", "name": "Fake OpenAI Account"}},
-    "n8n-nodes-base.emailSend": {"smtp": {"id": "1", "name": "Fake SMTP Account"}},
-    "n8n-nodes-base.httpRequest": {"httpBasicAuth": {"id": "1", "name": "Fake HTTP Basic"}},
-    "n8n-nodes-base.aggregate": {},
-}
\ No newline at end of file
+def __getattr__(name):
+    if name not in _COMPAT_VIEWS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from .node_registry import NODES, thaw
+    types = NODES.types()
+    if name == "N8N_NODE_TYPES":
+        value = {alias: t for t in types for alias in NODES.get(t).aliases}
+    elif name == "COMPLETE_PARAMS":
+        value = {t: thaw(NODES.defaults(t)) for t in types if NODES.defaults(t)}
+    elif name == "FAKE_CREDENTIALS":
+        value = {t: thaw(NODES.credentials(t)) for t in types if NODES.credentials(t)}
+    else:
+        value = {t: NODES.get(t).prompt for t in types}
+    globals()[name] = value
+    return value
@@ -0,0 +1,324 @@
+import asyncio
+import email.utils
+import os
+import random
+import threading
+import time
+from typing import Any, Awaitable, Callable, Optional
+import openai
+import requests
+from .metrics import CIRCUIT_OPEN, OUTBOUND_CALLS, OUTBOUND_LATENCY
+from . import tracing
+
+# HTTP statuses worth retrying; other 4xx won't change on a retry
+RETRY_STATUSES = frozenset({408, 425, 429, 500, 502, 503, 504})
+# Statuses that mean the server did not act on the request, so non-idempotent calls may be retried too
+REJECTED_STATUSES = frozenset({429, 503})
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+# Failures before or while talking to the server (openai's timeout error is one of its connection errors)
+CONNECTION_ERRORS = (requests.ConnectionError, requests.Timeout, openai.APIConnectionError)
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised without calling the endpoint while its circuit breaker is open
+    """
+    def __init__(self, endpoint: str, retry_in: float):
+        super().__init__(f"{endpoint} is unavailable (circuit open, retry in {retry_in:.0f}s)")
+        self.endpoint = endpoint
+        self.retry_in = retry_in
+
+
+class Backoff:
+    """
+    Exponential delays with equal jitter: each delay is drawn from
+    [cap / 2, cap], where cap doubles from `base` up to `max_delay`.
+    Jitter keeps clients that failed together from retrying together.
+    """
+    def __init__(self, base: float = 0.2, max_delay: float = 10.0, rng: Optional[random.Random] = None):
+        self.base = base
+        self.max_delay = max_delay
+        self.rng = rng or random
+        self.attempt = 0
+
+    def next(self) -> float:
+        cap = min(self.max_delay, self.base * 2 ** self.attempt)
+        self.attempt += 1
+        return cap / 2 + self.rng.uniform(0, cap / 2)
+
+
+class RetryPolicy:
+    """
+    Per-endpoint limits: attempts, backoff, the timeout of a single attempt
+    and a deadline for the whole call including retries (the stage timeout).
+    """
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 10.0,
+                 timeout: float = 30.0, deadline: float = 60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.deadline = deadline
+
+    @classmethod
+    def from_env(cls, endpoint: str, **defaults) -> "RetryPolicy":
+        """
+        Defaults overridden by <ENDPOINT>_MAX_ATTEMPTS / _TIMEOUT / _DEADLINE,
+        e.g. OPENAI_CHAT_TIMEOUT=45 for the "openai.chat" endpoint
+        """
+        prefix = endpoint.upper().replace(".", "_")
+        policy = cls(**defaults)
+        for name, cast in (("max_attempts", int), ("timeout", float), ("deadline", float)):
+            value = os.getenv(f"{prefix}_{name.upper()}")
+            if value:
+                setattr(policy, name, cast(value))
+        return policy
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failed attempts and rejects
+    calls for `reset_timeout` seconds; then lets one probe through (half-open)
+    and closes again if it succeeds.
+    """
+    def __init__(self, endpoint: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._probing = False
+
+    @property
+    def is_open(self) -> bool:
+        return self._opened_at is not None
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return
+            waited = time.monotonic() - self._opened_at
+            if waited >= self.reset_timeout and not self._probing:
+                self._probing = True
+                return
+            raise CircuitOpenError(self.endpoint, max(0.0, self.reset_timeout - waited))
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._probing = False
+            if self._opened_at is not None:
+                self._opened_at = None
+                CIRCUIT_OPEN.set(0, endpoint=self.endpoint)
+
+    def release(self):
+        """
+        End a probe that was interrupted before it had an outcome, so the
+        next call can probe again
+        """
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    print(f"WARNING: {self.endpoint} circuit opened after {self._failures} failures", flush=True)
+                self._opened_at = time.monotonic()
+                self._probing = False
+                CIRCUIT_OPEN.set(1, endpoint=self.endpoint)
+
+
+def retry_after(headers) -> Optional[float]:
+    """
+    Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)
+    """
+    value = (headers or {}).get("Retry-After") if hasattr(headers, "get") else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, when.timestamp() - time.time())
+
+
+def _status_of(error: BaseException) -> Optional[int]:
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+def _transient(error: BaseException, idempotent: bool) -> bool:
+    if isinstance(error, (requests.ConnectTimeout, openai.APITimeoutError)):
+        return True
+    if not idempotent:
+        return _status_of(error) in REJECTED_STATUSES
+    if isinstance(error, CONNECTION_ERRORS):
+        return True
+    return _status_of(error) in RETRY_STATUSES
+
+
+class Endpoint:
+    """
+    One outbound dependency (n8n, OpenAI chat, OpenAI moderation) with its
+    retry policy and circuit breaker. call()/acall() run a request with
+    jittered exponential backoff, honouring Retry-After, until it succeeds,
+    attempts run out or the stage deadline would be exceeded. Every attempt
+    is counted and timed in outbound_calls_total / outbound_call_seconds.
+
+    Responses with a retryable status (429, 5xx) are retried and the last one
+    is returned to the caller for raise_for_status(); non-idempotent calls
+    are only retried when the server clearly did not act on them.
+    """
+    def __init__(self, name: str, policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        self.name = name
+        self.policy = policy or RetryPolicy.from_env(name)
+        self.breaker = breaker or CircuitBreaker(
+            name,
+            failure_threshold=int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5")),
+            reset_timeout=float(os.getenv("CIRCUIT_RESET_TIMEOUT", "30")),
+        )
+
+    def call(self, fn: Callable[[], Any], idempotent: bool = True) -> Any:
+        retry = _Retry(self, idempotent)
+        while True:
+            retry.start()
+            try:
+                result = fn()
+            except Exception as e:
+                delay = retry.failed(e)
+            except BaseException:
+                # Cancelled or interrupted mid-attempt: don't leave a probe pending
+                self.breaker.release()
+                raise
+            else:
+                delay = retry.finished(result)
+                if delay is None:
+                    return result
+            time.sleep(delay)
+
+    async def acall(self, fn: Callable[[], Awaitable[Any]], idempotent: bool = True) -> Any:
+        retry = _Retry(self, idempotent)
+        while True:
+            retry.start()
+            try:
+                result = await fn()
+            except Exception as e:
+                delay = retry.failed(e)
+            except BaseException:
+                # Cancelled or interrupted mid-attempt: don't leave a probe pending
+                self.breaker.release()
+                raise
+            else:
+                delay = retry.finished(result)
+                if delay is None:
+                    return result
+            await asyncio.sleep(delay)
+
+
+class _Retry:
+    """
+    Retry state of one Endpoint call, shared by call() and acall()
+    """
+    def __init__(self, endpoint: Endpoint, idempotent: bool):
+        self.endpoint = endpoint
+        self.idempotent = idempotent
+        self.retry_statuses = RETRY_STATUSES if idempotent else REJECTED_STATUSES
+        self.backoff = Backoff(endpoint.policy.base_delay, endpoint.policy.max_delay)
+        self.deadline = time.monotonic() + endpoint.policy.deadline
+        self.attempt = 0
+        self.started = 0.0
+
+    def start(self):
+        self.attempt += 1
+        try:
+            self.endpoint.breaker.allow()
+        except CircuitOpenError:
+            OUTBOUND_CALLS.inc(endpoint=self.endpoint.name, outcome="rejected")
+            raise
+        self.started = time.monotonic()
+
+    def _observe(self):
+        OUTBOUND_LATENCY.observe(time.monotonic() - self.started, endpoint=self.endpoint.name)
+
+    def _outcome(self, outcome: str):
+        OUTBOUND_CALLS.inc(endpoint=self.endpoint.name, outcome=outcome)
+        if outcome != "retry":
+            tracing.set_attribute(f"{self.endpoint.name}.attempts", self.attempt)
+
+    def _next_delay(self, wait_hint: Optional[float]) -> Optional[float]:
+        """
+        Delay before the next attempt, or None when attempts or the deadline are used up
+        """
+        delay = max(self.backoff.next(), wait_hint or 0.0)
+        if self.attempt >= self.endpoint.policy.max_attempts or time.monotonic() + delay > self.deadline:
+            return None
+        return delay
+
+    def finished(self, result: Any) -> Optional[float]:
+        """
+        None when `result` is final, else the delay before retrying it
+        """
+        self._observe()
+        status = getattr(result, "status_code", None)
+        # A 4xx still means the dependency is up and answering
+        failing = status in RETRY_STATUSES
+        if failing:
+            self.endpoint.breaker.record_failure()
+        else:
+            self.endpoint.breaker.record_success()
+        if status not in self.retry_statuses:
+            self._outcome("error" if failing else "ok")
+            return None
+        delay = self._next_delay(retry_after(getattr(result, "headers", None)))
+        if delay is None:
+            # Out of retries: hand the response back for raise_for_status()
+            self._outcome("error")
+            return None
+        self._retrying(status, delay)
+        return delay
+
+    def failed(self, error: Exception) -> float:
+        """
+        Delay before retrying after `error`; re-raises it when it is final
+        """
+        self._observe()
+        status = _status_of(error)
+        if not _transient(error, self.idempotent):
+            # Only an HTTP answer outside the retry statuses shows the dependency is up;
+            # anything else (broken stream, redirect loop, bad URL) counts against it
+            if status is not None and status not in RETRY_STATUSES:
+                self.endpoint.breaker.record_success()
+            else:
+                self.endpoint.breaker.record_failure()
+            self._outcome("error")
+            raise error
+        self.endpoint.breaker.record_failure()
+        delay = self._next_delay(retry_after(getattr(getattr(error, "response", None), "headers", None)))
+        if delay is None:
+            self._outcome("error")
+            raise error
+        self._retrying(error, delay)
+        return delay
+
+    def _retrying(self, reason: Any, delay: float):
+        self._outcome("retry")
+        print(f"WARNING: {self.endpoint.name} attempt {self.attempt} failed ({reason}), "
+              f"retrying in {delay:.1f}s", flush=True)
+
+
+def is_unavailable(error: BaseException) -> bool:
+    """
+    True for errors meaning the dependency itself is down or overloaded (after
+    retries), as opposed to a bad request or unusable output
+    """
+    return isinstance(error, CircuitOpenError) or _transient(error, idempotent=True)
@@ -0,0 +1,274 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional
+import numpy as np
+from .node_registry import NODES, thaw
+from .plan_cache import normalize_prompt, fingerprint
+from .metrics import RETRIEVAL_REQUESTS
+
+DEFAULT_INDEX_PATH = os.path.join("~", ".cache", "automation_assistant", "workflows.sqlite")
+
+
+def embed(text: str, dim: int = 1024) -> np.ndarray:
+    """
+    Hashed n-gram vector (character 3-5 grams plus words and word pairs),
+    L2-normalized. Needs no model or network, so it works offline.
+    """
+    normalized = normalize_prompt(text)
+    words = normalized.split()
+    padded = f" {normalized} "
+    grams = [padded[i:i + n] for n in (3, 4, 5) for i in range(len(padded) - n + 1)]
+    grams += [f"w:{w}" for w in words]
+    grams += [f"b:{a} {b}" for a, b in zip(words, words[1:])]
+    vec = np.zeros(dim, dtype=np.float32)
+    if not grams:
+        return vec
+    hashes = np.fromiter((zlib.crc32(g.encode("utf-8")) for g in grams), dtype=np.uint64, count=len(grams))
+    # Signed hashing keeps collisions from biasing similarities upwards
+    signs = np.where(hashes & (1 << 31), -1.0, 1.0).astype(np.float32)
+    np.add.at(vec, (hashes % dim).astype(np.intp), signs)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm else vec
+
+
+def _without_defaults(params: Dict[str, Any], defaults: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Inverse of normalize.merge_defaults(): only what the deep merge would not add back
+    """
+    kept = {}
+    for key, value in params.items():
+        if key not in defaults:
+            kept[key] = value
+        elif isinstance(value, dict) and isinstance(defaults[key], dict):
+            nested = _without_defaults(value, defaults[key])
+            if nested:
+                kept[key] = nested
+        elif thaw(defaults[key]) != thaw(value):
+            kept[key] = value
+    return kept
+
+
+def compact_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    A plan as the LLM is asked to write it: without positions, credentials and
+    parameters equal to the registry defaults, which normalization adds back.
+    Keeps stored examples short and doesn't teach the model to emit positions.
+    """
+    nodes = []
+    for node in plan.get("nodes") or []:
+        defaults = NODES.defaults(node.get("type"), node.get("typeVersion"))
+        compact = {k: v for k, v in node.items() if k not in ("position", "credentials")}
+        if compact.get("disabled") is False:
+            del compact["disabled"]
+        params = node.get("parameters")
+        if isinstance(params, dict):
+            compact["parameters"] = _without_defaults(params, defaults)
+        nodes.append(compact)
+    return {**{k: v for k, v in plan.items() if k != "nodes"}, "nodes": nodes}
+
+
+class Neighbor(NamedTuple):
+    score: float
+    prompt: str
+    plan: Dict[str, Any]
+
+
+class WorkflowIndex:
+    """
+    Nearest-neighbour index of prompts whose workflows were created successfully.
+
+    Vectors live in one float32 matrix, so a search is a single matrix-vector
+    product. The matrix grows by doubling and rows freed by eviction are
+    reused, so adding N entries costs O(N) copies; a key -> row dict makes
+    lookups O(1). Entries are persisted to SQLite (when `path` is set) and
+    loaded back on start; re-adding a prompt replaces its plan, and the oldest
+    entries are dropped beyond `max_entries`.
+    """
+    def __init__(self, path: Optional[str] = None, dim: int = 1024, max_entries: int = 5000):
+        self.dim = dim
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._reset()
+
+        self._db = None
+        if path:
+            path = os.path.expanduser(path)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS workflows ("
+                "key TEXT PRIMARY KEY, prompt TEXT NOT NULL, plan TEXT NOT NULL, created REAL NOT NULL)"
+            )
+            self._db.commit()
+            self._load()
+
+    @classmethod
+    def from_env(cls) -> Optional["WorkflowIndex"]:
+        """
+        WORKFLOW_INDEX_PATH (off disables it, memory keeps it in-process)
+        """
+        path = os.getenv("WORKFLOW_INDEX_PATH", DEFAULT_INDEX_PATH)
+        if path.lower() in ("", "0", "off", "false"):
+            return None
+        if path.lower() == "memory":
+            path = None
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _reset(self):
+        # key -> matrix row, oldest first; prompts/plans are per row, None for free rows
+        self._rows: "OrderedDict[str, int]" = OrderedDict()
+        self._prompts: List[Optional[str]] = []
+        self._plans: List[Optional[str]] = []
+        self._free: List[int] = []
+        self._matrix = np.zeros((0, self.dim), dtype=np.float32)
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT key, prompt, plan FROM workflows ORDER BY created DESC LIMIT ?", (self.max_entries,)
+        ).fetchall()
+        rows.reverse()
+        self._rows = OrderedDict((r[0], i) for i, r in enumerate(rows))
+        self._prompts = [r[1] for r in rows]
+        self._plans = [r[2] for r in rows]
+        # Vectors are recomputed rather than stored, so `dim` can change between runs
+        if rows:
+            self._matrix = np.vstack([embed(p, self.dim) for p in self._prompts])
+
+    def _alloc(self) -> int:
+        """
+        A free matrix row, doubling the matrix when it is full
+        """
+        if self._free:
+            return self._free.pop()
+        row = len(self._prompts)
+        self._prompts.append(None)
+        self._plans.append(None)
+        if row >= len(self._matrix):
+            grown = np.zeros((max(16, 2 * len(self._matrix)), self.dim), dtype=np.float32)
+            grown[:row] = self._matrix[:row]
+            self._matrix = grown
+        return row
+
+    def add(self, prompt: str, plan: Dict[str, Any]):
+        key = fingerprint(normalize_prompt(prompt))
+        raw = json.dumps(plan, ensure_ascii=False, separators=(",", ":"))
+        vec = embed(prompt, self.dim)
+        with self._lock:
+            row = self._rows.pop(key) if key in self._rows else self._alloc()
+            self._rows[key] = row
+            self._prompts[row] = prompt
+            self._plans[row] = raw
+            self._matrix[row] = vec
+            dropped = []
+            while len(self._rows) > self.max_entries:
+                old_key, old_row = self._rows.popitem(last=False)
+                self._prompts[old_row] = self._plans[old_row] = None
+                self._matrix[old_row] = 0
+                self._free.append(old_row)
+                dropped.append(old_key)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO workflows (key, prompt, plan, created) VALUES (?, ?, ?, ?)",
+                    (key, prompt, raw, time.time()),
+                )
+                if dropped:
+                    self._db.executemany("DELETE FROM workflows WHERE key = ?", [(k,) for k in dropped])
+                self._db.commit()
+
+    def get(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        Plan stored for the same prompt after normalization, if any
+        """
+        key = fingerprint(normalize_prompt(prompt))
+        with self._lock:
+            row = self._rows.get(key)
+            return json.loads(self._plans[row]) if row is not None else None
+
+    def search(self, prompt: str, k: int = 3, min_score: float = 0.0) -> List[Neighbor]:
+        """
+        Up to k most similar past prompts (cosine similarity), best first
+        """
+        vec = embed(prompt, self.dim)
+        with self._lock:
+            if not self._rows:
+                return []
+            scores = self._matrix[:len(self._prompts)] @ vec
+            if self._free:
+                scores[self._free] = -np.inf
+            k = min(k, len(self._rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [
+                # Fresh copy per hit: callers mutate plans
+                Neighbor(float(scores[i]), self._prompts[i], json.loads(self._plans[i]))
+                for i in top if scores[i] >= min_score
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._reset()
+            if self._db is not None:
+                self._db.execute("DELETE FROM workflows")
+                self._db.commit()
+
+
+class ExampleRetriever:
+    """
+    Picks few-shot examples for a prompt from a WorkflowIndex, or a stored plan
+    to reuse outright when the same prompt (after normalization) was seen before.
+    Similarity only ever selects examples: prompts a digit or a word apart can
+    mean different workflows, so they always go through the LLM.
+    """
+    def __init__(self, index: WorkflowIndex, k: int = 2, min_score: float = 0.35,
+                 max_example_chars: int = 6000):
+        self.index = index
+        self.k = k
+        self.min_score = min_score
+        self.max_example_chars = max_example_chars
+
+    @classmethod
+    def from_env(cls) -> Optional["ExampleRetriever"]:
+        index = WorkflowIndex.from_env()
+        if index is None:
+            return None
+        return cls(
+            index,
+            k=int(os.getenv("RETRIEVAL_EXAMPLES", "2")),
+        )
+
+    def retrieve(self, prompt: str) -> List[Neighbor]:
+        neighbors = self.index.search(prompt, self.k, self.min_score)
+        RETRIEVAL_REQUESTS.inc(result="few_shot" if neighbors else "miss")
+        return neighbors
+
+    def exact_match(self, prompt: str) -> Optional[Dict[str, Any]]:
+        plan = self.index.get(prompt)
+        if plan is not None:
+            RETRIEVAL_REQUESTS.inc(result="exact_hit")
+        return plan
+
+    def examples(self, neighbors: List[Neighbor]) -> List[Dict[str, str]]:
+        """
+        Chat messages (user prompt, assistant plan) for each neighbour, most similar last
+        """
+        messages = []
+        for neighbor in reversed(neighbors):
+            # Entries stored before compaction are compacted here
+            plan = json.dumps(compact_plan(neighbor.plan), ensure_ascii=False, separators=(",", ":"))
+            if len(plan) > self.max_example_chars:
+                continue
+            messages.append({"role": "user", "content": f"Create an n8n workflow for: {neighbor.prompt}"})
+            messages.append({"role": "assistant", "content": plan})
+        return messages
+
+    def remember(self, prompt: str, plan: Dict[str, Any]):
+        self.index.add(prompt, compact_plan(plan))
@@ -0,0 +1,187 @@
+# automation_assistant/server.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Iterable, Optional
+from dotenv import load_dotenv
+from flask import Flask, jsonify, request
+from automation_assistant.llm_parser import LLMParser
+from automation_assistant.plan_cache import PlanCache
+from automation_assistant.templates import TemplateEngine
+from automation_assistant.retrieval import ExampleRetriever
+from automation_assistant.guardrails import SafetyValidator, LatencyMetrics
+from automation_assistant.moderation import ModerationClient
+from automation_assistant.workflow_builder import WorkflowBuilder
+from automation_assistant.dedup import DedupIndex
+from automation_assistant.workflow_mirror import WorkflowMirror
+from automation_assistant.pipeline import WorkflowPipeline, PipelineError
+from automation_assistant.n8n_session import N8nSessionManager
+from automation_assistant.cookie_cache import CookieCache
+from automation_assistant.metrics_server import start_metrics_server
+from automation_assistant import tracing
+from automation_assistant.usage import BudgetManager, allowed_tenants_from_env, resolve_tenant, tenant_context
+
+try:
+    import waitress
+except ImportError:  # pragma: no cover - werkzeug's threaded development server is used instead
+    waitress = None
+
+# Stages whose failure means the prompt itself was rejected (client error)
+REJECTION_STAGES = {"pre_validation", "moderation", "post_validation"}
+
+
+class ServiceBusy(Exception):
+    """
+    Raised when the worker pool and its queue are full
+    """
+
+
+class WorkflowService:
+    """
+    Runs prompts through one shared WorkflowPipeline on a bounded worker pool.
+    """
+    def __init__(self, pipeline: WorkflowPipeline, max_workers: int = 8, max_pending: int = 32):
+        self.pipeline = pipeline
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="workflow")
+        # Caps running + queued prompts so overload turns into 503s, not an unbounded queue
+        self._slots = threading.BoundedSemaphore(max_workers + max_pending)
+
+    def submit(self, prompt: str, request_id: Optional[str] = None, tenant: Optional[str] = None,
+               workflow_id: Optional[str] = None) -> Future:
+        """
+        Queue a prompt; with a workflow_id it is a change request for that workflow
+        """
+        if not self._slots.acquire(blocking=False):
+            raise ServiceBusy("Too many workflow requests in flight")
+        try:
+            return self.executor.submit(self._run, prompt, request_id, tenant, workflow_id)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _run(self, prompt: str, request_id: Optional[str] = None, tenant: Optional[str] = None,
+             workflow_id: Optional[str] = None) -> dict:
+        metrics = LatencyMetrics()
+        try:
+            with tracing.request_context(request_id) as request_id, tenant_context(tenant):
+                if workflow_id is None:
+                    workflow = self.pipeline.run(prompt, metrics)
+                else:
+                    workflow = self.pipeline.modify(workflow_id, prompt, metrics)
+        finally:
+            self._slots.release()
+        return {
+            "id": workflow.get("id"),
+            "name": workflow.get("name"),
+            "latency": metrics.summary(),
+            "usage": workflow.get("llm_usage"),
+            "request_id": request_id,
+        }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+def create_app(service: WorkflowService, tenants: Iterable[str] = ()) -> Flask:
+    """
+    `tenants` are the X-Tenant-ID values accepted; any other value is billed to the default tenant
+    """
+    app = Flask(__name__)
+    tenants = frozenset(tenants)
+
+    def submit(workflow_id: Optional[str], success_status: int):
+        body = request.get_json(silent=True) or {}
+        prompt = body.get("prompt")
+        if not isinstance(prompt, str) or not prompt.strip():
+            return jsonify({"error": "Field 'prompt' is required"}), 400
+
+        # Honour the caller's request ID so their logs line up with our traces
+        request_id = request.headers.get("X-Request-ID") or tracing.new_request_id()
+        headers = {"X-Request-ID": request_id}
+        tenant = resolve_tenant(request.headers.get("X-Tenant-ID"), tenants)
+        try:
+            result = service.submit(prompt, request_id, tenant, workflow_id).result()
+        except ServiceBusy as e:
+            return jsonify({"error": str(e), "request_id": request_id}), 503, headers
+        except PipelineError as e:
+            if e.stage == "budget":
+                status = 429
+            else:
+                status = 422 if e.stage in REJECTION_STAGES else 502
+            return jsonify({"error": str(e), "stage": e.stage, "request_id": request_id}), status, headers
+
+        return jsonify(result), success_status, headers
+
+    @app.route("/workflows", methods=["POST"])
+    def create_workflow():
+        return submit(None, 201)
+
+    @app.route("/workflows/<workflow_id>", methods=["PATCH"])
+    def modify_workflow(workflow_id):
+        # Body {"prompt": "<change request>"}; applied to the workflow as an LLM-generated JSON Patch
+        return submit(workflow_id, 200)
+
+    @app.route("/healthz", methods=["GET"])
+    def healthz():
+        return jsonify({"status": "ok"})
+
+    return app
+
+
+def serve(app: Flask, host: str, port: int, threads: int):
+    """
+    Serve `app` with waitress on a fixed pool of `threads` HTTP threads; each
+    holds a connection while its prompt runs, so the pool bounds open requests
+    """
+    if waitress is not None:
+        waitress.serve(app, host=host, port=port, threads=threads)
+    else:
+        print("WARNING: waitress is not installed, using the Flask development server", flush=True)
+        app.run(host=host, port=port, threaded=True)
+
+
+def main():
+    load_dotenv()
+    start_metrics_server()
+    n8n_url = os.getenv("N8N_API_URL")
+    email = os.getenv("N8N_USER_EMAIL")
+    pwd = os.getenv("N8N_USER_PASSWORD")
+    openai_api_key = os.getenv("OPENAI_API_KEY")
+    if not (n8n_url and email and pwd and openai_api_key):
+        print("ERROR: Missing N8N_API_URL, login credentials, or OpenAI API key")
+        return
+
+    session = N8nSessionManager(
+        n8n_url, email, pwd, cookie_cache=CookieCache.from_env(n8n_url, email, pwd)
+    )
+    if not session.connect():
+        print("ERROR: Could not log into n8n in time.")
+        return
+
+    parser = LLMParser(
+        cache=PlanCache.from_env(), budget=BudgetManager.from_env(),
+        templates=TemplateEngine.from_env(), retriever=ExampleRetriever.from_env(),
+    )
+    validator = SafetyValidator(moderation_client=ModerationClient(openai_api_key))
+    builder = WorkflowBuilder(
+        n8n_url, session, dedup=DedupIndex.from_env(), mirror=WorkflowMirror.from_env()
+    )
+    pipeline = WorkflowPipeline(
+        parser, validator, builder, openai_api_key,
+        stream=os.getenv("LLM_STREAMING", "").lower() in ("1", "true", "yes"),
+    )
+    max_workers = int(os.getenv("SERVER_WORKERS", "8"))
+    max_pending = int(os.getenv("SERVER_MAX_PENDING", "32"))
+    service = WorkflowService(pipeline, max_workers=max_workers, max_pending=max_pending)
+    app = create_app(service, tenants=allowed_tenants_from_env())
+    try:
+        # Enough HTTP threads for every prompt the service admits, plus a few to answer 503s and /healthz
+        threads = int(os.getenv("SERVER_HTTP_THREADS", str(max_workers + max_pending + 4)))
+        serve(app, "0.0.0.0", int(os.getenv("SERVER_PORT", "8000")), threads)
+    finally:
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+import os
+import re
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+from .prompts import VALIDATE_EMAILS_CODE
+from .node_registry import NODES, thaw
+from .metrics import TEMPLATE_REQUESTS
+from . import tracing
+
+WEEKDAYS = {
+    "sunday": 0, "sun": 0, "monday": 1, "mon": 1, "tuesday": 2, "tue": 2, "tues": 2,
+    "wednesday": 3, "wed": 3, "thursday": 4, "thu": 4, "thurs": 4, "friday": 5, "fri": 5,
+    "saturday": 6, "sat": 6,
+}
+
+_WEEKDAY_RE = re.compile(r"\b(" + "|".join(sorted(WEEKDAYS, key=len, reverse=True)) + r")s?\b")
+_TIME_RE = re.compile(r"\b(?:at\s+)?(\d{1,2})(?::(\d{2}))?\s*(a\.?m\.?|p\.?m\.?)(?![a-z])|\b(?:at\s+)?(\d{1,2}):(\d{2})\b")
+_TIMEZONE_RE = re.compile(r"\b(UTC|GMT|[A-Z][a-z]+/[A-Z][A-Za-z_]+)\b")
+_EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+")
+_SUBJECT_RE = re.compile(r"""(?:subject(?:\s+line)?|titled|title)\s*(?:of|as|:|=)?\s*["'“‘]([^"'”’]+)["'”’]""", re.I)
+
+
+class TemplateMatch(NamedTuple):
+    template: "WorkflowTemplate"
+    confidence: float
+    slots: Dict[str, Any]
+
+
+def parse_schedule(text: str) -> Optional[Dict[str, str]]:
+    """
+    Extract a cron schedule from phrases like "every Monday at 10:00 AM",
+    "daily at 18:30", "weekdays at 9am" or "hourly". None if no schedule is stated.
+    """
+    lowered = text.lower()
+    hour, minute = 10, 0
+    time_match = _TIME_RE.search(lowered)
+    if time_match:
+        if time_match.group(1):
+            hour, minute = int(time_match.group(1)), int(time_match.group(2) or 0)
+            if time_match.group(3).startswith("p") and hour < 12:
+                hour += 12
+            elif time_match.group(3).startswith("a") and hour == 12:
+                hour = 0
+        else:
+            hour, minute = int(time_match.group(4)), int(time_match.group(5))
+    elif "noon" in lowered:
+        hour = 12
+    elif "midnight" in lowered:
+        hour = 0
+    if hour > 23 or minute > 59:
+        return None
+
+    days = sorted({WEEKDAYS[m] for m in _WEEKDAY_RE.findall(lowered)})
+    if re.search(r"\b(hourly|every hour)\b", lowered):
+        cron, cadence = f"{minute} * * * *", "Hourly"
+    elif re.search(r"\b(weekdays?|business days?|workdays?)\b", lowered):
+        cron, cadence = f"{minute} {hour} * * 1-5", "Daily"
+    elif re.search(r"\bweekends?\b", lowered):
+        cron, cadence = f"{minute} {hour} * * 0,6", "Weekend"
+    elif days:
+        cron, cadence = f"{minute} {hour} * * {','.join(map(str, days))}", "Weekly"
+    elif re.search(r"\b(daily|every (day|morning|evening|night)|each (day|morning|evening)|nightly)\b", lowered):
+        cron, cadence = f"{minute} {hour} * * *", "Daily"
+    elif re.search(r"\b(weekly|every week|each week)\b", lowered):
+        cron, cadence = f"{minute} {hour} * * 1", "Weekly"
+    elif re.search(r"\b(monthly|every month|each month)\b", lowered):
+        cron, cadence = f"{minute} {hour} 1 * *", "Monthly"
+    else:
+        return None
+
+    tz_match = _TIMEZONE_RE.search(text)
+    timezone = tz_match.group(1) if tz_match else "UTC"
+    return {"cronExpression": cron, "timezone": "UTC" if timezone == "GMT" else timezone, "cadence": cadence}
+
+
+class WorkflowTemplate(ABC):
+    """
+    A parameterized workflow shape. `score` returns a confidence in [0, 1] and the
+    slots extracted from the prompt; `build` turns the slots into a plan in the
+    same raw format the LLM returns (LLMParser enhances it the same way).
+    """
+    name = ""
+
+    @abstractmethod
+    def score(self, prompt: str) -> Tuple[float, Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def build(self, slots: Dict[str, Any]) -> Dict[str, Any]:
+        ...
+
+
+class EmailDigestTemplate(WorkflowTemplate):
+    """
+    cron -> Gmail -> Validate Emails (code) -> Aggregate -> OpenAI summary -> send email
+    """
+    name = "email_digest"
+
+    SOURCE = re.compile(r"\b(gmail|e-?mails?|inbox|mails?|messages)\b")
+    SUMMARY = re.compile(r"\b(summar(y|ies|ize|ise|izing|ising)|digest|recap|overview|tl;?dr)\b")
+    DELIVERY = re.compile(r"\b(send|e-?mail me|mail me|deliver|forward)\b")
+    # Anything that needs nodes or logic this shape doesn't have goes to the LLM
+    OUT_OF_SCOPE = re.compile(
+        r"\b(slack|telegram|discord|teams|sheets?|spreadsheet|webhook|http|api|database|sql|notion|trello|"
+        r"airtable|sms|whatsapp|calendar|drive|dropbox|translate|reply|delete|archive|label them|"
+        r"if|unless|only when|when(ever)? (a|an|new)|attachments?)\b"
+    )
+
+    def score(self, prompt: str) -> Tuple[float, Dict[str, Any]]:
+        text = prompt.lower()
+        if not self.SOURCE.search(text) or not self.SUMMARY.search(text):
+            return 0.0, {}
+        schedule = parse_schedule(prompt)
+        confidence = 0.7
+        if schedule:
+            confidence += 0.2
+        if self.DELIVERY.search(text) or _EMAIL_RE.search(prompt):
+            confidence += 0.1
+        confidence -= 0.3 * len(set(m.group(0) for m in self.OUT_OF_SCOPE.finditer(text)))
+        return max(0.0, min(1.0, confidence)), self._slots(prompt, text, schedule)
+
+    @staticmethod
+    def _slots(prompt: str, text: str, schedule: Optional[Dict[str, str]]) -> Dict[str, Any]:
+        schedule = schedule or {"cronExpression": "0 10 * * 1", "timezone": "UTC", "cadence": "Weekly"}
+        labels = []
+        if "unread" in text or not re.search(r"\b(important|starred|all (e-?mails|messages|mail))\b", text):
+            labels.append("UNREAD")
+        if "important" in text:
+            labels.append("IMPORTANT")
+        if "starred" in text:
+            labels.append("STARRED")
+        subject = _SUBJECT_RE.search(prompt)
+        return {
+            "schedule": schedule,
+            "recipients": _EMAIL_RE.findall(prompt),
+            "subject": subject.group(1).strip() if subject else None,
+            "labels": labels,
+        }
+
+    def build(self, slots: Dict[str, Any]) -> Dict[str, Any]:
+        schedule = slots["schedule"]
+        cron = thaw(NODES.defaults("n8n-nodes-base.cron"))
+        cron.update(cronExpression=schedule["cronExpression"], timezone=schedule["timezone"])
+
+        gmail = thaw(NODES.defaults("n8n-nodes-base.googleGmail"))
+        gmail["filters"]["labelIds"] = list(slots["labels"])
+
+        email = thaw(NODES.defaults("n8n-nodes-base.emailSend"))
+        if slots["recipients"]:
+            email["toEmail"] = ", ".join(slots["recipients"])
+        email["subject"] = slots["subject"] or (
+            f"📧 {schedule['cadence']} Email Summary - {{{{$now.format('YYYY-MM-DD')}}}}"
+        )
+
+        nodes = [
+            {"id": "trigger1", "name": "Schedule Trigger", "type": "n8n-nodes-base.cron", "parameters": cron},
+            {"id": "gmail1", "name": "Get Emails", "type": "n8n-nodes-base.googleGmail", "parameters": gmail},
+            {"id": "guardrail1", "name": "Validate Emails", "type": "n8n-nodes-base.code",
+             "parameters": {"functionCode": VALIDATE_EMAILS_CODE}},
+            {"id": "aggregate1", "name": "Aggregate Emails", "type": "n8n-nodes-base.aggregate",
+             "parameters": thaw(NODES.defaults("n8n-nodes-base.aggregate"))},
+            {"id": "openai1", "name": "Summarize Emails", "type": "n8n-nodes-base.openai",
+             "parameters": thaw(NODES.defaults("n8n-nodes-base.openai"))},
+            {"id": "email1", "name": "Send Summary", "type": "n8n-nodes-base.emailSend", "parameters": email},
+        ]
+        connections = {
+            a["name"]: {"main": [[{"node": b["name"], "type": "main", "index": 0}]]}
+            for a, b in zip(nodes, nodes[1:])
+        }
+        return {"nodes": nodes, "connections": connections}
+
+
+DEFAULT_TEMPLATES = (EmailDigestTemplate,)
+
+
+class TemplateEngine:
+    """
+    Deterministic fast path in front of the LLM: the best-scoring template is
+    used when its confidence reaches `min_confidence`, otherwise the prompt goes
+    to the LLM as before. Hit rate is exported as template_requests_total.
+    """
+    def __init__(self, templates: Optional[List[WorkflowTemplate]] = None, min_confidence: float = 0.85):
+        self.templates = list(templates) if templates is not None else [t() for t in DEFAULT_TEMPLATES]
+        self.min_confidence = min_confidence
+        self.stats = {"hits": 0, "low_confidence": 0, "misses": 0}
+
+    @classmethod
+    def from_env(cls) -> Optional["TemplateEngine"]:
+        """
+        On unless TEMPLATE_FAST_PATH=off; TEMPLATE_MIN_CONFIDENCE sets the threshold
+        """
+        if os.getenv("TEMPLATE_FAST_PATH", "").lower() in ("off", "0", "false", "no"):
+            return None
+        return cls(min_confidence=float(os.getenv("TEMPLATE_MIN_CONFIDENCE", "0.85")))
+
+    def match(self, prompt: str) -> Optional[TemplateMatch]:
+        """
+        Best-scoring template for the prompt, whatever its confidence
+        """
+        best = None
+        for template in self.templates:
+            confidence, slots = template.score(prompt)
+            if confidence > 0 and (best is None or confidence > best.confidence):
+                best = TemplateMatch(template, confidence, slots)
+        return best
+
+    def plan_for(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """
+        A raw plan if a template matches confidently, else None (call the LLM)
+        """
+        match = self.match(prompt)
+        if match is None:
+            self.stats["misses"] += 1
+            TEMPLATE_REQUESTS.inc(template="", result="miss")
+            return None
+        tracing.set_attribute("template.name", match.template.name)
+        tracing.set_attribute("template.confidence", match.confidence)
+        if match.confidence < self.min_confidence:
+            self.stats["low_confidence"] += 1
+            TEMPLATE_REQUESTS.inc(template=match.template.name, result="low_confidence")
+            return None
+        self.stats["hits"] += 1
+        TEMPLATE_REQUESTS.inc(template=match.template.name, result="hit")
+        return match.template.build(match.slots)
@@ -0,0 +1,217 @@
+import contextvars
+import json
+import os
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+SERVICE_NAME = "automation-assistant"
+
+# OTLP span kinds and status codes
+KIND_INTERNAL = 1
+KIND_CLIENT = 3
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+
+def new_request_id() -> str:
+    return secrets.token_hex(16)
+
+
+def current_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+def current_span() -> Optional["Span"]:
+    return _current_span.get()
+
+
+def set_attribute(key: str, value: Any):
+    """
+    Set an attribute on the active span (no-op outside a trace)
+    """
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+@contextmanager
+def request_context(request_id: Optional[str] = None):
+    """
+    Bind a request ID (e.g. from an X-Request-ID header) for spans started inside
+    """
+    token = _request_id.set(request_id or new_request_id())
+    try:
+        yield _request_id.get()
+    finally:
+        _request_id.reset(token)
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{"key": k, "value": _otlp_value(v)} for k, v in attributes.items()]
+
+
+class Span:
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], kind: int = KIND_INTERNAL,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.status = STATUS_OK
+        self.status_message = ""
+
+    @property
+    def duration(self) -> Optional[float]:
+        return (self.end_ns - self.start_ns) / 1e9 if self.end_ns is not None else None
+
+    def set_attribute(self, key: str, value: Any):
+        if value is not None:
+            self.attributes[key] = value
+
+    def record_exception(self, exc: BaseException):
+        self.status = STATUS_ERROR
+        self.status_message = f"{type(exc).__name__}: {exc}"
+
+    def to_otlp(self) -> Dict[str, Any]:
+        data = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(self.attributes),
+            "status": {"code": self.status},
+        }
+        if self.parent_id:
+            data["parentSpanId"] = self.parent_id
+        if self.status_message:
+            data["status"]["message"] = self.status_message
+        return data
+
+
+class OTLPJsonFileExporter:
+    """
+    Appends one OTLP/JSON ExportTraceServiceRequest per line (the OpenTelemetry
+    Collector file exporter format), so traces can be replayed into any OTLP backend.
+    """
+    def __init__(self, path: str, service_name: str = SERVICE_NAME):
+        self.path = path
+        self.service_name = service_name
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans: List[Span]):
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": "automation_assistant"},
+                    "spans": [s.to_otlp() for s in spans],
+                }],
+            }]
+        }
+        line = json.dumps(payload, separators=(",", ":")) + "\n"
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class Tracer:
+    """
+    Minimal span tracer. The active span and request ID live in contextvars, so
+    nesting follows the call stack and carries across asyncio tasks and
+    asyncio.to_thread. Spans are buffered per trace and handed to the exporter
+    in one batch when the root span ends; without an exporter nothing is kept.
+    """
+    def __init__(self, exporter: Optional[OTLPJsonFileExporter] = None):
+        self.exporter = exporter
+        # Spans of traces whose root span is still open
+        self._pending: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Tracer":
+        """
+        TRACE_EXPORT_PATH enables the OTLP/JSON file exporter
+        """
+        path = os.getenv("TRACE_EXPORT_PATH")
+        service_name = os.getenv("TRACE_SERVICE_NAME", SERVICE_NAME)
+        return cls(OTLPJsonFileExporter(path, service_name) if path else None)
+
+    @contextmanager
+    def span(self, name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = KIND_INTERNAL):
+        parent = _current_span.get()
+        request_token = None
+        if parent is None:
+            request_id = _request_id.get()
+            if request_id is None:
+                request_id = new_request_id()
+                request_token = _request_id.set(request_id)
+            span = Span(name, secrets.token_hex(16), None, kind, attributes)
+            span.set_attribute("request.id", request_id)
+            if self.exporter is not None:
+                with self._lock:
+                    self._pending[span.trace_id] = []
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, kind, attributes)
+
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            if request_token is not None:
+                _request_id.reset(request_token)
+            self._finish(span)
+
+    def _finish(self, span: Span):
+        if self.exporter is None:
+            return
+        with self._lock:
+            buffered = self._pending.get(span.trace_id)
+            if span.parent_id is not None and buffered is not None:
+                buffered.append(span)
+                return
+            if span.parent_id is None:
+                self._pending.pop(span.trace_id, None)
+        # Root span, or a child that outlived its root (e.g. a detached task)
+        spans = (buffered or []) + [span]
+        try:
+            self.exporter.export(spans)
+        except OSError as e:
+            print(f"WARNING: Could not export trace {span.trace_id}: {e}")
+
+
+# Process-wide tracer used by the pipeline modules
+TRACER = Tracer.from_env()
+
+
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = KIND_INTERNAL):
+    return TRACER.span(name, attributes, kind)
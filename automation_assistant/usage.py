@@ -0,0 +1,277 @@
+import contextvars
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple, Optional, Tuple
+from .metrics import LLM_BUDGET_EVENTS, LLM_COST, LLM_TOKENS
+from . import tracing
+
+DEFAULT_TENANT = "default"
+
+# USD per 1M tokens: (prompt, completion)
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00),
+}
+
+_tenant: contextvars.ContextVar[str] = contextvars.ContextVar("tenant", default=DEFAULT_TENANT)
+_collector: contextvars.ContextVar[Optional[List["LLMUsage"]]] = contextvars.ContextVar(
+    "usage_collector", default=None
+)
+
+
+class BudgetExceededError(Exception):
+    """
+    Raised when a tenant has no budget left for another LLM call
+    """
+    def __init__(self, tenant: str, message: str):
+        super().__init__(message)
+        self.tenant = tenant
+
+
+class LLMUsage(NamedTuple):
+    model: str
+    prompt_tokens: int
+    completion_tokens: int
+    cost_usd: float
+    tenant: str = DEFAULT_TENANT
+
+    @property
+    def total_tokens(self) -> int:
+        return self.prompt_tokens + self.completion_tokens
+
+
+def model_price(model: str) -> Tuple[float, float]:
+    """
+    Per-token (prompt, completion) price; dated snapshots use their base model's price
+    """
+    prices = MODEL_PRICING.get(model)
+    if prices is None:
+        # e.g. "gpt-4o-mini-2024-07-18" -> "gpt-4o-mini"; longest known prefix wins
+        matches = [name for name in MODEL_PRICING if model.startswith(name + "-")]
+        prices = MODEL_PRICING[max(matches, key=len)] if matches else (0.0, 0.0)
+    return prices[0] / 1_000_000, prices[1] / 1_000_000
+
+
+def cost_usd(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    prompt_price, completion_price = model_price(model)
+    return prompt_tokens * prompt_price + completion_tokens * completion_price
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (~4 characters per token) used before the real usage is known
+    """
+    return math.ceil(len(text) / 4)
+
+
+def current_tenant() -> str:
+    return _tenant.get()
+
+
+def _tenant_budgets_from_env() -> Dict[str, float]:
+    limits = {}
+    for pair in os.getenv("LLM_TENANT_BUDGETS", "").split(","):
+        if "=" in pair:
+            tenant, limit = pair.split("=", 1)
+            limits[tenant.strip()] = float(limit)
+    return limits
+
+
+def allowed_tenants_from_env() -> FrozenSet[str]:
+    """
+    Tenants callers may name: SERVER_TENANTS="acme,beta" plus those in LLM_TENANT_BUDGETS
+    """
+    named = {t.strip() for t in os.getenv("SERVER_TENANTS", "").split(",") if t.strip()}
+    return frozenset(named | set(_tenant_budgets_from_env()))
+
+
+def resolve_tenant(requested: Optional[str], allowed: Iterable[str]) -> str:
+    """
+    `requested` if it is an allowed tenant, else DEFAULT_TENANT. The tenant
+    comes from an unauthenticated header, so unknown names share one budget
+    and one metric label instead of each getting a fresh one.
+    """
+    return requested if requested and requested in allowed else DEFAULT_TENANT
+
+
+@contextmanager
+def tenant_context(tenant: Optional[str]):
+    """
+    Attribute LLM calls made inside to `tenant` (for budgets and cost metrics)
+    """
+    token = _tenant.set(tenant or DEFAULT_TENANT)
+    try:
+        yield _tenant.get()
+    finally:
+        _tenant.reset(token)
+
+
+@contextmanager
+def collect_usage():
+    """
+    Collect the LLMUsage of every call made inside, e.g. to attach it to a pipeline result
+    """
+    calls: List[LLMUsage] = []
+    token = _collector.set(calls)
+    try:
+        yield calls
+    finally:
+        _collector.reset(token)
+
+
+def summarize(calls: List[LLMUsage]) -> Dict[str, float]:
+    return {
+        "calls": len(calls),
+        "prompt_tokens": sum(c.prompt_tokens for c in calls),
+        "completion_tokens": sum(c.completion_tokens for c in calls),
+        "cost_usd": round(sum(c.cost_usd for c in calls), 6),
+    }
+
+
+def record_usage(model: str, usage) -> Optional[LLMUsage]:
+    """
+    Record an OpenAI `usage` object: metrics, the active span and the current collector
+    """
+    if usage is None:
+        return None
+    prompt_tokens = getattr(usage, "prompt_tokens", 0) or 0
+    completion_tokens = getattr(usage, "completion_tokens", 0) or 0
+    tenant = current_tenant()
+    call = LLMUsage(model, prompt_tokens, completion_tokens,
+                    cost_usd(model, prompt_tokens, completion_tokens), tenant)
+
+    LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+    LLM_COST.inc(call.cost_usd, model=model, tenant=tenant)
+    tracing.set_attribute("llm.prompt_tokens", prompt_tokens)
+    tracing.set_attribute("llm.completion_tokens", completion_tokens)
+    tracing.set_attribute("llm.cost_usd", call.cost_usd)
+    calls = _collector.get()
+    if calls is not None:
+        calls.append(call)
+    return call
+
+
+class Reservation:
+    """
+    Worst-case spend held against a tenant's budget until the real usage is known
+    """
+    def __init__(self, budget: "BudgetManager", tenant: str, amount: float, max_tokens: int,
+                 model: Optional[str] = None):
+        self.budget = budget
+        self.tenant = tenant
+        self.amount = amount
+        self.max_tokens = max_tokens
+        self.model = model
+        self._settled = False
+
+    def commit(self, call: Optional[LLMUsage]):
+        self.budget._settle(self, call.cost_usd if call is not None else 0.0)
+
+    def charge(self):
+        """
+        Settle at the reserved worst case: tokens were spent but their usage never
+        arrived (stream closed early, generation cancelled)
+        """
+        if not self._settled and self.model is not None:
+            LLM_COST.inc(self.amount, model=self.model, tenant=self.tenant)
+        self.budget._settle(self, self.amount)
+
+    def release(self):
+        self.budget._settle(self, 0.0)
+
+
+class BudgetManager:
+    """
+    Per-tenant USD budgets over a fixed window (a day by default).
+
+    Before each call the worst-case cost (estimated prompt + max_tokens) is
+    reserved. When it doesn't fit, max_tokens is downshifted to what the
+    remaining budget can pay for; below `min_max_tokens` the call is rejected
+    with BudgetExceededError. Actual cost replaces the reservation afterwards.
+    """
+    def __init__(self, limits: Optional[Dict[str, float]] = None, default_limit: Optional[float] = None,
+                 window: float = 86_400, min_max_tokens: int = 256):
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self.window = window
+        self.min_max_tokens = min_max_tokens
+        self._spent: Dict[str, float] = {}
+        self._reserved: Dict[str, float] = {}
+        self._window_start = time.time()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> Optional["BudgetManager"]:
+        """
+        LLM_BUDGET_USD (every tenant) and LLM_TENANT_BUDGETS="acme=5,beta=0.5";
+        None when neither is set
+        """
+        default = os.getenv("LLM_BUDGET_USD")
+        limits = _tenant_budgets_from_env()
+        if default is None and not limits:
+            return None
+        return cls(
+            limits,
+            default_limit=float(default) if default is not None else None,
+            window=float(os.getenv("LLM_BUDGET_WINDOW", "86400")),
+        )
+
+    def limit(self, tenant: str) -> Optional[float]:
+        return self.limits.get(tenant, self.default_limit)
+
+    def spent(self, tenant: str) -> float:
+        with self._lock:
+            self._roll_window()
+            return self._spent.get(tenant, 0.0)
+
+    def remaining(self, tenant: str) -> Optional[float]:
+        limit = self.limit(tenant)
+        if limit is None:
+            return None
+        with self._lock:
+            self._roll_window()
+            return limit - self._spent.get(tenant, 0.0) - self._reserved.get(tenant, 0.0)
+
+    def reserve(self, tenant: str, model: str, prompt_tokens: int, max_tokens: int) -> Reservation:
+        prompt_price, completion_price = model_price(model)
+        with self._lock:
+            self._roll_window()
+            limit = self.limit(tenant)
+            worst_case = prompt_tokens * prompt_price + max_tokens * completion_price
+            if limit is not None:
+                left = limit - self._spent.get(tenant, 0.0) - self._reserved.get(tenant, 0.0)
+                if worst_case > left:
+                    affordable = (left - prompt_tokens * prompt_price) / completion_price if completion_price else 0
+                    if affordable < self.min_max_tokens:
+                        LLM_BUDGET_EVENTS.inc(tenant=tenant, action="reject")
+                        raise BudgetExceededError(
+                            tenant, f"LLM budget exhausted for tenant '{tenant}' (limit ${limit:.2f})"
+                        )
+                    LLM_BUDGET_EVENTS.inc(tenant=tenant, action="downshift")
+                    max_tokens = int(affordable)
+                    worst_case = prompt_tokens * prompt_price + max_tokens * completion_price
+            self._reserved[tenant] = self._reserved.get(tenant, 0.0) + worst_case
+        return Reservation(self, tenant, worst_case, max_tokens, model)
+
+    def _settle(self, reservation: Reservation, actual: float):
+        with self._lock:
+            if reservation._settled:
+                return
+            reservation._settled = True
+            tenant = reservation.tenant
+            self._reserved[tenant] = max(0.0, self._reserved.get(tenant, 0.0) - reservation.amount)
+            self._spent[tenant] = self._spent.get(tenant, 0.0) + actual
+
+    def _roll_window(self):
+        now = time.time()
+        if now - self._window_start >= self.window:
+            # Reservations still in flight carry over; spend starts from zero
+            self._spent.clear()
+            self._window_start = now
@@ -1,64 +1,47 @@
 import uuid
 import json
-from .prompts import N8N_NODE_TYPES, COMPLETE_PARAMS, FAKE_CREDENTIALS
-
-
-def fill_missing_parameters_and_creds(node):
-    """
-    Fill missing parameters and credentials for n8n node
-    """
-    ntype = node["type"]
-    
-    # Fill default params
-    params = node.get("parameters", {})
-    defaults = COMPLETE_PARAMS.get(ntype, {})
-    
-    # Deep merge parameters
-    for k, v in defaults.items():
-        if k not in params:
-            params[k] = v
-        elif isinstance(v, dict) and isinstance(params[k], dict):
-            # Merge nested dictionaries
-            merged = v.copy()
-            merged.update(params[k])
-            params[k] = merged
-    
-    node["parameters"] = params
-    
-    # Fill credentials
-    creds = FAKE_CREDENTIALS.get(ntype)
-    if creds:
-        node["credentials"] = creds
-    
-    return node
+from collections import Counter
+from typing import Optional
+from .node_registry import NODES, thaw
+from .normalize import NormalizedPlan, normalize_plan
+from .graph import WorkflowGraph
+from .dedup import DedupIndex, canonical_hash
+from .workflow_mirror import WorkflowMirror
+from . import tracing
+
+
+# Trigger nodes never carry credentials; n8n rejects them
+TRIGGER_TYPES = ("n8n-nodes-base.cron", "n8n-nodes-base.manualTrigger")
+# Send Email parameters dropped when empty
+EMAIL_OPTIONAL_PARAMS = ("cc", "bcc", "replyTo", "html", "attachments", "options")
+
 
 class WorkflowBuilder:
-    def __init__(self, n8n_url: str, session):
+    def __init__(self, n8n_url: str, session, dedup: Optional[DedupIndex] = None,
+                 mirror: Optional[WorkflowMirror] = None):
         self.n8n_url = n8n_url
         self.session = session
+        # Identical workflows (same canonical_hash) return the existing id instead of a new POST
+        self.dedup = dedup
+        # Local listing kept current with what this builder creates, updates and finds deleted
+        self.mirror = mirror
 
     def create_workflow(self, plan: dict) -> dict:
-        nodes = self._build_nodes(plan)
-        self._validate_nodes(nodes)
-        connections = self._build_connections(plan, nodes)
-
-        
-        for node in nodes:
-            
-            if node.get("type") in ["n8n-nodes-base.cron", "n8n-nodes-base.manualTrigger"]:
-                node.pop("credentials", None)
-            elif "credentials" in node and not node["credentials"]:
-                node.pop("credentials", None)
-
-            
-            if node.get("type") == "n8n-nodes-base.emailSend":
-                if "message" in node["parameters"]:
-                    node["parameters"]["text"] = node["parameters"].pop("message")
-                
-                for opt in ["cc", "bcc", "replyTo", "html", "attachments", "options"]:
-                    if opt in node["parameters"] and not node["parameters"][opt]:
-                        del node["parameters"][opt]
-       
+        with tracing.span("builder.create_workflow"):
+            return self._create_workflow(plan)
+
+    def _create_workflow(self, plan: dict) -> dict:
+        if not isinstance(plan, NormalizedPlan):
+            # Plans from LLMParser are already normalized; anything else gets the same single pass
+            plan = normalize_plan(plan)
+        with tracing.span("builder.build_nodes") as span:
+            nodes = self._build_nodes(plan)
+            self._validate_nodes(nodes)
+            span.set_attribute("workflow.node_count", len(nodes))
+        with tracing.span("builder.build_connections") as span:
+            graph = self._build_graph(plan, nodes)
+            connections = graph.to_connections()
+            span.set_attribute("workflow.connection_count", len(connections))
 
         workflow = {
             "name": f"AI Generated Workflow {str(uuid.uuid4())[:8]}",
@@ -66,93 +49,147 @@ class WorkflowBuilder:
             "connections": connections,
             "active": False
         }
-        self._validate_workflow(workflow)
+        self._validate_workflow(workflow, graph)
+        key = None
+        if self.dedup is not None:
+            key = canonical_hash(workflow)
+            existing = self.dedup.get(key)
+            if existing is not None and not self._still_exists(existing["id"]):
+                existing = None
+            tracing.set_attribute("workflow.deduplicated", existing is not None)
+            if existing is not None:
+                print("DEBUG: Identical workflow already exists", existing["id"], flush=True)
+                return dict(existing, deduplicated=True)
         print(json.dumps(workflow, indent=2))  
-        response = self.session.post(f"{self.n8n_url}/rest/workflows", json=workflow)
-        response.raise_for_status()
-        result = response.json()
+        with tracing.span("n8n.create_workflow", {"http.method": "POST"}, kind=tracing.KIND_CLIENT) as span:
+            response = self.session.post(f"{self.n8n_url}/rest/workflows", json=workflow)
+            span.set_attribute("http.status_code", getattr(response, "status_code", None))
+            response.raise_for_status()
+            result = response.json()
+            span.set_attribute("workflow.id", result.get("data", {}).get("id"))
         print("DEBUG: Workflow created successfully", result.get("data", {}).get("id"), flush=True)
-        return result.get("data", result)
+        data = result.get("data", result)
+        if key is not None and data.get("id") is not None:
+            self.dedup.put(key, data["id"], data.get("name") or workflow["name"])
+        if self.mirror is not None and data.get("id") is not None:
+            self.mirror.upsert(data)
+        return data
+
+    def _still_exists(self, workflow_id: str) -> bool:
+        """
+        Whether a deduplicated workflow can be reused. Answered from the mirror
+        when it lists the workflow; otherwise n8n is asked once. A 404 forgets
+        the entry; any other failure means "unknown" and the workflow is created.
+        """
+        if self.mirror is not None and self.mirror.get(workflow_id) is not None:
+            return True
+        try:
+            response = self.session.get(f"{self.n8n_url}/rest/workflows/{workflow_id}")
+            if getattr(response, "status_code", 200) == 404:
+                print(f"DEBUG: Deduplicated workflow {workflow_id} was deleted in n8n, creating it again", flush=True)
+                self.dedup.forget(workflow_id)
+                return False
+            response.raise_for_status()
+        except Exception as e:
+            print(f"WARNING: Could not confirm workflow {workflow_id} exists ({e}), creating it", flush=True)
+            return False
+        if self.mirror is not None:
+            body = response.json()
+            data = body.get("data", body) if isinstance(body, dict) else None
+            if isinstance(data, dict) and data.get("id") is not None:
+                self.mirror.upsert(data)
+        return True
+
+    def check_workflow(self, workflow: dict, previous: Optional[dict] = None):
+        """
+        Validate an n8n workflow without creating it; raises ValueError.
 
+        With `previous` (the workflow before an edit) only what the edit can
+        break is checked: node fields, unique names, connections to existing
+        nodes and required parameters of added or changed nodes. The orphan
+        and cycle rules for generated workflows don't hold for real ones
+        (sticky notes, loops, non-main connections).
+        """
+        if previous is None:
+            self._validate_workflow(workflow)
+            self._validate_nodes(workflow["nodes"])
+            return
+        self._validate_edit(workflow, previous)
+
+    def _validate_edit(self, workflow: dict, previous: dict):
+        if not workflow.get("nodes"):
+            raise ValueError("Workflow must have at least one node")
+        for node in workflow["nodes"]:
+            missing = [f for f in ("id", "name", "type", "parameters") if f not in node]
+            if missing:
+                raise ValueError(f"Node missing required fields: {missing}")
+        names = [node["name"] for node in workflow["nodes"]]
+        duplicates = sorted(name for name, count in Counter(names).items() if count > 1)
+        if duplicates:
+            raise ValueError(f"Duplicate node name: {', '.join(duplicates)}")
+
+        # Every connection type (main, ai_tool, ...) must point at existing nodes
+        known = set(names)
+        for source, ports in (workflow.get("connections") or {}).items():
+            if source not in known:
+                raise ValueError(f"Connection references non-existent node: {source}")
+            for targets in (ports or {}).values():
+                for output in targets or []:
+                    for target in output or []:
+                        if target.get("node") not in known:
+                            raise ValueError(f"Connection references non-existent node: {target.get('node')}")
+
+        before = {node.get("id"): node for node in previous.get("nodes") or []}
+        self._validate_nodes([node for node in workflow["nodes"] if before.get(node["id"]) != node])
 
     def _build_nodes(self, plan: dict) -> list:
         """
-        Build n8n nodes from plan
+        Build n8n nodes from a normalized plan
         """
-        nodes = []
-        
-        if "nodes" in plan and plan["nodes"]:
-            for idx, node in enumerate(plan["nodes"]):
-                ntype = N8N_NODE_TYPES.get(node.get("type"), node.get("type"))
-                name = node.get("name", node.get("id", f"Node {idx+1}"))
-                
-                node_obj = {
-                    "id": node.get("id", f"node_{idx+1}"),
-                    "name": name,
-                    "type": ntype,
-                    "typeVersion": node.get("typeVersion", 1),
-                    "parameters": node.get("parameters", {}),
-                    "position": node.get("position", [240 + idx*220, 300]),
-                    "disabled": False,
-                    "notes": f"Auto-generated {ntype.split('.')[-1]} node",
-                    "notesInFlow": False
-                }
-                
-                # Fill missing parameters and credentials
-                node_obj = fill_missing_parameters_and_creds(node_obj)
-                nodes.append(node_obj)
-        
-        return nodes
-
-    def _build_connections(self, plan: dict, nodes: list) -> dict:
-        if not nodes:
-            return {}
-
-        id2name = {n["id"]: n["name"] for n in nodes}
-        node_names = [n["name"] for n in nodes]
-
-        # Step 1: если есть connections — нормализуем по name
-        n8n_conns = {}
-        if "connections" in plan and plan["connections"]:
-            for from_any, to_list in plan["connections"].items():
-                # Маппим и id, и name → name
-                from_name = id2name.get(from_any, from_any)
-                if from_name not in node_names:
-                    continue
-
-                connections_list = []
-                for to_any in to_list:
-                    to_name = id2name.get(to_any, to_any)
-                    if to_name in node_names:
-                        connections_list.append({
-                            "node": to_name,
-                            "type": "main",
-                            "index": 0
-                        })
-                if connections_list:
-                    n8n_conns[from_name] = {"main": [connections_list]}
-
-            
-            if not n8n_conns and len(nodes) > 1:
-                for i in range(len(node_names) - 1):
-                    n8n_conns[node_names[i]] = {
-                        "main": [[{"node": node_names[i + 1], "type": "main", "index": 0}]]
-                    }
-            return n8n_conns
-
-        # Step 2: 
-        if len(nodes) < 2:
-            return {}
-        for i in range(len(node_names) - 1):
-            n8n_conns[node_names[i]] = {
-                "main": [[{"node": node_names[i + 1], "type": "main", "index": 0}]]
+        return [self._n8n_node(node) for node in plan.get("nodes") or []]
+
+    @staticmethod
+    def _n8n_node(node: dict) -> dict:
+        """
+        n8n's representation of a normalized plan node. Parameters and credentials
+        are thawed into the node's own mutable copies, never registry FrozenDicts.
+        """
+        ntype = node["type"]
+        params = node["parameters"]
+        if ntype == "n8n-nodes-base.emailSend":
+            params = {
+                ("text" if key == "message" else key): value for key, value in params.items()
+                if value or key not in EMAIL_OPTIONAL_PARAMS
             }
-        return n8n_conns
+        node_obj = {
+            "id": node["id"],
+            "name": node["name"],
+            "type": ntype,
+            "typeVersion": node["typeVersion"],
+            "parameters": thaw(params),
+            "position": node["position"],
+            "disabled": False,
+            "notes": f"Auto-generated {ntype.split('.')[-1]} node",
+            "notesInFlow": False
+        }
+        if node.get("credentials") and ntype not in TRIGGER_TYPES:
+            node_obj["credentials"] = thaw(node["credentials"])
+        return node_obj
 
+    def _build_graph(self, plan: dict, nodes: list) -> WorkflowGraph:
+        """
+        Connection graph over the built nodes; plan connections may use names or ids.
+        Without any usable connection the nodes are chained in plan order.
+        """
+        graph = WorkflowGraph.from_plan(nodes, plan.get("connections"))
+        if len(nodes) > 1 and next(graph.edges(), None) is None:
+            for a, b in zip(nodes, nodes[1:]):
+                graph.connect(a["name"], b["name"])
+        return graph
 
-    def _validate_workflow(self, workflow: dict):
+    def _validate_workflow(self, workflow: dict, graph: Optional[WorkflowGraph] = None):
         """
-        Validate workflow structure before creation
+        Validate workflow structure before creation, in one pass over nodes and connections
         """
         if not workflow.get("nodes"):
             raise ValueError("Workflow must have at least one node")
@@ -164,19 +201,14 @@ class WorkflowBuilder:
             if missing:
                 raise ValueError(f"Node missing required fields: {missing}")
         
-        # Validate connections reference existing nodes
-        node_names = {n["name"] for n in workflow["nodes"]}
-        connections = workflow.get("connections", {})
-        
-        for from_node, conn_data in connections.items():
-            if from_node not in node_names:
-                raise ValueError(f"Connection references non-existent node: {from_node}")
-            
-            if "main" in conn_data:
-                for conn_list in conn_data["main"]:
+        # Dangling references raise while the graph is built; cycles and unreachable nodes here
+        if graph is None:
+            graph = WorkflowGraph(workflow["nodes"])
+            for from_node, conn_data in workflow.get("connections", {}).items():
+                for output, conn_list in enumerate(conn_data.get("main", [])):
                     for conn in conn_list:
-                        if conn["node"] not in node_names:
-                            raise ValueError(f"Connection references non-existent target node: {conn['node']}")
+                        graph.connect(from_node, conn["node"], output, conn.get("index", 0))
+        graph.validate()
 
     def _validate_nodes(self, nodes: list):
         """
@@ -184,28 +216,11 @@ class WorkflowBuilder:
         """
         for node in nodes:
             node_type = node["type"]
-            required_params = COMPLETE_PARAMS.get(node_type, {})
-            
-            # Check if critical parameters exist
-            if node_type == "n8n-nodes-base.cron":
-                if "mode" not in node["parameters"]:
-                    raise ValueError(f"Cron node '{node['name']}' missing 'mode' parameter")
-            
-            elif node_type == "n8n-nodes-base.googleGmail":
-                required = ["resource", "operation"]
-                missing = [k for k in required if k not in node["parameters"]]
-                if missing:
-                    raise ValueError(f"Gmail node '{node['name']}' missing required params: {missing}")
-            
-            elif node_type == "n8n-nodes-base.openai":
-                if "messagesUi" not in node["parameters"]:
-                    raise ValueError(f"OpenAI node '{node['name']}' missing 'messagesUi' parameter")
-            
-            elif node_type == "n8n-nodes-base.emailSend":
-                required = ["fromEmail", "toEmail", "subject"]
-                missing = [k for k in required if k not in node["parameters"]]
-                if missing:
-                    raise ValueError(f"Email node '{node['name']}' missing required params: {missing}")
+            required = NODES.required(node_type, node.get("typeVersion"))
+            missing = [k for k in required if k not in node["parameters"]]
+            if missing:
+                label = NODES.get(node_type).display_name
+                raise ValueError(f"{label} node '{node['name']}' missing required params: {missing}")
 
     def get_workflow(self, workflow_id: str) -> dict:
         """
@@ -221,7 +236,15 @@ class WorkflowBuilder:
         """
         response = self.session.put(f"{self.n8n_url}/rest/workflows/{workflow_id}", json=workflow_data)
         response.raise_for_status()
-        return response.json().get("data", response.json())
+        if self.dedup is not None:
+            # The old content hash no longer describes this workflow
+            self.dedup.forget(workflow_id)
+            if workflow_data.get("nodes"):
+                self.dedup.put(canonical_hash(workflow_data), workflow_id, workflow_data.get("name") or "")
+        data = response.json().get("data", response.json())
+        if self.mirror is not None and isinstance(data, dict) and data.get("id") is not None:
+            self.mirror.upsert(data)
+        return data
 
     def execute_workflow(self, workflow_id: str) -> dict:
         """
@@ -0,0 +1,273 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlencode
+from .metrics import CACHE_REQUESTS
+
+DEFAULT_MIRROR_PATH = os.path.join("~", ".cache", "automation_assistant", "n8n_workflows.sqlite")
+DEFAULT_PAGE_SIZE = 100
+
+
+class WorkflowPage:
+    """
+    One page of GET /rest/workflows. `workflows` is None when the server
+    answered 304 Not Modified to a conditional request. `partial` marks a
+    page that repeated earlier workflows, after which paging gave up, so the
+    listing may be incomplete.
+    """
+    def __init__(self, skip: int, workflows: Optional[List[Dict[str, Any]]], etag: Optional[str],
+                 count: Optional[int] = None, partial: bool = False):
+        self.skip = skip
+        self.workflows = workflows
+        self.etag = etag
+        self.count = count
+        self.partial = partial
+
+    @property
+    def not_modified(self) -> bool:
+        return self.workflows is None
+
+
+def iter_pages(session, n8n_url: str, page_size: int = DEFAULT_PAGE_SIZE,
+               etags: Optional[Dict[int, str]] = None, sizes: Optional[Dict[int, int]] = None) -> Iterator[WorkflowPage]:
+    """
+    Page through GET /rest/workflows with skip/take, sending If-None-Match
+    for pages whose ETag is known. Stops at the first short page, once the
+    server's total `count` is reached, or when the server evidently ignores
+    skip/take: a page longer than `take` (the whole listing) or one repeating
+    workflows already seen. `sizes` gives the known length of not-modified
+    pages so paging can continue past them.
+    """
+    etags = etags or {}
+    sizes = sizes or {}
+    seen = set()
+    skip = 0
+    while True:
+        url = f"{n8n_url}/rest/workflows?{urlencode({'skip': skip, 'take': page_size})}"
+        etag = etags.get(skip)
+        # Only pass headers when needed; plain sessions and test doubles take get(url)
+        response = session.get(url, headers={"If-None-Match": etag}) if etag else session.get(url)
+        if getattr(response, "status_code", 200) == 304:
+            CACHE_REQUESTS.inc(cache="workflow_page", result="not_modified")
+            yield WorkflowPage(skip, None, etag)
+            size = sizes.get(skip, 0)
+        else:
+            response.raise_for_status()
+            body = response.json()
+            workflows = body.get("data", []) if isinstance(body, dict) else body
+            count = body.get("count") if isinstance(body, dict) else None
+            CACHE_REQUESTS.inc(cache="workflow_page", result="fetched")
+            ids = [str(wf.get("id")) for wf in workflows]
+            if seen.intersection(ids):
+                print(f"WARNING: n8n repeated workflows at skip={skip}; it ignores paging, listing may be incomplete",
+                      flush=True)
+                yield WorkflowPage(skip, [wf for wf, i in zip(workflows, ids) if i not in seen], None, count, partial=True)
+                return
+            seen.update(ids)
+            yield WorkflowPage(skip, workflows, (getattr(response, "headers", None) or {}).get("ETag"), count)
+            size = len(workflows)
+            if size > page_size or (count is not None and skip + size >= count):
+                return
+        if size < page_size:
+            return
+        skip += page_size
+
+
+def iter_workflows(session, n8n_url: str, page_size: int = DEFAULT_PAGE_SIZE) -> Iterator[Dict[str, Any]]:
+    """
+    Stream workflows from n8n one page at a time, so memory stays bounded by page_size
+    """
+    for page in iter_pages(session, n8n_url, page_size):
+        yield from page.workflows
+
+
+class WorkflowMirror:
+    """
+    Local SQLite copy of the n8n workflow listing, kept current by sync().
+
+    sync() pages through the API with conditional requests: pages whose ETag
+    still matches cost a 304 and no parsing, changed rows are upserted by
+    updatedAt, and workflows missing from a complete pass are deleted.
+    Listings and searches are then served locally.
+    """
+    def __init__(self, path: Optional[str] = None, page_size: int = DEFAULT_PAGE_SIZE):
+        self.page_size = page_size
+        self._lock = threading.Lock()
+        if path:
+            path = os.path.expanduser(path)
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        if path:
+            self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS workflows ("
+            "id TEXT PRIMARY KEY, name TEXT NOT NULL, active INTEGER NOT NULL, "
+            "updated_at TEXT, data TEXT NOT NULL, synced REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS workflows_name ON workflows(name COLLATE NOCASE)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            "page_size INTEGER NOT NULL, skip INTEGER NOT NULL, etag TEXT NOT NULL, ids TEXT NOT NULL, "
+            "PRIMARY KEY (page_size, skip))"
+        )
+        self._db.commit()
+
+    @classmethod
+    def from_env(cls) -> Optional["WorkflowMirror"]:
+        """
+        WORKFLOW_MIRROR_PATH (off disables it, memory keeps it in-process)
+        """
+        path = os.getenv("WORKFLOW_MIRROR_PATH", DEFAULT_MIRROR_PATH)
+        if path.lower() in ("", "0", "off", "false"):
+            return None
+        if path.lower() == "memory":
+            path = None
+        return cls(path, page_size=int(os.getenv("WORKFLOW_MIRROR_PAGE_SIZE", str(DEFAULT_PAGE_SIZE))))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM workflows").fetchone()[0]
+
+    def sync(self, session, n8n_url: str) -> Dict[str, int]:
+        """
+        Bring the mirror up to date; returns page and row counts for logging
+        """
+        stats = {"pages": 0, "not_modified": 0, "upserted": 0, "deleted": 0}
+        with self._lock:
+            known = {
+                skip: (etag, json.loads(ids)) for skip, etag, ids in self._db.execute(
+                    "SELECT skip, etag, ids FROM pages WHERE page_size = ?", (self.page_size,)
+                )
+            }
+        etags = {skip: etag for skip, (etag, _) in known.items()}
+        sizes = {skip: len(ids) for skip, (_, ids) in known.items()}
+        seen = set()
+        now = time.time()
+        last_skip = 0
+        complete = True
+        for page in iter_pages(session, n8n_url, self.page_size, etags, sizes):
+            stats["pages"] += 1
+            last_skip = page.skip
+            complete = not page.partial
+            if page.not_modified:
+                stats["not_modified"] += 1
+                seen.update(known[page.skip][1])
+                continue
+            ids = [str(wf["id"]) for wf in page.workflows]
+            seen.update(ids)
+            with self._lock:
+                for wf in page.workflows:
+                    cursor = self._db.execute(
+                        "INSERT INTO workflows (id, name, active, updated_at, data, synced) VALUES (?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT(id) DO UPDATE SET name = excluded.name, active = excluded.active, "
+                        "updated_at = excluded.updated_at, data = excluded.data, synced = excluded.synced "
+                        "WHERE workflows.updated_at IS NOT excluded.updated_at OR workflows.updated_at IS NULL",
+                        (str(wf["id"]), wf.get("name") or "", int(bool(wf.get("active"))), wf.get("updatedAt"),
+                         json.dumps(wf, ensure_ascii=False, separators=(",", ":")), now),
+                    )
+                    stats["upserted"] += cursor.rowcount
+                if page.etag:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO pages (page_size, skip, etag, ids) VALUES (?, ?, ?, ?)",
+                        (self.page_size, page.skip, page.etag, json.dumps(ids)),
+                    )
+                else:
+                    self._db.execute("DELETE FROM pages WHERE page_size = ? AND skip = ?", (self.page_size, page.skip))
+                self._db.commit()
+
+        if not complete:
+            # Paging broke off: rows not seen may still exist in n8n
+            return stats
+        # The pass was complete: anything not seen was deleted in n8n
+        with self._lock:
+            stale = [row[0] for row in self._db.execute("SELECT id FROM workflows") if row[0] not in seen]
+            self._db.executemany("DELETE FROM workflows WHERE id = ?", [(i,) for i in stale])
+            self._db.execute("DELETE FROM pages WHERE page_size = ? AND skip > ?", (self.page_size, last_skip))
+            self._db.commit()
+        stats["deleted"] = len(stale)
+        return stats
+
+    def get(self, workflow_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute("SELECT data FROM workflows WHERE id = ?", (str(workflow_id),)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def list(self, active: Optional[bool] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        query, args = "SELECT data FROM workflows", []
+        if active is not None:
+            query += " WHERE active = ?"
+            args.append(int(active))
+        query += " ORDER BY name COLLATE NOCASE, id LIMIT ?"
+        args.append(-1 if limit is None else limit)
+        with self._lock:
+            rows = self._db.execute(query, args).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def search(self, text: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        Workflows whose name contains `text` (case-insensitive)
+        """
+        pattern = "%" + text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT data FROM workflows WHERE name LIKE ? ESCAPE '\\' ORDER BY name COLLATE NOCASE, id LIMIT ?",
+                (pattern, limit),
+            ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def upsert(self, workflow: Dict[str, Any]):
+        """
+        Record a workflow we just created or updated, without waiting for the next sync
+        """
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO workflows (id, name, active, updated_at, data, synced) VALUES (?, ?, ?, ?, ?, ?)",
+                (str(workflow["id"]), workflow.get("name") or "", int(bool(workflow.get("active"))),
+                 workflow.get("updatedAt"), json.dumps(workflow, ensure_ascii=False, separators=(",", ":")), time.time()),
+            )
+            self._db.commit()
+
+
+    def forget(self, workflow_id: str):
+        """
+        Drop a workflow we found to be deleted in n8n
+        """
+        with self._lock:
+            self._db.execute("DELETE FROM workflows WHERE id = ?", (str(workflow_id),))
+            self._db.commit()
+
+
+def main():
+    """
+    Sync the mirror and print matching workflows:
+    python -m automation_assistant.workflow_mirror [name filter]
+    """
+    import sys
+    from dotenv import load_dotenv
+    from .cookie_cache import CookieCache
+    from .n8n_session import N8nSessionManager
+
+    load_dotenv()
+    n8n_url = os.getenv("N8N_API_URL")
+    email = os.getenv("N8N_USER_EMAIL")
+    pwd = os.getenv("N8N_USER_PASSWORD")
+    if not (n8n_url and email and pwd):
+        print("ERROR: Missing N8N_API_URL or login credentials")
+        return
+    session = N8nSessionManager(n8n_url, email, pwd, cookie_cache=CookieCache.from_env(n8n_url, email, pwd))
+    if not session.connect():
+        print("ERROR: Could not log into n8n in time.")
+        return
+    mirror = WorkflowMirror.from_env() or WorkflowMirror()
+    stats = mirror.sync(session, n8n_url)
+    print(f"Synced {len(mirror)} workflows: {stats}")
+    workflows = mirror.search(" ".join(sys.argv[1:])) if len(sys.argv) > 1 else mirror.list()
+    for wf in workflows:
+        print(f"{wf['id']}\t{'active' if wf.get('active') else 'inactive'}\t{wf.get('name')}")
+
+
+if __name__ == "__main__":
+    main()
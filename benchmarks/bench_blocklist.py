@@ -0,0 +1,48 @@
+"""
+Blocklist matching cost vs. blocklist size.
+
+    poetry run python -m benchmarks.bench_blocklist
+
+Compares the old per-term substring scan with the compiled BlocklistMatcher
+on a 1000-character prompt that contains no forbidden term (worst case).
+"""
+import random
+import string
+import timeit
+from automation_assistant.blocklist import BlocklistMatcher
+
+PROMPT = ("Every Monday at 10:00 AM, send me a summary of unread Gmail emails "
+          "and post the highlights to our team channel. ") * 9
+
+
+def random_terms(n, seed=0):
+    rng = random.Random(seed)
+    terms = set()
+    while len(terms) < n:
+        terms.add("".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(6, 14))))
+    return terms
+
+
+def naive_scan(terms, prompt):
+    prompt_lower = prompt.lower()
+    for term in terms:
+        if term in prompt_lower:
+            return term
+    return None
+
+
+def main():
+    print(f"{'terms':>8} {'naive (us)':>12} {'compiled (us)':>14} {'build (ms)':>11}")
+    for n in (10, 100, 1_000, 10_000, 50_000):
+        terms = random_terms(n)
+        build = timeit.timeit(lambda: BlocklistMatcher(terms), number=1)
+        matcher = BlocklistMatcher(terms)
+        assert matcher.search(PROMPT) is None
+        runs = 200
+        naive = timeit.timeit(lambda: naive_scan(terms, PROMPT), number=runs) / runs
+        compiled = timeit.timeit(lambda: matcher.search(PROMPT), number=runs) / runs
+        print(f"{n:>8} {naive * 1e6:>12.1f} {compiled * 1e6:>14.1f} {build * 1e3:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""
+Auto-layout cost vs. workflow size.
+
+    poetry run python -m benchmarks.bench_layout
+
+Times layered_layout() (graph already built) on three synthetic shapes:
+a plain chain, a chain with an IF branch/merge every few nodes, and a random
+DAG where each node hangs off one of the five previous ones. The per-node
+column should stay roughly flat: layering and the sweeps are linear apart
+from sorting within each layer.
+"""
+import random
+import timeit
+from automation_assistant.graph import WorkflowGraph
+from automation_assistant.layout import layered_layout
+
+
+def node(name, ntype="n8n-nodes-base.code"):
+    return {"id": name, "name": name, "type": ntype, "parameters": {}}
+
+
+def chain(n):
+    nodes = [node("T", "n8n-nodes-base.cron")] + [node(f"n{i}") for i in range(n - 1)]
+    return nodes, {a["name"]: [b["name"]] for a, b in zip(nodes, nodes[1:])}
+
+
+def branching(n):
+    nodes = [node("T", "n8n-nodes-base.cron")]
+    connections = {}
+    last = "T"
+    while len(nodes) < n:
+        i = len(nodes)
+        check, yes, no, merge = f"if{i}", f"yes{i}", f"no{i}", f"merge{i}"
+        nodes += [node(check, "n8n-nodes-base.if"), node(yes), node(no), node(merge)]
+        connections[last] = [check]
+        connections[check] = {"true": [yes], "false": [no]}
+        connections[yes] = [merge]
+        connections[no] = [merge]
+        last = merge
+    return nodes, connections
+
+
+def random_dag(n, seed=0):
+    rng = random.Random(seed)
+    nodes = [node("T", "n8n-nodes-base.cron")] + [node(f"n{i}") for i in range(n - 1)]
+    connections = {}
+    for i in range(1, n):
+        source = nodes[rng.randrange(max(0, i - 5), i)]["name"]
+        connections.setdefault(source, []).append(nodes[i]["name"])
+    return nodes, connections
+
+
+def main():
+    print(f"{'shape':>10} {'nodes':>8} {'layout (ms)':>12} {'per node (us)':>14}")
+    for shape in (chain, branching, random_dag):
+        for n in (10, 100, 1_000, 10_000):
+            graph = WorkflowGraph.from_plan(*shape(n))
+            runs = max(3, 2_000 // n)
+            seconds = min(timeit.repeat(lambda: layered_layout(graph), number=1, repeat=runs))
+            print(f"{shape.__name__:>10} {len(graph):>8} {seconds * 1e3:>12.2f} {seconds / len(graph) * 1e6:>14.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Plan normalization + node building cost vs. plan size.
+
+    poetry run python -m benchmarks.bench_normalize
+
+Compares the old path (LLMParser merging thawed copies of the defaults, then
+WorkflowBuilder merging them again and cleaning up in a separate pass) with
+the single copy-on-write normalize_plan() pass. The per-node column should
+stay flat from 10 to 10,000 nodes: both passes are linear.
+"""
+import json
+import timeit
+from automation_assistant.node_registry import NODES, thaw
+from automation_assistant.normalize import normalize_plan
+from automation_assistant.workflow_builder import WorkflowBuilder
+
+NODE_TYPES = ["schedule", "gmail", "code", "aggregate", "openai", "sendEmail", "if", "httpRequest"]
+
+
+def synthetic_plan(n):
+    """
+    Raw LLM-style plan: aliases, sparse parameters, sequential list connections
+    """
+    nodes = []
+    for i in range(n):
+        node = {"id": f"n{i}", "name": f"Node {i}", "type": NODE_TYPES[i % len(NODE_TYPES)], "parameters": {}}
+        if node["type"] == "sendEmail":
+            node["parameters"] = {"toEmail": f"user{i}@example.com", "message": "hi", "options": {"cc": "a@b.c"}}
+        nodes.append(node)
+    connections = {f"n{i}": [f"n{i + 1}"] for i in range(n - 1)}
+    return json.dumps({"nodes": nodes, "connections": connections})
+
+
+def deep_merge(base, override):
+    result = base.copy()
+    for key, value in override.items():
+        if key in result and isinstance(result[key], dict) and isinstance(value, dict):
+            result[key] = deep_merge(result[key], value)
+        else:
+            result[key] = value
+    return result
+
+
+def old_path(plan):
+    for node in plan["nodes"]:
+        node["type"] = NODES.resolve(node["type"]) or node["type"]
+        node["parameters"] = deep_merge(thaw(NODES.defaults(node["type"])), node["parameters"])
+        if NODES.credentials(node["type"]):
+            node["credentials"] = thaw(NODES.credentials(node["type"]))
+    nodes = []
+    for node in plan["nodes"]:
+        params = node["parameters"]
+        for k, v in NODES.defaults(node["type"]).items():
+            if k not in params:
+                params[k] = thaw(v)
+            elif isinstance(v, dict) and isinstance(params[k], dict):
+                merged = thaw(v)
+                merged.update(params[k])
+                params[k] = merged
+        nodes.append({**node, "parameters": params, "credentials": thaw(NODES.credentials(node["type"]))})
+    for node in nodes:
+        if not node["credentials"]:
+            node.pop("credentials")
+        if node["type"] == "n8n-nodes-base.emailSend" and "message" in node["parameters"]:
+            node["parameters"]["text"] = node["parameters"].pop("message")
+    return nodes
+
+
+BUILDER = WorkflowBuilder("http://n8n", session=None)
+
+
+def new_path(plan):
+    return BUILDER._build_nodes(normalize_plan(plan))
+
+
+def main():
+    print(f"{'nodes':>8} {'old (ms)':>10} {'new (ms)':>10} {'old/node (us)':>14} {'new/node (us)':>14}")
+    for n in (10, 100, 1_000, 10_000):
+        raw = synthetic_plan(n)
+        runs = max(1, 2_000 // n)
+        # json.loads per run: both paths get a fresh plan, as from the LLM
+        parse = timeit.timeit(lambda: json.loads(raw), number=runs) / runs
+        old = timeit.timeit(lambda: old_path(json.loads(raw)), number=runs) / runs - parse
+        new = timeit.timeit(lambda: new_path(json.loads(raw)), number=runs) / runs - parse
+        print(f"{n:>8} {old * 1e3:>10.2f} {new * 1e3:>10.2f} {old / n * 1e6:>14.1f} {new / n * 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    main()
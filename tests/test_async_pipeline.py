@@ -0,0 +1,108 @@
+import asyncio
+import json
+import pytest
+from automation_assistant.async_pipeline import AsyncWorkflowPipeline
+from automation_assistant.guardrails import SafetyValidator
+from automation_assistant.llm_parser import LLMParser
+from automation_assistant.pipeline import PipelineError
+
+@pytest.fixture(autouse=True)
+def set_openai_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test-1234567")
+
+PLAN = {
+    "nodes": [{"id": "cron1", "type": "n8n-nodes-base.cron",
+               "parameters": {"mode": "custom", "cronExpression": "0 10 * * 1", "timezone": "UTC"}}],
+    "connections": {}
+}
+
+class DummyParser:
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.started = False
+        self.cancelled = False
+
+    async def aparse(self, prompt):
+        self.started = True
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return json.loads(json.dumps(PLAN))
+
+class DummyValidator(SafetyValidator):
+    def __init__(self, safe=True):
+        super().__init__()
+        self.safe = safe
+
+    async def amoderate_prompt(self, prompt, client):
+        await asyncio.sleep(0.01)
+        return self.safe
+
+class DummyBuilder:
+    def create_workflow(self, plan):
+        return {"id": "wf1", "name": "AI Generated Workflow"}
+
+def make_pipeline(parser, validator):
+    return AsyncWorkflowPipeline(parser, validator, DummyBuilder(), "sk-test", client=object())
+
+def test_async_pipeline_success():
+    parser = DummyParser()
+    pipeline = make_pipeline(parser, DummyValidator(safe=True))
+    result = asyncio.run(pipeline.arun("Send me a summary every Monday"))
+    assert result["id"] == "wf1"
+    assert parser.started and not parser.cancelled
+
+def test_async_pipeline_cancels_generation_when_flagged():
+    parser = DummyParser(delay=5)
+    pipeline = make_pipeline(parser, DummyValidator(safe=False))
+    with pytest.raises(PipelineError) as exc:
+        asyncio.run(pipeline.arun("Send me something"))
+    assert exc.value.stage == "moderation"
+    assert parser.cancelled
+
+def test_async_pipeline_overlaps_moderation_and_generation():
+    parser = DummyParser(delay=0.1)
+    pipeline = make_pipeline(parser, DummyValidator(safe=True))
+
+    async def run_many():
+        return await asyncio.gather(*(pipeline.arun(f"prompt {i}") for i in range(50)))
+
+    results = asyncio.run(run_many())
+    assert len(results) == 50
+
+def test_async_pipeline_pre_validation_skips_network():
+    parser = DummyParser()
+    pipeline = make_pipeline(parser, DummyValidator(safe=True))
+    with pytest.raises(PipelineError) as exc:
+        asyncio.run(pipeline.arun("Delete all system files!"))
+    assert exc.value.stage == "pre_validation"
+    assert not parser.started
+
+def test_amoderate_prompt_fails_closed():
+    class BrokenModerations:
+        async def create(self, input):
+            raise RuntimeError("network down")
+
+    class BrokenClient:
+        moderations = BrokenModerations()
+
+    validator = SafetyValidator()
+    assert asyncio.run(validator.amoderate_prompt("hello", BrokenClient())) is False
+
+def test_llmparser_aparse_uses_async_client():
+    reply = json.dumps(PLAN)
+
+    class AsyncCompletions:
+        async def create(self, **kwargs):
+            msg = type("msg", (), {"content": reply})
+            return type("resp", (), {"choices": [type("choice", (), {"message": msg})()]})()
+
+    class AsyncClient:
+        chat = type("Chat", (), {"completions": AsyncCompletions()})()
+
+    parser = LLMParser()
+    parser.async_client = AsyncClient()
+    plan = asyncio.run(parser.aparse("Every Monday at 10"))
+    assert plan["nodes"][0]["id"] == "cron1"
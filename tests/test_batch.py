@@ -0,0 +1,61 @@
+import asyncio
+import json
+from automation_assistant.batch import run_batch, load_completed
+from automation_assistant.pipeline import PipelineError
+
+class DummyPipeline:
+    def __init__(self):
+        self.prompts = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def arun(self, prompt, metrics=None):
+        self.prompts.append(prompt)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        metrics.start("llm_generation")
+        await asyncio.sleep(0.01)
+        metrics.stop("llm_generation")
+        self.in_flight -= 1
+        if "forbidden" in prompt:
+            raise PipelineError("pre_validation", "Prompt failed safety validation.")
+        return {"id": f"wf-{prompt}", "name": "AI Generated Workflow"}
+
+def write_jsonl(path, rows):
+    path.write_text("".join(json.dumps(r) + "\n" for r in rows))
+
+def read_jsonl(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+def test_run_batch_writes_results(tmp_path):
+    inp, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_jsonl(inp, [{"id": str(i), "prompt": f"p{i}"} for i in range(20)] + [{"id": "bad", "prompt": "forbidden"}])
+    pipeline = DummyPipeline()
+
+    summary = asyncio.run(run_batch(pipeline, str(inp), str(out), concurrency=4))
+
+    assert summary == {"ok": 20, "error": 1, "skipped": 0}
+    assert pipeline.max_in_flight <= 4
+    records = {r["id"]: r for r in read_jsonl(out)}
+    assert records["3"]["workflow_id"] == "wf-p3"
+    assert "llm_generation" in records["3"]["latency"]
+    assert records["bad"]["stage"] == "pre_validation"
+
+def test_run_batch_resumes_without_redoing(tmp_path):
+    inp, out = tmp_path / "in.jsonl", tmp_path / "out.jsonl"
+    write_jsonl(inp, [{"id": "a", "prompt": "pa"}, {"id": "b", "prompt": "pb"}, "bare prompt"])
+    # Simulate a crash after "a" completed, with a torn last line
+    out.write_text(json.dumps({"id": "a", "status": "ok"}) + "\n" + '{"id": "b", "sta')
+    pipeline = DummyPipeline()
+
+    summary = asyncio.run(run_batch(pipeline, str(inp), str(out)))
+
+    assert summary["skipped"] == 1
+    assert sorted(pipeline.prompts) == ["bare prompt", "pb"]
+    assert load_completed(str(out)) == {"a", "b", "3"}
+
+def test_load_completed_retry_failed(tmp_path):
+    out = tmp_path / "out.jsonl"
+    write_jsonl(out, [{"id": "a", "status": "ok"}, {"id": "b", "status": "error"}])
+    assert load_completed(str(out)) == {"a", "b"}
+    assert load_completed(str(out), retry_failed=True) == {"a"}
@@ -0,0 +1,88 @@
+from automation_assistant.blocklist import BlocklistMatcher, BlocklistMatch, load_blocklist
+from automation_assistant.guardrails import SafetyValidator
+
+def test_substring_matching_matches_old_behavior():
+    matcher = BlocklistMatcher({"delete", "rm -rf", "format"})
+    assert matcher.search("Please DELETE everything").term == "delete"
+    assert matcher.search("run rm -rf /").term == "rm -rf"
+    # Substring semantics by default, as the original scan did
+    assert matcher.search("send information").term == "format"
+    assert matcher.search("summarize my inbox") is None
+
+def test_find_all_reports_offsets():
+    matcher = BlocklistMatcher({"drop", "drop table", "shutdown"})
+    text = "Drop table users then shutdown"
+    assert matcher.find_all(text) == [
+        BlocklistMatch("drop table", 0, 10),
+        BlocklistMatch("shutdown", 22, 30),
+    ]
+
+def test_word_boundary_option():
+    matcher = BlocklistMatcher({"format"}, word_boundary=True)
+    assert matcher.search("send information") is None
+    assert matcher.search("format the disk").term == "format"
+
+def test_unicode_normalization_and_offsets():
+    matcher = BlocklistMatcher({"strasse", "delete"})
+    # Fullwidth letters fold to ASCII under NFKC
+    assert matcher.search("ｄｅｌｅｔｅ it").term == "delete"
+    # 'ß' casefolds to 'ss', offsets still point into the original text
+    text = "Go to Hauptstraße now"
+    match = matcher.search(text)
+    assert match.term == "strasse"
+    assert text[match.start:match.end] == "straße"
+
+def test_special_characters_are_literal():
+    matcher = BlocklistMatcher({"a.b", "(x)"})
+    assert matcher.search("axb") is None
+    assert matcher.search("call (x) now").term == "(x)"
+
+def test_empty_blocklist_never_matches():
+    assert BlocklistMatcher([]).search("anything") is None
+
+def test_load_blocklist(tmp_path):
+    path = tmp_path / "terms.txt"
+    path.write_text("# compliance terms\nwire transfer\n\nexfiltrate  # inline comment\n")
+    assert load_blocklist(str(path)) == ["wire transfer", "exfiltrate"]
+
+def test_validator_loads_blocklist_files(tmp_path):
+    path = tmp_path / "terms.txt"
+    path.write_text("exfiltrate\n")
+    validator = SafetyValidator(blocklist_files=[str(path)])
+    assert validator.validate_input("Exfiltrate the CRM data") is False
+    assert validator.validate_input("Delete all system files!") is False
+    assert [m.term for m in validator.find_forbidden("delete then exfiltrate")] == ["delete", "exfiltrate"]
+
+def test_large_blocklist():
+    terms = {f"term{i:05d}x" for i in range(5000)}
+    matcher = BlocklistMatcher(terms)
+    assert len(matcher) == 5000
+    assert matcher.search("contains term04999x here").term == "term04999x"
+    assert matcher.search("term0499 is not a full term") is None
+
+def test_combining_marks_fold_like_precomposed_text():
+    # Precomposed term, decomposed text ('e' + COMBINING ACUTE ACCENT) and vice versa
+    matcher = BlocklistMatcher({"café", "naïve"})
+    text = "Order a café now"
+    match = matcher.search(text)
+    assert match.term == "café"
+    assert text[match.start:match.end] == "café"
+    text = "so naïve"
+    match = matcher.search(text)
+    assert match.term == "naïve"
+    assert text[match.start:match.end] == "naïve"
+
+def test_offsets_with_width_changing_characters():
+    matcher = BlocklistMatcher({"fine", "ss", "kg"})
+    # Folds to three characters like the original, but not one-to-one
+    text = "éß"
+    assert matcher.find_all(text) == [BlocklistMatch("ss", 2, 3)]
+    # Ligature and unit square expand under NFKC
+    text = "the ﬁne print, 5㎏"
+    assert [text[m.start:m.end] for m in matcher.find_all(text)] == ["ﬁne", "㎏"]
+
+def test_very_long_term():
+    term = "x" * 5000
+    matcher = BlocklistMatcher({term, "x" * 10})
+    assert matcher.search("y" + term).term == term
+    assert matcher.search("xxxxxxxxxxxx").term == "x" * 10
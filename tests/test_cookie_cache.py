@@ -0,0 +1,49 @@
+import json
+import os
+import time
+from cryptography.fernet import Fernet
+from automation_assistant.cookie_cache import CookieCache
+
+COOKIE = {"name": "n8n-auth", "value": "abc", "domain": "n8n.local", "path": "/", "expires": None}
+
+def make_cache(tmp_path, email="u@e.com", password="pass", key=None):
+    return CookieCache(str(tmp_path / "cache" / "cookie"), "http://n8n:5678", email, password, key=key)
+
+def test_roundtrip(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.save([COOKIE])
+    assert cache.load() == [COOKIE]
+
+def test_file_is_encrypted_and_private(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.save([COOKIE])
+    raw = open(cache.path).read()
+    assert "abc" not in raw and "n8n-auth" not in raw
+    assert os.stat(cache.path).st_mode & 0o077 == 0
+
+def test_wrong_password_cannot_decrypt(tmp_path):
+    make_cache(tmp_path).save([COOKIE])
+    assert make_cache(tmp_path, password="other").load() is None
+
+def test_other_account_is_ignored(tmp_path):
+    make_cache(tmp_path).save([COOKIE])
+    assert make_cache(tmp_path, email="someone@else.com").load() is None
+
+def test_expired_cookie_is_ignored(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.save([{**COOKIE, "expires": int(time.time()) - 10}])
+    assert cache.load() is None
+
+def test_explicit_key_and_corrupt_file(tmp_path):
+    key = Fernet.generate_key().decode()
+    cache = make_cache(tmp_path, key=key)
+    cache.save([COOKIE])
+    assert cache.load() == [COOKIE]
+
+    with open(cache.path, "w") as f:
+        json.dump({"identity": cache.identity, "salt": "", "token": "garbage"}, f)
+    assert cache.load() is None
+
+def test_from_env_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("N8N_COOKIE_CACHE", "off")
+    assert CookieCache.from_env("http://n8n:5678", "u@e.com", "pass") is None
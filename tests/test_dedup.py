@@ -0,0 +1,144 @@
+import copy
+import requests
+from automation_assistant.dedup import DedupIndex, canonical_hash
+from automation_assistant.workflow_builder import WorkflowBuilder
+from automation_assistant.workflow_mirror import WorkflowMirror
+
+
+def conn(*targets):
+    return {"main": [[{"node": t, "type": "main", "index": 0} for t in targets]]}
+
+
+def workflow():
+    return {
+        "name": "AI Generated Workflow 1234abcd",
+        "nodes": [
+            {"id": "1", "name": "Trigger", "type": "n8n-nodes-base.cron", "typeVersion": 1,
+             "parameters": {"rule": "daily"}, "position": [240, 300]},
+            {"id": "2", "name": "Step A", "type": "n8n-nodes-base.code", "typeVersion": 1,
+             "parameters": {"jsCode": "return items;"}, "position": [460, 300]},
+            {"id": "3", "name": "Step B", "type": "n8n-nodes-base.code", "typeVersion": 1,
+             "parameters": {"jsCode": "return items;"}, "position": [680, 300]},
+        ],
+        "connections": {"Trigger": conn("Step A"), "Step A": conn("Step B")},
+    }
+
+
+def test_hash_ignores_ids_names_positions_and_order():
+    original = workflow()
+    renamed = copy.deepcopy(original)
+    renamed["name"] = "Something else"
+    renamed["nodes"].reverse()
+    for node, name in zip(renamed["nodes"], ("Z", "Y", "X")):
+        node.update(id=name.lower(), name=name, position=[0, 0])
+    renamed["connections"] = {"X": conn("Y"), "Y": conn("Z")}
+    assert canonical_hash(renamed) == canonical_hash(original)
+
+
+def test_hash_sees_parameters_and_wiring():
+    changed = workflow()
+    changed["nodes"][1]["parameters"]["jsCode"] = "return [];"
+    assert canonical_hash(changed) != canonical_hash(workflow())
+
+    rewired = workflow()
+    rewired["connections"] = {"Trigger": conn("Step A", "Step B")}
+    assert canonical_hash(rewired) != canonical_hash(workflow())
+
+
+def test_index_persists(tmp_path):
+    path = str(tmp_path / "dedup.sqlite")
+    DedupIndex(path).put("h1", 42, "Digest")
+    index = DedupIndex(path)
+    assert index.get("h1") == {"id": "42", "name": "Digest"}
+    index.forget("42")
+    assert DedupIndex(path).get("h1") is None
+
+
+class CountingSession:
+    def __init__(self):
+        self.posts = 0
+        self.gets = 0
+        self.deleted = set()
+        self.down = False
+
+    def get(self, url):
+        self.gets += 1
+        if self.down:
+            raise requests.Timeout("n8n timed out")
+        workflow_id = url.rsplit("/", 1)[1]
+        status = 404 if workflow_id in self.deleted else 200
+        return type("R", (), {"status_code": status, "raise_for_status": lambda s: None,
+                              "json": lambda s: {"data": {"id": workflow_id, "name": "Existing"}}})()
+
+    def post(self, url, json):
+        self.posts += 1
+        data = {"id": f"wf{self.posts}", "name": json["name"]}
+        return type("R", (), {"status_code": 200, "raise_for_status": lambda s: None,
+                              "json": lambda s: {"data": data}})()
+
+    def put(self, url, json):
+        return type("R", (), {"raise_for_status": lambda s: None, "json": lambda s: {"data": json}})()
+
+
+def plan():
+    return {"nodes": [
+        {"id": "t", "name": "Trigger", "type": "n8n-nodes-base.cron", "parameters": {}},
+        {"id": "c", "name": "Code", "type": "n8n-nodes-base.code", "parameters": {"jsCode": "return items;"}},
+    ], "connections": {"Trigger": ["Code"]}}
+
+
+def test_builder_returns_existing_workflow_for_duplicates():
+    session = CountingSession()
+    builder = WorkflowBuilder("http://n8n", session, dedup=DedupIndex())
+    first = builder.create_workflow(plan())
+    again = builder.create_workflow(plan())
+    assert session.posts == 1
+    assert again["id"] == first["id"] and again["deduplicated"] is True
+
+    different = plan()
+    different["nodes"][1]["parameters"]["jsCode"] = "return [];"
+    assert builder.create_workflow(different)["id"] == "wf2"
+
+
+def test_updated_workflow_no_longer_matches_old_content():
+    session = CountingSession()
+    builder = WorkflowBuilder("http://n8n", session, dedup=DedupIndex())
+    created = builder.create_workflow(plan())
+    builder.update_workflow(created["id"], {"name": "Edited", "nodes": [], "connections": {}})
+    assert builder.create_workflow(plan())["id"] == "wf2"
+
+
+def test_mirror_answers_hits_without_asking_n8n():
+    session = CountingSession()
+    mirror = WorkflowMirror()
+    builder = WorkflowBuilder("http://n8n", session, dedup=DedupIndex(), mirror=mirror)
+    first = builder.create_workflow(plan())
+    assert builder.create_workflow(plan())["deduplicated"] is True
+    assert session.gets == 0 and session.posts == 1
+
+    # A sync found it deleted: n8n is asked once, the 404 forgets the entry
+    mirror.forget(first["id"])
+    session.deleted.add(first["id"])
+    again = builder.create_workflow(plan())
+    assert session.gets == 1 and session.posts == 2
+    assert again["id"] == "wf2" and "deduplicated" not in again
+    assert builder.create_workflow(plan())["id"] == "wf2"
+    assert session.gets == 1
+
+
+def test_workflow_deleted_in_n8n_is_created_again():
+    session = CountingSession()
+    builder = WorkflowBuilder("http://n8n", session, dedup=DedupIndex())
+    first = builder.create_workflow(plan())
+    session.deleted.add(first["id"])
+    assert builder.create_workflow(plan())["id"] == "wf2"
+    assert builder.create_workflow(plan())["deduplicated"] is True
+
+
+def test_unconfirmed_hit_falls_back_to_create():
+    session = CountingSession()
+    builder = WorkflowBuilder("http://n8n", session, dedup=DedupIndex())
+    builder.create_workflow(plan())
+    session.down = True
+    assert builder.create_workflow(plan())["id"] == "wf2"
+    assert session.posts == 2
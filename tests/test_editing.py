@@ -0,0 +1,214 @@
+import json
+import pytest
+from automation_assistant.editing import PatchError, apply_edit, apply_patch, parse_modify_request, summarize_workflow
+from automation_assistant.guardrails import SafetyValidator
+from automation_assistant.llm_parser import LLMParser
+from automation_assistant.pipeline import PipelineError, WorkflowPipeline
+from automation_assistant.workflow_builder import WorkflowBuilder
+
+
+@pytest.fixture(autouse=True)
+def set_openai_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test-1234567")
+
+
+class DummyResponse:
+    def __init__(self, data):
+        self.status_code = 200
+        self.data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"data": self.data}
+
+
+def roundtrip(data):
+    return json.loads(json.dumps(data))
+
+
+class DummySession:
+    """
+    n8n REST stand-in holding a single workflow (stored as JSON, like the real API)
+    """
+    def __init__(self):
+        self.workflow = None
+        self.puts = []
+
+    def post(self, url, json):
+        self.workflow = dict(roundtrip(json), id="wf1")
+        return DummyResponse(self.workflow)
+
+    def get(self, url):
+        return DummyResponse(roundtrip(self.workflow))
+
+    def put(self, url, json):
+        self.puts.append(json)
+        self.workflow = roundtrip(json)
+        return DummyResponse(self.workflow)
+
+
+class DummyClient:
+    def __init__(self, reply):
+        self.reply = reply
+        self.requests = []
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        self.requests.append(kwargs)
+        message = type("msg", (), {"content": self.reply})
+        return type("R", (), {"choices": [type("choice", (), {"message": message})()], "usage": None})()
+
+
+def existing_workflow(session):
+    plan = {"nodes": [
+        {"id": "t", "name": "Schedule", "type": "n8n-nodes-base.cron", "parameters": {}},
+        {"id": "g", "name": "Fetch Mail", "type": "n8n-nodes-base.googleGmail",
+         "parameters": {"filters": {"q": "is:unread"}}},
+        {"id": "s", "name": "Send Summary", "type": "n8n-nodes-base.emailSend",
+         "parameters": {"toEmail": "me@example.com", "subject": "Digest", "message": "={{$json.text}}"}},
+    ], "connections": {"Schedule": ["Fetch Mail"], "Fetch Mail": ["Send Summary"]}}
+    WorkflowBuilder("http://n8n", session).create_workflow(plan)
+    return session.workflow
+
+
+def test_apply_patch_operations():
+    doc = {"a": {"b": [1, 2]}, "c~d": 1, "e/f": 2}
+    patched = apply_patch(doc, [
+        {"op": "add", "path": "/a/b/-", "value": 3},
+        {"op": "replace", "path": "/c~0d", "value": 5},
+        {"op": "move", "from": "/e~1f", "path": "/g"},
+        {"op": "copy", "from": "/a/b/0", "path": "/a/b/0"},
+        {"op": "remove", "path": "/a/b/1"},
+        {"op": "test", "path": "/g", "value": 2},
+    ])
+    assert patched == {"a": {"b": [1, 2, 3]}, "c~d": 5, "g": 2}
+
+
+def test_failed_patch_leaves_document_untouched():
+    doc = {"nodes": [{"name": "A"}]}
+    with pytest.raises(PatchError, match="out of range"):
+        apply_patch(doc, [{"op": "remove", "path": "/nodes/0"}, {"op": "remove", "path": "/nodes/0"}])
+    with pytest.raises(PatchError, match="Test failed"):
+        apply_patch(doc, [{"op": "test", "path": "/nodes/0/name", "value": "B"}])
+    with pytest.raises(PatchError, match="not a valid"):
+        apply_patch(doc, [{"op": "upsert", "path": "/x"}])
+    assert doc == {"nodes": [{"name": "A"}]}
+
+
+def test_summary_is_much_smaller_than_workflow():
+    workflow = existing_workflow(DummySession())
+    summary = summarize_workflow(workflow)
+    assert len(summary) * 3 < len(json.dumps(workflow))
+    assert '1 "Fetch Mail" n8n-nodes-base.googleGmail' in summary
+    assert '"Fetch Mail" -> 0: "Send Summary"' in summary
+    assert "credentials" not in summary and "position" not in summary
+
+
+def test_apply_edit_completes_new_nodes():
+    workflow = existing_workflow(DummySession())
+    send = workflow["nodes"][2]
+    updated = apply_edit(workflow, [
+        {"op": "add", "path": "/nodes/-", "value": {
+            "name": "Alert", "type": "n8n-nodes-base.emailSend",
+            "parameters": {"toEmail": "ops@example.com", "subject": "Sent", "message": "done"}}},
+        {"op": "add", "path": "/connections/Send Summary",
+         "value": {"main": [[{"node": "Alert", "type": "main", "index": 0}]]}},
+    ], SafetyValidator())
+    alert = updated["nodes"][3]
+    assert alert["id"] and alert["credentials"] and alert["parameters"]["text"] == "done"
+    assert alert["position"] == [send["position"][0] + 220, send["position"][1]]
+    assert updated["nodes"][:3] == workflow["nodes"]
+    WorkflowBuilder("http://n8n", DummySession()).check_workflow(updated)
+
+
+def test_renamed_node_keeps_its_credentials():
+    workflow = existing_workflow(DummySession())
+    workflow["nodes"][1]["credentials"] = {"gmailOAuth2": {"id": "42", "name": "Work Gmail"}}
+    updated = apply_edit(workflow, [
+        {"op": "replace", "path": "/nodes/1/name", "value": "Fetch Inbox"},
+        {"op": "move", "from": "/connections/Fetch Mail", "path": "/connections/Fetch Inbox"},
+        {"op": "replace", "path": "/connections/Schedule/main/0/0/node", "value": "Fetch Inbox"},
+    ], SafetyValidator())
+    node = updated["nodes"][1]
+    assert node["name"] == "Fetch Inbox"
+    assert node["credentials"] == {"gmailOAuth2": {"id": "42", "name": "Work Gmail"}}
+    assert node["position"] == workflow["nodes"][1]["position"]
+
+
+def real_workflow():
+    """
+    What n8n hands back for hand-built workflows: a sticky note, a loop and an AI tool connection
+    """
+    return {"name": "Support", "nodes": [
+        {"id": "1", "name": "Hook", "type": "n8n-nodes-base.webhook", "parameters": {}, "position": [0, 0]},
+        {"id": "2", "name": "Loop", "type": "n8n-nodes-base.splitInBatches", "parameters": {}, "position": [220, 0]},
+        {"id": "3", "name": "Reply", "type": "n8n-nodes-base.emailSend", "position": [440, 0],
+         "parameters": {"fromEmail": "bot@example.com", "toEmail": "a@example.com", "subject": "Hi", "text": "x"}},
+        {"id": "4", "name": "Agent", "type": "@n8n/n8n-nodes-langchain.agent", "parameters": {}, "position": [440, 200]},
+        {"id": "5", "name": "Tool", "type": "@n8n/n8n-nodes-langchain.toolCode", "parameters": {}, "position": [440, 400]},
+        {"id": "6", "name": "Note", "type": "n8n-nodes-base.stickyNote", "parameters": {"content": "todo"}, "position": [0, 300]},
+    ], "connections": {
+        "Hook": {"main": [[{"node": "Loop", "type": "main", "index": 0}]]},
+        "Loop": {"main": [[{"node": "Reply", "type": "main", "index": 0}], [{"node": "Agent", "type": "main", "index": 0}]]},
+        "Reply": {"main": [[{"node": "Loop", "type": "main", "index": 0}]]},
+        "Tool": {"ai_tool": [[{"node": "Agent", "type": "ai_tool", "index": 0}]]},
+    }}
+
+
+def test_edit_check_accepts_real_workflows():
+    workflow = real_workflow()
+    builder = WorkflowBuilder("http://n8n", DummySession())
+    updated = apply_edit(workflow, [{"op": "replace", "path": "/nodes/2/parameters/subject", "value": "Hello"}])
+    builder.check_workflow(updated, workflow)
+    with pytest.raises(ValueError, match="reachable"):
+        builder.check_workflow(updated)
+
+    broken = apply_edit(workflow, [{"op": "remove", "path": "/nodes/4"}])
+    with pytest.raises(ValueError, match="non-existent node: Tool"):
+        builder.check_workflow(broken, workflow)
+    renamed = apply_edit(workflow, [{"op": "replace", "path": "/nodes/5/name", "value": "Reply"}])
+    with pytest.raises(ValueError, match="Duplicate node name: Reply"):
+        builder.check_workflow(renamed, workflow)
+    missing = apply_edit(workflow, [{"op": "remove", "path": "/nodes/2/parameters/toEmail"}])
+    with pytest.raises(ValueError, match="missing required params"):
+        builder.check_workflow(missing, workflow)
+
+
+def test_parse_modify_request():
+    assert parse_modify_request("modify workflow wf1: send at 9am") == {"workflow_id": "wf1", "instruction": "send at 9am"}
+    assert parse_modify_request("Modify workflow abc-12") == {"workflow_id": "abc-12", "instruction": ""}
+    assert parse_modify_request("Send me a digest") is None
+
+
+def make_pipeline(session, reply):
+    parser = LLMParser()
+    parser.client = DummyClient(reply)
+    validator = SafetyValidator()
+    validator.moderate_prompt = lambda prompt, api_key: True
+    return WorkflowPipeline(parser, validator, WorkflowBuilder("http://n8n", session), "sk-test")
+
+
+def test_pipeline_modify_updates_workflow():
+    session = DummySession()
+    existing_workflow(session)
+    pipeline = make_pipeline(session, json.dumps({"patch": [
+        {"op": "replace", "path": "/nodes/2/parameters/subject", "value": "Morning digest"},
+    ]}))
+    result = pipeline.modify("wf1", "Change the email subject to Morning digest")
+    assert result["nodes"][2]["parameters"]["subject"] == "Morning digest"
+    assert len(session.puts) == 1
+    request = pipeline.parser.client.requests[0]
+    assert request["max_tokens"] == 1000
+    assert "Current workflow:" in request["messages"][1]["content"]
+
+
+def test_pipeline_modify_rejects_broken_edits():
+    session = DummySession()
+    existing_workflow(session)
+    pipeline = make_pipeline(session, json.dumps({"patch": [{"op": "remove", "path": "/nodes/1"}]}))
+    with pytest.raises(PipelineError) as e:
+        pipeline.modify("wf1", "Drop the Gmail step")
+    assert e.value.stage == "post_validation"
+    assert session.puts == []
@@ -0,0 +1,118 @@
+import pytest
+from automation_assistant.graph import Edge, GraphError, WorkflowGraph
+from automation_assistant.normalize import normalize_plan
+from automation_assistant.workflow_builder import WorkflowBuilder
+
+
+def node(name, ntype="n8n-nodes-base.code", node_id=None):
+    return {"id": node_id or name.lower(), "name": name, "type": ntype, "parameters": {}}
+
+
+def branching_nodes():
+    return [
+        node("Trigger", "n8n-nodes-base.cron"),
+        node("Check", "n8n-nodes-base.if"),
+        node("Yes"),
+        node("No"),
+    ]
+
+
+def test_from_plan_accepts_every_connection_shape():
+    connections = {
+        "trigger": ["check"],  # list form, by id
+        "Check": {"true": ["Yes"], "false": ["no"]},  # named ports
+    }
+    graph = WorkflowGraph.from_plan(branching_nodes(), connections)
+    assert sorted(graph.edges()) == [
+        Edge("Check", 0, "Yes"), Edge("Check", 1, "No"), Edge("Trigger", 0, "Check"),
+    ]
+
+    n8n = {
+        "Trigger": {"main": [[{"node": "Check", "type": "main", "index": 0}]]},
+        "Check": {"main": [[{"node": "Yes", "type": "main", "index": 0}],
+                           [{"node": "No", "type": "main", "index": 0}]]},
+        "Ghost": {"main": [[{"node": "Yes", "type": "main", "index": 0}]]},
+    }
+    assert set(WorkflowGraph.from_plan(branching_nodes(), n8n).edges()) == set(graph.edges())
+
+
+def test_to_connections_pads_output_ports():
+    graph = WorkflowGraph(branching_nodes())
+    graph.connect("Trigger", "Check")
+    graph.connect("Check", "No", output=1)
+    assert graph.to_connections() == {
+        "Trigger": {"main": [[{"node": "Check", "type": "main", "index": 0}]]},
+        "Check": {"main": [[], [{"node": "No", "type": "main", "index": 0}]]},
+    }
+
+
+def test_topological_order_and_cycles():
+    graph = WorkflowGraph([node("A"), node("B"), node("C")])
+    graph.connect("A", "B")
+    graph.connect("B", "C")
+    assert graph.topological_order() == ["A", "B", "C"]
+    graph.connect("C", "B")
+    with pytest.raises(GraphError, match="cycle"):
+        graph.topological_order()
+
+
+def test_errors_report_orphans_and_bad_ports():
+    graph = WorkflowGraph(branching_nodes())
+    graph.connect("Trigger", "Check")
+    graph.connect("Check", "Yes", output=2)
+    errors = graph.errors()
+    assert "Nodes not reachable from the workflow's start: No" in errors
+    assert "Node 'Check' has no output 2 (outputs: true, false)" in errors
+
+
+def test_duplicate_names_and_dangling_references():
+    with pytest.raises(GraphError, match="Duplicate node name"):
+        WorkflowGraph([node("A"), node("A", node_id="other")])
+    graph = WorkflowGraph([node("A")])
+    with pytest.raises(GraphError, match="non-existent node: B"):
+        graph.connect("A", "B")
+
+
+def test_normalize_keeps_branches_and_fills_gaps():
+    plan = normalize_plan({"nodes": branching_nodes(), "connections": {
+        "Trigger": ["Check"], "Check": {"true": ["Yes"], "false": ["No"]},
+    }})
+    assert plan["connections"]["Check"] == {"true": ["Yes"], "false": ["No"]}
+
+    plan = normalize_plan({"nodes": branching_nodes(), "connections": {"Trigger": ["Check"]}})
+    assert plan["connections"]["Yes"]["main"][0][0]["node"] == "No"  # chained, nothing left unreachable
+
+
+class DummySession:
+    def post(self, url, json):
+        self.last_payload = json
+        return type("R", (), {"status_code": 200, "raise_for_status": lambda s: None,
+                              "json": lambda s: {"data": {"id": "wf1"}}})()
+
+
+def test_builder_emits_if_branches():
+    session = DummySession()
+    plan = {"nodes": branching_nodes(), "connections": {
+        "Trigger": {"main": [[{"node": "Check", "type": "main", "index": 0}]]},
+        "Check": {"main": [[{"node": "Yes", "type": "main", "index": 0}],
+                           [{"node": "No", "type": "main", "index": 0}]]},
+    }}
+    WorkflowBuilder("http://n8n", session).create_workflow(plan)
+    assert session.last_payload["connections"]["Check"]["main"][1] == [{"node": "No", "type": "main", "index": 0}]
+
+
+def test_builder_rejects_cycles():
+    plan = {"nodes": [node("Trigger", "n8n-nodes-base.cron"), node("A"), node("B")], "connections": {
+        "Trigger": ["A"], "A": ["B"], "B": ["A"],
+    }}
+    with pytest.raises(ValueError, match="cycle"):
+        WorkflowBuilder("http://n8n", DummySession()).create_workflow(plan)
+
+
+def test_large_graph():
+    nodes = [node("Trigger", "n8n-nodes-base.cron")] + [node(f"N{i}") for i in range(5000)]
+    connections = {a["name"]: [b["name"]] for a, b in zip(nodes, nodes[1:])}
+    graph = WorkflowGraph.from_plan(nodes, connections)
+    assert graph.errors() == []
+    assert len(graph.to_connections()) == 5000
+    assert graph.topological_order()[-1] == "N4999"
@@ -109,6 +109,27 @@ def test_validate_input_moderation(monkeypatch):
     monkeypatch.setattr(validator, "moderate_prompt", lambda prompt, api_key: False)
     assert validator.moderate_prompt("Delete all data", "sk-test") is False
 
+def test_moderate_prompt_retries_through_endpoint(monkeypatch):
+    from automation_assistant import guardrails, resilience
+
+    class Response:
+        def __init__(self, status_code):
+            self.status_code = status_code
+            self.headers = {}
+
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"results": [{"flagged": False}]}
+
+    responses = [Response(503), Response(200)]
+    monkeypatch.setattr(guardrails.requests, "post", lambda *a, **kw: responses.pop(0))
+    monkeypatch.setattr(resilience.time, "sleep", lambda seconds: None)
+    validator = SafetyValidator()
+    assert validator.moderate_prompt("Send me a summary", "sk-test") is True
+    assert responses == []
+
 # -------------------- LATENCY METRICS ----------------------
 
 def test_latency_metrics_basic():
@@ -154,3 +175,10 @@ def test_validate_plan_bad_node_parameters():
     assert validator.validate_plan(plan) is False
 
 
+
+def test_validate_node():
+    validator = SafetyValidator()
+    assert validator.validate_node({"id": "n1", "type": "custom", "parameters": {}}) is True
+    assert validator.validate_node({"id": 1, "type": "custom"}) is False
+    # Required parameters of known node types are enforced per node
+    assert validator.validate_node({"id": "c", "type": "n8n-nodes-base.cron", "parameters": {}}) is False
@@ -0,0 +1,57 @@
+import json
+import pytest
+from automation_assistant.json_stream import NodeStreamParser, StreamParseError
+
+DOC = {
+    "name": "nodes are here",
+    "nodes": [
+        {"id": "a", "type": "t", "parameters": {"text": "brace } and \" quote [", "list": [{"x": 1}]}},
+        {"id": "b", "type": "t"},
+    ],
+    "connections": {"a": {"main": [[{"node": "b", "type": "main", "index": 0}]]}},
+}
+
+def feed_in_chunks(text, size):
+    parser = NodeStreamParser()
+    seen = []
+    for i in range(0, len(text), size):
+        seen.append(parser.feed(text[i:i + size]))
+    return parser, seen
+
+@pytest.mark.parametrize("size", [1, 3, 7, 1000])
+def test_nodes_are_emitted_as_soon_as_complete(size):
+    text = json.dumps(DOC, indent=2)
+    parser, seen = feed_in_chunks(text, size)
+    nodes = [n for batch in seen for n in batch]
+    assert nodes == DOC["nodes"]
+    # First node is available before the stream finished
+    first_batch = next(i for i, batch in enumerate(seen) if batch)
+    assert first_batch < len(seen) - 1 or size == 1000
+    assert parser.close() == DOC
+
+def test_non_object_output_aborts_on_first_chunk():
+    parser = NodeStreamParser()
+    with pytest.raises(StreamParseError):
+        parser.feed("I don't know")
+
+def test_mismatched_brackets_abort():
+    parser = NodeStreamParser()
+    parser.feed('{"nodes": [{"id": "a"}')
+    with pytest.raises(StreamParseError):
+        parser.feed("}")
+
+def test_trailing_garbage_aborts():
+    parser = NodeStreamParser()
+    parser.feed('{"nodes": []}')
+    with pytest.raises(StreamParseError):
+        parser.feed(" extra")
+
+def test_truncated_stream_fails_on_close():
+    parser = NodeStreamParser()
+    assert parser.feed('{"nodes": [{"id": "a"}, {"id"') == [{"id": "a"}]
+    with pytest.raises(StreamParseError):
+        parser.close()
+
+def test_nested_nodes_keys_are_ignored():
+    parser = NodeStreamParser()
+    assert parser.feed('{"meta": {"nodes": [{"id": "x"}]}, "nodes": [{"id": "y"}]}') == [{"id": "y"}]
@@ -0,0 +1,61 @@
+from automation_assistant.graph import WorkflowGraph
+from automation_assistant.layout import MAX_COLUMNS, X_GAP, Y_GAP, apply_layout, layered_layout
+from automation_assistant.llm_parser import LLMParser
+
+
+def node(name, ntype="n8n-nodes-base.code"):
+    return {"id": name.lower(), "name": name, "type": ntype, "parameters": {}}
+
+
+def test_chain_is_one_row():
+    nodes = [node("A", "n8n-nodes-base.cron"), node("B"), node("C")]
+    positions = layered_layout(WorkflowGraph.from_plan(nodes, {"A": ["B"], "B": ["C"]}))
+    assert positions == {"A": [240, 300], "B": [460, 300], "C": [680, 300]}
+
+
+def test_branches_stack_and_merge_after_all_inputs():
+    nodes = [node("T", "n8n-nodes-base.cron"), node("If", "n8n-nodes-base.if"),
+             node("Yes"), node("No"), node("Slow"), node("Merge")]
+    connections = {"T": ["If"], "If": {"true": ["Yes"], "false": ["No"]},
+                   "No": ["Slow"], "Yes": ["Merge"], "Slow": ["Merge"]}
+    positions = layered_layout(WorkflowGraph.from_plan(nodes, connections))
+    assert positions["Yes"][0] == positions["No"][0]
+    assert positions["Yes"][1] < 300 < positions["No"][1]
+    assert positions["Merge"][0] == positions["Slow"][0] + X_GAP
+
+
+def test_barycenter_keeps_branches_apart():
+    # B's child is listed first but hangs off the lower branch
+    nodes = [node("T", "n8n-nodes-base.cron"), node("A"), node("B"), node("B1"), node("A1")]
+    connections = {"T": ["A", "B"], "B": ["B1"], "A": ["A1"]}
+    positions = layered_layout(WorkflowGraph.from_plan(nodes, connections))
+    assert positions["A"][1] < positions["B"][1]
+    assert positions["A1"][1] < positions["B1"][1]
+
+
+def test_cycles_still_get_positions():
+    nodes = [node("T", "n8n-nodes-base.cron"), node("A"), node("B")]
+    positions = layered_layout(WorkflowGraph.from_plan(nodes, {"T": ["A"], "A": ["B"], "B": ["A"]}))
+    assert set(positions) == {"T", "A", "B"}
+
+
+def test_long_chains_wrap_into_rows():
+    nodes = [node(f"N{i}") for i in range(MAX_COLUMNS + 1)]
+    connections = {a["name"]: [b["name"]] for a, b in zip(nodes, nodes[1:])}
+    positions = layered_layout(WorkflowGraph.from_plan(nodes, connections))
+    assert positions[f"N{MAX_COLUMNS}"] == [240, 300 + 2 * Y_GAP]
+
+
+def test_apply_layout_keeps_given_positions():
+    plan = {"nodes": [dict(node("A"), position=[1, 2])], "connections": {}}
+    assert apply_layout(plan)["nodes"][0]["position"] == [1, 2]
+    assert apply_layout(plan, force=True)["nodes"][0]["position"] == [240, 300]
+
+    duplicates = {"nodes": [node("A"), node("A")], "connections": {}}
+    assert [n["position"] for n in apply_layout(duplicates)["nodes"]] == [[240, 300], [460, 300]]
+
+
+def test_fallback_workflow_is_laid_out(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    plan = LLMParser()._create_fallback_workflow("anything")
+    assert [n["position"] for n in plan["nodes"]] == [[240, 300], [460, 300]]
@@ -69,7 +69,7 @@ def test_llmparser_branching(monkeypatch):
             self.completions = DummyCompletions()
 
     class DummyClient:
-        def __init__(self, api_key=None):
+        def __init__(self, api_key=None, **kwargs):
             self.chat = DummyChat()
 
     monkeypatch.setattr("automation_assistant.llm_parser.openai.OpenAI", DummyClient)
@@ -78,4 +78,94 @@ def test_llmparser_branching(monkeypatch):
 
     assert "nodes" in plan and "connections" in plan
     assert any(n["id"] == "check" for n in plan["nodes"])
-    assert set(plan["connections"]["check"]) == {"A", "B"}
\ No newline at end of file
+    assert set(plan["connections"]["check"]) == {"A", "B"}
+
+
+def test_llmparser_plan_cache(monkeypatch):
+    from automation_assistant.plan_cache import PlanCache
+
+    class CountingClient(DummyClient):
+        calls = 0
+        def create(self, **kwargs):
+            CountingClient.calls += 1
+            return super().create(**kwargs)
+
+    reply = json.dumps({"nodes": [{"id": "cron1", "type": "n8n-nodes-base.cron", "parameters": {}}]})
+    parser = LLMParser(cache=PlanCache())
+    parser.client = CountingClient(reply)
+    first = parser.parse("Every morning summarize my Gmail and email me")
+    second = parser.parse("every morning   summarize my gmail and email me.")
+    assert CountingClient.calls == 1
+    assert first == second
+    assert parser.cache.stats["memory_hits"] == 1
+
+
+def test_llmparser_does_not_cache_fallback():
+    from automation_assistant.plan_cache import PlanCache
+    parser = LLMParser(cache=PlanCache())
+    parser.client = DummyClient("not json")
+    assert parser.parse("unknown task").get("fallback") is True
+    assert parser.cache.stats["stores"] == 0
+
+
+class StreamChunk:
+    def __init__(self, text):
+        delta = type("delta", (), {"content": text})
+        self.choices = [type("choice", (), {"delta": delta})()]
+
+class StreamingClient:
+    def __init__(self, text, size=5):
+        self.chunks = [StreamChunk(text[i:i + size]) for i in range(0, len(text), size)]
+        self.consumed = 0
+        self.closed = False
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        assert kwargs["stream"] is True
+        client = self
+
+        class Stream:
+            def __iter__(self):
+                for chunk in client.chunks:
+                    client.consumed += 1
+                    yield chunk
+
+            def close(self):
+                client.closed = True
+
+        return Stream()
+
+def test_llmparser_parse_stream_enhances_nodes_incrementally():
+    from automation_assistant.guardrails import LatencyMetrics
+    reply = json.dumps({"nodes": [
+        {"id": "cron1", "type": "n8n-nodes-base.cron"},
+        {"id": "mail1", "type": "n8n-nodes-base.emailSend"},
+    ]})
+    parser = LLMParser()
+    parser.client = StreamingClient(reply)
+    seen = []
+    metrics = LatencyMetrics()
+    plan = parser.parse_stream("Every Monday email me", on_node=seen.append, metrics=metrics)
+
+    assert [n["id"] for n in seen] == ["cron1", "mail1"]
+    assert seen[0]["parameters"]["mode"] == "custom"  # defaults merged per node
+    assert plan["connections"]["Schedule Trigger"]["main"][0][0]["node"] == "Send Email"
+    assert metrics.get("llm_time_to_first_node") is not None
+    assert parser.client.closed
+
+def test_llmparser_parse_stream_aborts_early_on_malformed_output():
+    parser = LLMParser()
+    parser.client = StreamingClient("Sorry, I cannot help with that request." * 50)
+    plan = parser.parse_stream("unknown task")
+    assert plan.get("fallback") is True
+    assert parser.client.consumed == 1
+    assert parser.client.closed
+
+def test_llmparser_parse_stream_aborts_on_invalid_node():
+    reply = json.dumps({"nodes": [{"id": 1, "type": "n8n-nodes-base.cron"}, {"id": "b", "type": "x"}]})
+    parser = LLMParser()
+    parser.client = StreamingClient(reply)
+    seen = []
+    plan = parser.parse_stream("x", on_node=seen.append, node_validator=lambda n: isinstance(n["id"], str))
+    assert plan.get("fallback") is True
+    assert seen == []
@@ -0,0 +1,82 @@
+import threading
+import pytest
+from automation_assistant.guardrails import LatencyMetrics
+from automation_assistant.metrics import MetricsRegistry, STAGE_LATENCY, WORKFLOWS, IN_FLIGHT
+from automation_assistant.pipeline import WorkflowPipeline, PipelineError
+
+def test_counter_and_gauge_export():
+    registry = MetricsRegistry()
+    hits = registry.counter("cache_hits_total", "Cache hits", ["cache"])
+    hits.inc(cache="plan")
+    hits.inc(2, cache="plan")
+    gauge = registry.gauge("in_flight", "In flight")
+    with gauge.track_inprogress():
+        assert gauge.value() == 1
+    text = registry.export_prometheus()
+    assert "# HELP cache_hits_total Cache hits" in text
+    assert "# TYPE cache_hits_total counter" in text
+    assert 'cache_hits_total{cache="plan"} 3' in text
+    assert "# TYPE in_flight gauge" in text
+    assert "in_flight 0" in text
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    hist = registry.histogram("latency_seconds", "Latency", ["step"], buckets=[0.1, 1])
+    for value in (0.05, 0.1, 0.5, 3):
+        hist.observe(value, step="llm")
+    text = registry.export_prometheus()
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{step="llm",le="0.1"} 2' in text
+    assert 'latency_seconds_bucket{step="llm",le="1"} 3' in text
+    assert 'latency_seconds_bucket{step="llm",le="+Inf"} 4' in text
+    assert 'latency_seconds_count{step="llm"} 4' in text
+    assert 'latency_seconds_sum{step="llm"} 3.65' in text
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("c_total", "C", ["v"]).inc(v='a"b\\c\nd')
+    assert 'c_total{v="a\\"b\\\\c\\nd"} 1' in registry.export_prometheus()
+
+def test_label_mismatch_and_conflicts_raise():
+    registry = MetricsRegistry()
+    counter = registry.counter("c_total", "C", ["a"])
+    with pytest.raises(ValueError):
+        counter.inc(b="x")
+    with pytest.raises(ValueError):
+        registry.gauge("c_total", "C", ["a"])
+    assert registry.counter("c_total", "C", ["a"]) is counter
+
+def test_counter_is_thread_safe():
+    registry = MetricsRegistry()
+    counter = registry.counter("c_total", "C")
+
+    def work():
+        for _ in range(10_000):
+            counter.inc()
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert counter.value() == 80_000
+
+def test_latency_metrics_accumulate_across_runs():
+    before = STAGE_LATENCY.count(step="unit_test_step")
+    for _ in range(3):
+        metrics = LatencyMetrics()
+        metrics.start("unit_test_step")
+        metrics.stop("unit_test_step")
+    assert STAGE_LATENCY.count(step="unit_test_step") == before + 3
+
+def test_pipeline_records_outcomes():
+    class Validator:
+        def validate_input(self, prompt):
+            return prompt != "bad"
+
+    pipeline = WorkflowPipeline(parser=None, validator=Validator(), builder=None, openai_api_key="sk")
+    before = WORKFLOWS.value(outcome="failure", stage="pre_validation")
+    with pytest.raises(PipelineError):
+        pipeline.run("bad")
+    assert WORKFLOWS.value(outcome="failure", stage="pre_validation") == before + 1
+    assert IN_FLIGHT.value(mode="sync") == 0
@@ -0,0 +1,34 @@
+import requests
+from automation_assistant.metrics import MetricsRegistry
+from automation_assistant.metrics_server import MetricsServer, start_metrics_server
+
+def test_render_is_cached_for_ttl():
+    registry = MetricsRegistry()
+    counter = registry.counter("c_total", "C")
+    server = MetricsServer(registry, cache_ttl=60)
+    assert "c_total 1" not in server.render()
+    counter.inc()
+    # Still the cached rendering
+    assert "c_total 1" not in server.render()
+
+    server.cache_ttl = 0
+    assert "c_total 1" in server.render()
+
+def test_serves_live_metrics_in_background():
+    registry = MetricsRegistry()
+    gauge = registry.gauge("in_flight", "In flight")
+    server = MetricsServer(registry, cache_ttl=0).start("127.0.0.1", 0)
+    try:
+        url = f"http://127.0.0.1:{server.port}/metrics"
+        with gauge.track_inprogress():
+            resp = requests.get(url, timeout=5)
+            assert resp.status_code == 200
+            assert resp.headers["Content-Type"].startswith("text/plain")
+            assert "in_flight 1" in resp.text
+        assert "in_flight 0" in requests.get(url, timeout=5).text
+    finally:
+        server.stop()
+
+def test_start_metrics_server_can_be_disabled(monkeypatch):
+    monkeypatch.setenv("METRICS_PORT", "off")
+    assert start_metrics_server() is None
@@ -0,0 +1,113 @@
+import asyncio
+import threading
+import pytest
+from automation_assistant.guardrails import SafetyValidator
+from automation_assistant.moderation import ModerationClient
+
+class DummyResponse:
+    def __init__(self, data, status_code=200):
+        self._data = data
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise Exception(f"HTTP {self.status_code}")
+
+    def json(self):
+        return self._data
+
+class FakeModerationSession:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+        self.requests = []
+        self.lock = threading.Lock()
+
+    def post(self, url, headers=None, json=None, timeout=None):
+        with self.lock:
+            self.requests.append(json["input"])
+        results = [{"flagged": "attack" in text} for text in json["input"]]
+        return DummyResponse({"results": results}, self.status_code)
+
+def make_client(session, **kwargs):
+    kwargs.setdefault("max_wait", 0.05)
+    return ModerationClient("sk-test", session=session, **kwargs)
+
+def test_concurrent_prompts_are_coalesced():
+    session = FakeModerationSession()
+    client = make_client(session)
+    futures = [client.submit(f"prompt {i}") for i in range(10)] + [client.submit("plan an attack")]
+    results = [f.result(timeout=2) for f in futures]
+    assert results == [True] * 10 + [False]
+    assert len(session.requests) == 1
+    assert len(session.requests[0]) == 11
+    client.close()
+
+def test_duplicate_prompts_share_one_input_and_hit_cache():
+    session = FakeModerationSession()
+    client = make_client(session)
+    futures = [client.submit("same prompt") for _ in range(5)]
+    assert all(f.result(timeout=2) for f in futures)
+    assert session.requests == [["same prompt"]]
+
+    assert client.check("same prompt") is True
+    assert len(session.requests) == 1
+    assert client.stats["cache_hits"] == 1
+    client.close()
+
+def test_max_batch_splits_requests():
+    session = FakeModerationSession()
+    client = make_client(session, max_batch=4)
+    futures = [client.submit(f"p{i}") for i in range(10)]
+    for f in futures:
+        f.result(timeout=2)
+    assert all(len(batch) <= 4 for batch in session.requests)
+    client.close()
+
+def test_slow_batch_does_not_block_the_next():
+    class SlowFirstSession(FakeModerationSession):
+        def __init__(self):
+            super().__init__()
+            self.started = threading.Event()
+            self.release = threading.Event()
+
+        def post(self, url, headers=None, json=None, timeout=None):
+            if json["input"] == ["slow"]:
+                self.started.set()
+                self.release.wait(timeout=5)
+            return super().post(url, headers=headers, json=json, timeout=timeout)
+
+    session = SlowFirstSession()
+    client = make_client(session, max_wait=0)
+    slow = client.submit("slow")
+    assert session.started.wait(timeout=2)
+    # The second batch completes while the first request is still in flight
+    assert client.submit("fast").result(timeout=2) is True
+    assert not slow.done()
+    session.release.set()
+    assert slow.result(timeout=2) is True
+    client.close()
+
+def test_cache_ttl_expires():
+    session = FakeModerationSession()
+    client = make_client(session, max_wait=0, cache_ttl=0)
+    client.check("hello")
+    client.check("hello")
+    assert len(session.requests) == 2
+    client.close()
+
+def test_errors_propagate_and_validator_fails_closed():
+    client = make_client(FakeModerationSession(status_code=500), max_wait=0)
+    with pytest.raises(Exception):
+        client.check("hello")
+    validator = SafetyValidator(moderation_client=client)
+    assert validator.moderate_prompt("hello", "sk-test") is False
+    assert asyncio.run(validator.amoderate_prompt("hello", None)) is False
+    client.close()
+
+def test_validator_uses_moderation_client():
+    client = make_client(FakeModerationSession(), max_wait=0)
+    validator = SafetyValidator(moderation_client=client)
+    assert validator.moderate_prompt("summarize my mail", "sk-test") is True
+    assert validator.moderate_prompt("plan an attack", "sk-test") is False
+    assert asyncio.run(validator.amoderate_prompt("summarize my mail", None)) is True
+    client.close()
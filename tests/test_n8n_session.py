@@ -0,0 +1,142 @@
+import requests
+from requests.cookies import RequestsCookieJar
+from automation_assistant import n8n_session
+from automation_assistant.cookie_cache import CookieCache
+from automation_assistant.n8n_session import N8nSessionManager
+
+class DummyResponse:
+    def __init__(self, status_code=200, data=None):
+        self.status_code = status_code
+        self._data = data or {}
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            err = requests.HTTPError(f"Status code: {self.status_code}")
+            err.response = self
+            raise err
+
+    def json(self):
+        return self._data
+
+class FakeN8n:
+    """Stands in for requests.Session talking to an n8n instance"""
+    def __init__(self, ready_after=0, login_status=200):
+        self.ready_after = ready_after
+        self.login_status = login_status
+        self.health_probes = 0
+        self.logins = 0
+        self.cookie_valid = False
+        self.calls = []
+        self.cookies = RequestsCookieJar()
+
+    def mount(self, prefix, adapter):
+        pass
+
+    def get(self, url, timeout=None):
+        if url.endswith("/rest/login"):
+            self.calls.append(("GET", url))
+            valid = self.cookies.get("n8n-auth") == "secret-cookie"
+            return DummyResponse(200 if valid else 401)
+        self.health_probes += 1
+        if self.health_probes <= self.ready_after:
+            raise requests.ConnectionError("connection refused")
+        return DummyResponse(200)
+
+    def post(self, url, data=None, headers=None):
+        self.logins += 1
+        if self.login_status == 200:
+            self.cookie_valid = True
+            self.cookies.set("n8n-auth", "secret-cookie", domain="fake.local", path="/")
+        return DummyResponse(self.login_status)
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url))
+        if not self.cookie_valid:
+            return DummyResponse(401)
+        return DummyResponse(200, {"data": []})
+
+def make_manager(monkeypatch, fake, cookie_cache=None):
+    monkeypatch.setattr(requests, "Session", lambda: fake)
+    sleeps = []
+    clock = [0.0]
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(n8n_session.time, "sleep", fake_sleep)
+    monkeypatch.setattr(n8n_session.time, "monotonic", lambda: clock[0])
+    manager = N8nSessionManager("http://fake:5678", "u@e.com", "pass", cookie_cache=cookie_cache)
+    return manager, sleeps
+
+def test_connect_backs_off_exponentially(monkeypatch):
+    fake = FakeN8n(ready_after=4)
+    manager, sleeps = make_manager(monkeypatch, fake)
+    assert manager.connect(max_wait=60, initial_delay=0.1, max_delay=5) is True
+    assert fake.logins == 1
+    # Jittered: each delay falls in [cap / 2, cap] with cap doubling from 0.1
+    assert len(sleeps) == 4
+    assert all(0.05 * 2 ** i <= s <= 0.1 * 2 ** i for i, s in enumerate(sleeps))
+
+def test_connect_gives_up_on_bad_credentials(monkeypatch):
+    fake = FakeN8n(login_status=401)
+    manager, sleeps = make_manager(monkeypatch, fake)
+    assert manager.connect() is False
+    assert sleeps == []
+
+def test_connect_times_out(monkeypatch):
+    fake = FakeN8n(ready_after=1000)
+    manager, sleeps = make_manager(monkeypatch, fake)
+    assert manager.connect(max_wait=1, initial_delay=0.1, max_delay=5) is False
+    assert abs(sum(sleeps) - 1) < 1e-9
+
+def test_request_reauthenticates_on_401(monkeypatch):
+    fake = FakeN8n()
+    manager, _ = make_manager(monkeypatch, fake)
+    assert manager.connect() is True
+    fake.cookie_valid = False  # cookie expired server-side
+
+    resp = manager.get("http://fake:5678/rest/workflows")
+    assert resp.status_code == 200
+    assert fake.logins == 2
+    assert len(fake.calls) == 2
+
+def test_reauthenticate_skips_when_already_refreshed(monkeypatch):
+    fake = FakeN8n()
+    manager, _ = make_manager(monkeypatch, fake)
+    manager.login()
+    stale = manager._generation
+    manager._reauthenticate(stale)
+    # A second thread holding the same stale generation must not log in again
+    manager._reauthenticate(stale)
+    assert fake.logins == 2
+
+def test_relative_paths_are_resolved(monkeypatch):
+    fake = FakeN8n()
+    manager, _ = make_manager(monkeypatch, fake)
+    manager.get("/rest/workflows")
+    assert fake.calls[-1] == ("GET", "http://fake:5678/rest/workflows")
+
+def test_connect_reuses_cached_cookie(monkeypatch, tmp_path):
+    cache = CookieCache(str(tmp_path / "cookie"), "http://fake:5678", "u@e.com", "pass")
+    first = FakeN8n()
+    manager, _ = make_manager(monkeypatch, first, cookie_cache=cache)
+    assert manager.connect() is True
+    assert first.logins == 1
+
+    # A new process: cookie comes from disk, validated with one GET, no login POST
+    second = FakeN8n()
+    manager, _ = make_manager(monkeypatch, second, cookie_cache=cache)
+    assert manager.connect() is True
+    assert second.logins == 0
+    assert second.health_probes == 0
+    assert second.calls == [("GET", "http://fake:5678/rest/login")]
+
+def test_connect_logs_in_when_cached_cookie_is_rejected(monkeypatch, tmp_path):
+    cache = CookieCache(str(tmp_path / "cookie"), "http://fake:5678", "u@e.com", "pass")
+    cache.save([{"name": "n8n-auth", "value": "revoked", "domain": "fake.local", "path": "/", "expires": None}])
+    fake = FakeN8n()
+    manager, _ = make_manager(monkeypatch, fake, cookie_cache=cache)
+    assert manager.connect() is True
+    assert fake.logins == 1
+    assert cache.load()[0]["value"] == "secret-cookie"
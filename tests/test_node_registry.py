@@ -0,0 +1,93 @@
+import copy
+import json
+import pytest
+from automation_assistant.node_registry import NODES, NodeRegistry, SPEC_DIR, build_index, thaw
+
+
+def _write_spec(tmp_path, filename, spec):
+    (tmp_path / filename).write_text(json.dumps(spec), encoding="utf-8")
+
+
+def test_index_matches_spec_files():
+    with open(f"{SPEC_DIR}/_index.json", encoding="utf-8") as f:
+        assert json.load(f) == build_index()
+
+
+def test_specs_load_on_demand():
+    registry = NodeRegistry()
+    assert "n8n-nodes-base.cron" in registry.types()
+    assert registry._specs == {}
+    registry.defaults("n8n-nodes-base.cron")
+    assert list(registry._specs) == ["n8n-nodes-base.cron"]
+
+
+def test_alias_resolution():
+    assert NODES.resolve("schedule") == "n8n-nodes-base.cron"
+    assert NODES.resolve("sendEmail") == "n8n-nodes-base.emailSend"
+    assert NODES.resolve("n8n-nodes-base.if") == "n8n-nodes-base.if"
+    assert NODES.resolve("nope") is None
+    assert NODES.defaults("nope") == {}
+    assert NODES.required("nope") == ()
+
+
+def test_defaults_are_frozen_and_shared():
+    defaults = NODES.defaults("gmail")
+    assert defaults is NODES.defaults("n8n-nodes-base.googleGmail")
+    with pytest.raises(TypeError):
+        defaults["resource"] = "thread"
+    with pytest.raises(TypeError):
+        defaults["filters"].update(labelIds=[])
+    assert isinstance(defaults["filters"]["labelIds"], tuple)
+
+
+def test_thaw_and_deepcopy_return_mutable_copies():
+    defaults = NODES.defaults("n8n-nodes-base.googleGmail")
+    for copied in (thaw(defaults), copy.deepcopy(defaults)):
+        assert type(copied) is dict and type(copied["filters"]) is dict
+        copied["filters"]["labelIds"].append("STARRED")
+    assert defaults["filters"]["labelIds"] == ("UNREAD",)
+    assert json.loads(json.dumps(defaults)) == thaw(defaults)
+
+
+def test_version_lookup(tmp_path):
+    _write_spec(tmp_path, "thing.json", {
+        "type": "x.thing", "aliases": ["thing"], "defaultVersion": 2,
+        "versions": {
+            "1": {"parameters": {"a": 1}, "required": ["a"]},
+            "2": {"parameters": {"b": 2}},
+            "4": {"parameters": {"c": 3}},
+        },
+    })
+    registry = NodeRegistry(str(tmp_path))  # no _index.json: scans the directory
+    assert registry.defaults("thing") == {"b": 2}
+    assert registry.defaults("thing", 1) == {"a": 1}
+    assert registry.required("thing", 1) == ("a",)
+    assert registry.defaults("thing", 3) == {"b": 2}
+    assert registry.defaults("thing", 9) == {"c": 3}
+    assert registry.defaults("thing", 0) == {"b": 2}
+    assert registry.get("thing").display_name == "thing"
+
+
+def test_fingerprint_tracks_spec_contents(tmp_path):
+    _write_spec(tmp_path, "thing.json", {"type": "x.thing", "versions": {"1": {"parameters": {"a": 1}}}})
+    before = NodeRegistry(str(tmp_path)).fingerprint()
+    _write_spec(tmp_path, "thing.json", {"type": "x.thing", "versions": {"1": {"parameters": {"a": 2}}}})
+    assert NodeRegistry(str(tmp_path)).fingerprint() != before
+
+
+def test_prompts_compat_views():
+    from automation_assistant import prompts
+    assert prompts.N8N_NODE_TYPES["schedule"] == "n8n-nodes-base.cron"
+    assert prompts.COMPLETE_PARAMS["n8n-nodes-base.emailSend"] == thaw(NODES.defaults("emailSend"))
+    assert prompts.FAKE_CREDENTIALS["n8n-nodes-base.openai"]["openAiApi"]["name"] == "Fake OpenAI Account"
+    assert isinstance(prompts.NODE_PROMPT_NOTES["n8n-nodes-base.if"], str)
+    with pytest.raises(AttributeError):
+        prompts.NOT_A_THING
+
+
+def test_builder_validates_required_params_from_specs():
+    from automation_assistant.workflow_builder import WorkflowBuilder
+    builder = WorkflowBuilder("http://n8n", session=None)
+    nodes = [{"name": "Mail", "type": "n8n-nodes-base.emailSend", "parameters": {"toEmail": "a@b.c"}}]
+    with pytest.raises(ValueError, match=r"Send Email node 'Mail' missing required params: \['fromEmail', 'subject'\]"):
+        builder._validate_nodes(nodes)
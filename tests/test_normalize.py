@@ -0,0 +1,94 @@
+import copy
+import json
+from automation_assistant.node_registry import NODES
+from automation_assistant.normalize import NormalizedPlan, merge_defaults, normalize_plan
+from automation_assistant import workflow_builder
+from automation_assistant.workflow_builder import WorkflowBuilder
+
+
+class DummyResponse:
+    status_code = 200
+
+    def __init__(self, data):
+        self._data = data
+
+    def json(self):
+        return self._data
+
+    def raise_for_status(self):
+        pass
+
+
+class DummySession:
+    def __init__(self):
+        self.last_payload = None
+
+    def post(self, url, json):
+        self.last_payload = json
+        return DummyResponse({"data": {"id": "wf1"}})
+
+
+def raw_plan():
+    return {
+        "nodes": [
+            {"id": "t", "type": "schedule", "parameters": {"cronExpression": "0 9 * * *"}},
+            {"id": "g", "type": "gmail", "parameters": {"filters": {"q": "from:boss"}}},
+            {"id": "e", "type": "sendEmail", "parameters": {"message": "hi", "options": {}}},
+        ],
+        "connections": {},
+    }
+
+
+def test_merge_defaults_is_copy_on_write():
+    defaults = NODES.defaults("n8n-nodes-base.googleGmail")
+    params = {"filters": {"q": "from:boss"}}
+    merged = merge_defaults(defaults, params)
+    assert merged["filters"] == {"labelIds": ("UNREAD",), "includeSpamTrash": False, "q": "from:boss"}
+    assert merged["options"] is defaults["options"]  # untouched subtree is shared
+    assert params == {"filters": {"q": "from:boss"}}
+    assert merge_defaults({}, params) is params
+
+
+def test_normalize_plan_resolves_and_fills():
+    plan = normalize_plan(raw_plan())
+    assert isinstance(plan, NormalizedPlan)
+    trigger, gmail, email = plan["nodes"]
+    assert trigger["type"] == "n8n-nodes-base.cron"
+    assert trigger["name"] == "Schedule Trigger"
+    assert trigger["parameters"]["cronExpression"] == "0 9 * * *"
+    assert trigger["parameters"]["mode"] == "custom"
+    assert "credentials" not in trigger
+    assert gmail["credentials"]["googleApi"]["name"] == "Fake Google Account"
+    assert plan["connections"]["Schedule Trigger"]["main"][0][0]["node"] == "Gmail"
+    # Frozen shared defaults still serialize like plain JSON
+    assert json.loads(json.dumps(plan))["nodes"][1]["parameters"]["filters"]["labelIds"] == ["UNREAD"]
+
+
+def test_normalize_plan_is_idempotent():
+    once = normalize_plan(raw_plan())
+    snapshot = json.loads(json.dumps(once))
+    twice = normalize_plan(copy.deepcopy(once))
+    assert json.loads(json.dumps(twice)) == snapshot
+
+
+def test_builder_does_not_merge_normalized_plans_again(monkeypatch):
+    plan = normalize_plan(raw_plan())
+    calls = []
+    monkeypatch.setattr(workflow_builder, "normalize_plan", lambda p: calls.append(p) or normalize_plan(p))
+    session = DummySession()
+    WorkflowBuilder("http://n8n", session).create_workflow(plan)
+    assert calls == []
+
+    WorkflowBuilder("http://n8n", session).create_workflow(raw_plan())
+    assert len(calls) == 1
+
+
+def test_builder_rewrites_email_params_without_touching_plan():
+    plan = normalize_plan(raw_plan())
+    session = DummySession()
+    WorkflowBuilder("http://n8n", session).create_workflow(plan)
+    sent = {n["name"]: n for n in session.last_payload["nodes"]}
+    assert sent["Send Email"]["parameters"]["text"] == "hi"
+    assert "message" not in sent["Send Email"]["parameters"]
+    assert plan["nodes"][2]["parameters"]["message"] == "hi"
+    assert "credentials" not in sent["Schedule Trigger"]
@@ -0,0 +1,56 @@
+import time
+from automation_assistant.plan_cache import PlanCache, normalize_prompt
+
+PLAN = {"nodes": [{"id": "cron1", "type": "n8n-nodes-base.cron", "parameters": {}}], "connections": {}}
+
+def test_normalize_prompt():
+    assert normalize_prompt("  Every MORNING   summarize my Gmail.  ") == "every morning summarize my gmail"
+
+def test_memory_hit_returns_fresh_copy():
+    cache = PlanCache()
+    cache.put("k", PLAN)
+    first = cache.get("k")
+    first["nodes"].append({"id": "mutated"})
+    assert cache.get("k") == PLAN
+    assert cache.stats["memory_hits"] == 2
+
+def test_miss_and_ttl_expiry():
+    cache = PlanCache(ttl=0.01)
+    assert cache.get("k") is None
+    cache.put("k", PLAN)
+    time.sleep(0.02)
+    assert cache.get("k") is None
+    assert cache.stats["misses"] == 2
+
+def test_memory_lru_eviction():
+    cache = PlanCache(max_memory_entries=2)
+    cache.put("a", PLAN)
+    cache.put("b", PLAN)
+    cache.get("a")
+    cache.put("c", PLAN)
+    assert cache.get("b") is None
+    assert cache.get("a") == PLAN
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "plans.sqlite")
+    PlanCache(path).put("k", PLAN)
+    cache = PlanCache(path)
+    assert cache.get("k") == PLAN
+    assert cache.stats["disk_hits"] == 1
+    # Promoted into memory
+    assert cache.get("k") == PLAN
+    assert cache.stats["memory_hits"] == 1
+
+def test_disk_size_eviction(tmp_path):
+    cache = PlanCache(str(tmp_path / "plans.sqlite"), max_memory_entries=1, max_disk_entries=3)
+    for i in range(10):
+        cache.put(f"k{i}", PLAN)
+    (count,) = cache._db.execute("SELECT COUNT(*) FROM plans").fetchone()
+    assert count <= 3
+    assert cache.get("k9") == PLAN
+
+def test_hits_and_misses_are_exported():
+    from automation_assistant.metrics import CACHE_REQUESTS
+    before = CACHE_REQUESTS.value(cache="plan", result="miss")
+    PlanCache().get("missing")
+    assert CACHE_REQUESTS.value(cache="plan", result="miss") == before + 1
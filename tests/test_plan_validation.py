@@ -0,0 +1,118 @@
+import copy
+import random
+import pytest
+from automation_assistant.guardrails import plan_errors, schema_errors, structural_errors
+from automation_assistant.prompts import COMPLETE_PARAMS
+
+# -------------------- PROPERTY TESTS: fast checker agrees with PLAN_SCHEMA ----------------------
+
+NODE_TYPES = list(COMPLETE_PARAMS) + ["n8n-nodes-base.code", "custom"]
+
+def random_scalar(rng):
+    return rng.choice([None, True, False, 0, 1, 2.5, -3, "", "x", "main"])
+
+def random_json(rng, depth=0):
+    kind = rng.randint(0, 3 if depth < 2 else 1)
+    if kind <= 1:
+        return random_scalar(rng)
+    if kind == 2:
+        return [random_json(rng, depth + 1) for _ in range(rng.randint(0, 3))]
+    return {rng.choice(["a", "id", "type", "node"]): random_json(rng, depth + 1) for _ in range(rng.randint(0, 3))}
+
+def valid_plan(rng):
+    nodes = []
+    for i in range(rng.randint(1, 4)):
+        ntype = rng.choice(NODE_TYPES)
+        node = {"id": f"n{i}", "type": ntype, "parameters": copy.deepcopy(COMPLETE_PARAMS.get(ntype, {}))}
+        nodes.append(node)
+    connections = {}
+    for i in range(len(nodes) - 1):
+        connections[f"n{i}"] = {"main": [[{"node": f"n{i + 1}", "type": "main", "index": 0}]]}
+    return {"nodes": nodes, "connections": connections}
+
+def containers(value, acc):
+    if isinstance(value, dict):
+        acc.append(value)
+        for v in value.values():
+            containers(v, acc)
+    elif isinstance(value, list):
+        acc.append(value)
+        for v in value:
+            containers(v, acc)
+    return acc
+
+def mutate(rng, plan):
+    targets = containers(plan, [])
+    target = rng.choice(targets)
+    op = rng.randint(0, 3)
+    if isinstance(target, dict):
+        if op == 0 and target:
+            del target[rng.choice(list(target))]
+        elif op == 1 and target:
+            target[rng.choice(list(target))] = random_json(rng)
+        elif op == 2:
+            target[rng.choice(["extra", "id", "type", "parameters", "main", "index", "node"])] = random_json(rng)
+        elif target:
+            key = rng.choice(list(target))
+            target[key] = random_scalar(rng)
+    else:
+        if op == 0 and target:
+            target.pop(rng.randrange(len(target)))
+        elif op == 1 and target:
+            target[rng.randrange(len(target))] = random_json(rng)
+        else:
+            target.append(random_json(rng))
+    return plan
+
+@pytest.mark.parametrize("seed", range(5))
+def test_fast_checker_agrees_with_schema(seed):
+    rng = random.Random(seed)
+    disagreements = []
+    valid_seen = invalid_seen = 0
+    for _ in range(1000):
+        plan = valid_plan(rng)
+        for _ in range(rng.randint(0, 3)):
+            plan = mutate(rng, plan)
+        fast = plan_errors(plan, fast=True)
+        slow = plan_errors(plan, fast=False)
+        if bool(fast) != bool(slow):
+            disagreements.append((plan, fast, slow))
+        if fast:
+            invalid_seen += 1
+        else:
+            valid_seen += 1
+    assert disagreements == []
+    # The generator must exercise both outcomes to mean anything
+    assert valid_seen > 50 and invalid_seen > 50
+
+def test_fast_checker_agrees_on_arbitrary_json():
+    rng = random.Random(42)
+    for _ in range(2000):
+        value = random_json(rng)
+        assert bool(structural_errors(value)) == bool(schema_errors(value))
+
+# -------------------- ERROR COLLECTION ----------------------
+
+def test_collects_every_error():
+    plan = {
+        "nodes": [
+            {"type": "n8n-nodes-base.cron", "parameters": {}},
+            {"id": "mail", "type": "n8n-nodes-base.emailSend", "parameters": {"toEmail": "a@b.c"}},
+        ],
+        "connections": {"mail": {"main": [[{"node": "x", "type": "main"}]]}},
+        "extra": 1,
+    }
+    for fast in (True, False):
+        errors = plan_errors(plan, fast=fast)
+        text = "\n".join(errors)
+        assert "extra" in text
+        assert "'id' is a required property" in text
+        assert "missing parameter 'fromEmail'" in text
+        assert "missing parameter 'subject'" in text
+        assert "'index' is a required property" in text
+
+def test_booleans_are_not_numbers():
+    plan = {"nodes": [{"id": "a", "type": "custom"}],
+            "connections": {"a": {"main": [[{"node": "b", "type": "main", "index": True}]]}}}
+    assert plan_errors(plan, fast=True)
+    assert plan_errors(plan, fast=False)
@@ -0,0 +1,85 @@
+import json
+import pytest
+from automation_assistant.llm_parser import LLMParser
+from automation_assistant.prompt_builder import (
+    build_system_prompt, classify_node_types, node_fragment, system_prompt_for, NODE_ORDER
+)
+from automation_assistant.prompts import LLM_SYSTEM_PROMPT, SYSTEM_PROMPT_PREFIX, VALIDATE_EMAILS_CODE
+
+@pytest.fixture(autouse=True)
+def set_openai_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test-1234567")
+
+GMAIL_PROMPT = "Every Monday at 10:00 AM, send me a summary of unread Gmail emails."
+
+class RecordingClient:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        message = type("msg", (), {"content": self.reply})
+        return type("R", (), {"choices": [type("choice", (), {"message": message})()]})()
+
+def short_types(prompt):
+    return sorted(t.split(".")[-1] for t in classify_node_types(prompt))
+
+def test_classifier_selects_node_types():
+    assert short_types(GMAIL_PROMPT) == ["aggregate", "code", "cron", "emailSend", "googleGmail", "openai"]
+    assert short_types("Every hour check https://example.com/api and email me if it is down") == [
+        "cron", "emailSend", "httpRequest", "if"
+    ]
+
+def test_unrecognized_prompt_gets_every_node_type():
+    assert classify_node_types("Do the thing") == frozenset(NODE_ORDER)
+
+def test_prompts_share_prefix_and_are_deterministic():
+    a = system_prompt_for(GMAIL_PROMPT)
+    b = system_prompt_for("Every hour check https://example.com/api and email me if it is down")
+    assert a.startswith(SYSTEM_PROMPT_PREFIX) and b.startswith(SYSTEM_PROMPT_PREFIX)
+    # Same node set, same (cached) string whatever the input order
+    assert build_system_prompt(reversed(NODE_ORDER)) is build_system_prompt(NODE_ORDER)
+    # Fragments follow NODE_ORDER
+    assert a.index("n8n-nodes-base.cron\n") < a.index("n8n-nodes-base.googleGmail\n") < a.index("n8n-nodes-base.emailSend\n")
+
+def test_assembled_prompt_is_smaller():
+    assert len(system_prompt_for(GMAIL_PROMPT)) < 0.6 * len(LLM_SYSTEM_PROMPT)
+    assert len(build_system_prompt(NODE_ORDER)) < 0.8 * len(LLM_SYSTEM_PROMPT)
+
+def test_parser_sends_assembled_prompt():
+    reply = json.dumps({"nodes": [{"id": "v", "name": "Validate Emails", "type": "n8n-nodes-base.code"}]})
+    parser = LLMParser(dynamic_prompt=True)
+    parser.client = RecordingClient(reply)
+    plan = parser.parse(GMAIL_PROMPT)
+    assert parser.client.calls[0]["messages"][0]["content"] == system_prompt_for(GMAIL_PROMPT)
+    # Guardrail code is no longer in the prompt, so the parser fills it in
+    assert plan["nodes"][0]["parameters"]["functionCode"] == VALIDATE_EMAILS_CODE
+
+def test_static_prompt_can_be_kept(monkeypatch):
+    monkeypatch.setenv("DYNAMIC_SYSTEM_PROMPT", "off")
+    parser = LLMParser()
+    parser.client = RecordingClient(json.dumps({"nodes": [{"id": "a", "type": "n8n-nodes-base.cron"}]}))
+    parser.parse(GMAIL_PROMPT)
+    assert parser.client.calls[0]["messages"][0]["content"] == LLM_SYSTEM_PROMPT
+    assert parser.cache_key(GMAIL_PROMPT) != LLMParser(dynamic_prompt=True).cache_key(GMAIL_PROMPT)
+
+def test_cache_key_reuses_context_fingerprint(monkeypatch):
+    from automation_assistant import llm_parser
+    parser = LLMParser(dynamic_prompt=True)
+    first = parser.cache_key(GMAIL_PROMPT)
+    hashed = []
+    real = llm_parser.fingerprint
+    monkeypatch.setattr(llm_parser, "fingerprint", lambda *parts: hashed.append(parts) or real(*parts))
+    assert parser.cache_key(GMAIL_PROMPT) == first
+    # Only the per-prompt key is hashed; prefix, keywords and specs are not serialized again
+    assert len(hashed) == 1
+
+def test_large_defaults_keep_their_nested_shape():
+    fragment = node_fragment("n8n-nodes-base.openai")
+    params = json.loads(fragment.split("parameters: ", 1)[1])
+    # Nested keys survive; only the long message text is elided
+    assert params["messagesUi"] == {"messageValues": [{"role": "system", "content": "<string>"}]}
+    assert params["options"]["maxTokens"] == 1000
+    assert "summarizes emails" not in fragment
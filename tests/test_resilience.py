@@ -0,0 +1,170 @@
+import asyncio
+import openai
+import pytest
+import requests
+from automation_assistant import resilience
+from automation_assistant.llm_parser import LLMParser
+from automation_assistant.metrics import CIRCUIT_OPEN, OUTBOUND_CALLS
+from automation_assistant.resilience import (
+    Backoff, CircuitBreaker, CircuitOpenError, Endpoint, RetryPolicy, is_unavailable, retry_after,
+)
+
+
+class DummyResponse:
+    def __init__(self, status_code=200, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(resilience.time, "sleep", recorded.append)
+    return recorded
+
+
+def scripted(*outcomes):
+    """
+    fn() that returns or raises the given outcomes in turn
+    """
+    calls = []
+
+    def fn():
+        outcome = outcomes[len(calls)]
+        calls.append(outcome)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+    fn.calls = calls
+    return fn
+
+
+def test_backoff_is_jittered_and_capped():
+    backoff = Backoff(base=1, max_delay=4)
+    delays = [backoff.next() for _ in range(5)]
+    for delay, cap in zip(delays, (1, 2, 4, 4, 4)):
+        assert cap / 2 <= delay <= cap
+
+
+def test_retries_honour_retry_after(sleeps):
+    endpoint = Endpoint("test.retry_after", RetryPolicy(max_attempts=3, base_delay=0.01))
+    fn = scripted(DummyResponse(429, {"Retry-After": "2"}), DummyResponse(503), DummyResponse(200))
+    assert endpoint.call(fn).status_code == 200
+    assert sleeps[0] == 2 and sleeps[1] <= 0.02
+    assert OUTBOUND_CALLS.value(endpoint="test.retry_after", outcome="retry") == 2
+
+
+def test_last_response_is_returned_when_attempts_run_out(sleeps):
+    endpoint = Endpoint("test.exhausted", RetryPolicy(max_attempts=2, base_delay=0.01))
+    fn = scripted(DummyResponse(502), DummyResponse(502))
+    assert endpoint.call(fn).status_code == 502
+    assert len(fn.calls) == 2
+
+
+def test_deadline_stops_retries(sleeps):
+    endpoint = Endpoint("test.deadline", RetryPolicy(max_attempts=5, deadline=1))
+    fn = scripted(DummyResponse(503, {"Retry-After": "30"}))
+    assert endpoint.call(fn).status_code == 503
+    assert sleeps == []
+
+
+def test_non_idempotent_calls_only_retry_rejections(sleeps):
+    endpoint = Endpoint("test.post", RetryPolicy(base_delay=0.01))
+    assert endpoint.call(scripted(DummyResponse(500)), idempotent=False).status_code == 500
+    fn = scripted(DummyResponse(503), DummyResponse(201))
+    assert endpoint.call(fn, idempotent=False).status_code == 201
+    with pytest.raises(requests.ReadTimeout):
+        endpoint.call(scripted(requests.ReadTimeout("sent, no answer")), idempotent=False)
+
+
+def test_transient_errors_are_retried_then_raised(sleeps):
+    endpoint = Endpoint("test.errors", RetryPolicy(max_attempts=3, base_delay=0.01))
+    fn = scripted(*[requests.ConnectionError("refused")] * 3)
+    with pytest.raises(requests.ConnectionError) as e:
+        endpoint.call(fn)
+    assert len(fn.calls) == 3 and is_unavailable(e.value)
+    with pytest.raises(ValueError):
+        endpoint.call(scripted(ValueError("bug")))
+    assert not is_unavailable(ValueError("bug"))
+
+
+def test_circuit_opens_and_recovers(monkeypatch, sleeps):
+    clock = [0.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: clock[0])
+    breaker = CircuitBreaker("test.breaker", failure_threshold=2, reset_timeout=10)
+    endpoint = Endpoint("test.breaker", RetryPolicy(max_attempts=1), breaker)
+    for _ in range(2):
+        endpoint.call(scripted(DummyResponse(500)))
+    assert CIRCUIT_OPEN.value(endpoint="test.breaker") == 1
+
+    fn = scripted(DummyResponse(200), DummyResponse(200))
+    with pytest.raises(CircuitOpenError):
+        endpoint.call(fn)
+    assert fn.calls == []
+
+    clock[0] = 10  # half-open: one probe goes through and closes the circuit
+    assert endpoint.call(fn).status_code == 200
+    assert not breaker.is_open and CIRCUIT_OPEN.value(endpoint="test.breaker") == 0
+
+
+def test_failed_probe_without_status_settles_the_circuit(monkeypatch, sleeps):
+    clock = [0.0]
+    monkeypatch.setattr(resilience.time, "monotonic", lambda: clock[0])
+    breaker = CircuitBreaker("test.probe", failure_threshold=1, reset_timeout=10)
+    endpoint = Endpoint("test.probe", RetryPolicy(max_attempts=1), breaker)
+    endpoint.call(scripted(DummyResponse(500)))
+
+    clock[0] = 10  # the probe fails without an HTTP status: the circuit opens again
+    with pytest.raises(requests.exceptions.ChunkedEncodingError):
+        endpoint.call(scripted(requests.exceptions.ChunkedEncodingError("truncated")))
+    with pytest.raises(CircuitOpenError):
+        endpoint.call(lambda: "ok")
+
+    clock[0] = 20  # a probe interrupted before finishing lets the next call probe
+    with pytest.raises(KeyboardInterrupt):
+        endpoint.call(scripted(KeyboardInterrupt()))
+    assert endpoint.call(lambda: "ok") == "ok"
+    assert not breaker.is_open
+
+
+def test_retry_after_http_date():
+    assert retry_after({"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"}) == 0
+    assert retry_after({"Retry-After": "soon"}) is None
+    assert retry_after(None) is None
+
+
+def test_async_call(monkeypatch):
+    slept = []
+
+    async def fake_sleep(seconds):
+        slept.append(seconds)
+    monkeypatch.setattr(resilience.asyncio, "sleep", fake_sleep)
+    endpoint = Endpoint("test.async", RetryPolicy(base_delay=0.01))
+    outcomes = iter([DummyResponse(503), DummyResponse(200)])
+
+    async def fn():
+        return next(outcomes)
+    assert asyncio.run(endpoint.acall(fn)).status_code == 200
+    assert len(slept) == 1
+
+
+def test_llm_outage_is_raised_not_replaced_by_fallback(monkeypatch, sleeps):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    class ConnectionDown(openai.APIConnectionError):
+        def __init__(self):
+            Exception.__init__(self, "Connection error.")
+
+    class DownClient:
+        def __init__(self):
+            self.calls = 0
+            self.chat = type("Chat", (), {"completions": self})()
+
+        def create(self, **kwargs):
+            self.calls += 1
+            raise ConnectionDown()
+
+    parser = LLMParser()
+    parser.client = DownClient()
+    with pytest.raises(openai.APIConnectionError):
+        parser.parse("Summarize my emails and post to Slack daily")
+    assert parser.client.calls == parser.endpoint.policy.max_attempts
@@ -0,0 +1,162 @@
+import json
+import numpy as np
+import pytest
+from automation_assistant.llm_parser import LLMParser
+from automation_assistant.pipeline import WorkflowPipeline
+from automation_assistant.retrieval import ExampleRetriever, WorkflowIndex, embed
+
+@pytest.fixture(autouse=True)
+def set_openai_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test-1234567")
+
+def plan_for(name):
+    return {"nodes": [{"id": name, "type": "n8n-nodes-base.cron", "parameters": {}}], "connections": {}}
+
+class RecordingClient:
+    def __init__(self, reply):
+        self.reply = reply
+        self.calls = []
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        message = type("msg", (), {"content": self.reply})
+        return type("R", (), {"choices": [type("choice", (), {"message": message})()]})()
+
+def test_embedding_is_normalized_and_stable():
+    a = embed("Send me a daily summary of unread Gmail emails")
+    assert a.dtype == np.float32
+    assert np.linalg.norm(a) == pytest.approx(1.0, abs=1e-5)
+    assert np.array_equal(a, embed("send me a daily summary of unread gmail emails."))
+    assert not embed("").any()
+
+def test_search_ranks_similar_prompts_first():
+    index = WorkflowIndex()
+    index.add("Send me a daily summary of unread Gmail emails", plan_for("gmail"))
+    index.add("Fetch the weather API every hour and post it to Slack", plan_for("weather"))
+    index.add("Create a Trello card for every new GitHub issue", plan_for("trello"))
+
+    results = index.search("Every day, email me a summary of my unread Gmail", k=2)
+    assert [r.plan["nodes"][0]["id"] for r in results][0] == "gmail"
+    assert results[0].score > results[1].score
+    # Hits are copies
+    results[0].plan["nodes"].clear()
+    assert index.search("daily summary of unread Gmail emails", k=1)[0].plan["nodes"]
+
+def test_index_replaces_same_prompt_and_evicts_oldest():
+    index = WorkflowIndex(max_entries=2)
+    index.add("prompt one", plan_for("a"))
+    index.add("Prompt one.", plan_for("b"))
+    assert len(index) == 1
+    assert index.search("prompt one", k=1)[0].plan["nodes"][0]["id"] == "b"
+    index.add("prompt two", plan_for("c"))
+    index.add("prompt three", plan_for("d"))
+    assert len(index) == 2
+    assert {r.prompt for r in index.search("prompt", k=5)} == {"prompt two", "prompt three"}
+
+def test_index_reuses_rows_and_grows_by_doubling():
+    index = WorkflowIndex(dim=64, max_entries=40)
+    for i in range(100):
+        index.add(f"workflow number {i} for team {i % 7}", plan_for(str(i)))
+    assert len(index) == 40
+    # Evicted rows are reused instead of growing the matrix
+    assert len(index._matrix) == 64 and len(index._prompts) == 41
+    assert index.get("workflow number 99 for team 1")["nodes"][0]["id"] == "99"
+    assert index.get("workflow number 10 for team 3") is None
+    hits = index.search("workflow number 75 for team 5", k=3)
+    assert hits[0].plan["nodes"][0]["id"] == "75"
+    assert all(int(h.plan["nodes"][0]["id"]) >= 60 for h in hits)
+
+def test_index_persists(tmp_path):
+    path = str(tmp_path / "workflows.sqlite")
+    WorkflowIndex(path).add("Daily Gmail digest", plan_for("gmail"))
+    reloaded = WorkflowIndex(path)
+    assert len(reloaded) == 1
+    assert reloaded.search("daily gmail digest", k=1)[0].score == pytest.approx(1.0, abs=1e-5)
+
+def test_parser_injects_few_shot_examples():
+    retriever = ExampleRetriever(WorkflowIndex())
+    retriever.remember("Send me a daily summary of unread Gmail emails", plan_for("gmail"))
+    parser = LLMParser(retriever=retriever)
+    parser.client = RecordingClient(json.dumps(plan_for("new")))
+
+    parser.parse("Send me a weekly summary of starred Gmail emails")
+    messages = parser.client.calls[0]["messages"]
+    assert messages[0]["role"] == "system"
+    assert messages[1] == {"role": "user",
+                           "content": "Create an n8n workflow for: Send me a daily summary of unread Gmail emails"}
+    assert json.loads(messages[2]["content"]) == plan_for("gmail")
+    assert messages[-1]["content"].endswith("weekly summary of starred Gmail emails")
+
+def test_parser_reuses_only_the_same_prompt():
+    retriever = ExampleRetriever(WorkflowIndex())
+    retriever.remember("Send me a daily summary of unread Gmail emails", plan_for("gmail"))
+    parser = LLMParser(retriever=retriever)
+    parser.client = RecordingClient("{}")
+
+    plan = parser.parse("send me a daily summary of unread gmail emails!")
+    assert [node["id"] for node in plan["nodes"]] == ["gmail"]
+    assert parser.client.calls == []
+
+def test_examples_are_stored_compact():
+    retriever = ExampleRetriever(WorkflowIndex())
+    parser = LLMParser(retriever=retriever)
+    parser.client = RecordingClient(json.dumps({"nodes": [
+        {"id": "t", "name": "Schedule", "type": "n8n-nodes-base.cron", "parameters": {}},
+        {"id": "g", "name": "Fetch Mail", "type": "n8n-nodes-base.googleGmail", "parameters": {"filters": {"q": "x"}}},
+    ], "connections": {"Schedule": ["Fetch Mail"]}}))
+    prompt = "Fetch my Gmail every morning"
+    full = parser.parse(prompt)
+    assert full["nodes"][1]["credentials"] and full["nodes"][1]["position"]
+    parser.remember_success(prompt, full)
+
+    (stored,) = [n.plan for n in retriever.index.search(prompt, k=1)]
+    for node in stored["nodes"]:
+        assert "position" not in node and "credentials" not in node
+    assert stored["nodes"][1]["parameters"] == {"filters": {"q": "x"}}
+    assert len(json.dumps(stored)) < len(json.dumps(full)) / 2
+    # An exact hit is normalized again, so the builder still gets a complete plan
+    parser.client = RecordingClient("{}")
+    assert parser.parse(prompt) == full
+
+def test_similar_prompt_with_different_meaning_calls_llm():
+    retriever = ExampleRetriever(WorkflowIndex())
+    stored = ("Every weekday at 9am fetch all Stripe invoices over 100 EUR from the last day "
+              "and email a summary table to finance@example.com")
+    retriever.remember(stored, plan_for("stripe"))
+    parser = LLMParser(retriever=retriever)
+    parser.client = RecordingClient(json.dumps(plan_for("new")))
+
+    changed = stored.replace("over 100", "over 500")
+    assert retriever.index.search(changed, k=1)[0].score > 0.9
+    parser.parse(changed)
+    assert len(parser.client.calls) == 1
+    # The similar workflow is still offered as an example
+    assert parser.client.calls[0]["messages"][1]["content"].endswith(stored)
+
+class DummyValidator:
+    def validate_input(self, prompt):
+        return True
+
+    def moderate_prompt(self, prompt, key):
+        return True
+
+    def validate_plan(self, plan):
+        return True
+
+class MutatingBuilder:
+    def create_workflow(self, plan):
+        plan["nodes"][0]["parameters"]["filled"] = True
+        return {"id": "wf1"}
+
+def test_pipeline_remembers_successful_plans():
+    retriever = ExampleRetriever(WorkflowIndex())
+    parser = LLMParser(retriever=retriever)
+    parser.client = RecordingClient(json.dumps(plan_for("cron")))
+    pipeline = WorkflowPipeline(parser, DummyValidator(), MutatingBuilder(), "sk")
+
+    pipeline.run("Trigger something every Monday")
+    (neighbor,) = retriever.index.search("Trigger something every Monday", k=1)
+    assert neighbor.plan["nodes"][0]["id"] == "cron"
+    # Stored as the parser produced it, before the builder filled parameters
+    assert "filled" not in neighbor.plan["nodes"][0]["parameters"]
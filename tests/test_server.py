@@ -0,0 +1,133 @@
+import threading
+import pytest
+from automation_assistant import tracing
+from automation_assistant.pipeline import PipelineError
+from automation_assistant.usage import current_tenant
+from automation_assistant import server
+from automation_assistant.server import WorkflowService, ServiceBusy, create_app
+
+class DummyPipeline:
+    def __init__(self, error=None):
+        self.error = error
+        self.prompts = []
+
+    def run(self, prompt, metrics=None):
+        self.prompts.append(prompt)
+        if self.error:
+            raise self.error
+        metrics.start("llm_generation")
+        metrics.stop("llm_generation")
+        return {"id": "wf1", "name": "AI Generated Workflow 1234"}
+
+def make_client(pipeline, tenants=(), **kwargs):
+    service = WorkflowService(pipeline, **kwargs)
+    return create_app(service, tenants).test_client()
+
+def test_post_workflow_success():
+    pipeline = DummyPipeline()
+    client = make_client(pipeline)
+    resp = client.post("/workflows", json={"prompt": "Send me a daily digest"})
+    assert resp.status_code == 201
+    body = resp.get_json()
+    assert body["id"] == "wf1"
+    assert "llm_generation" in body["latency"]
+    assert pipeline.prompts == ["Send me a daily digest"]
+
+def test_request_id_is_propagated_to_pipeline():
+    seen = []
+
+    class RecordingPipeline(DummyPipeline):
+        def run(self, prompt, metrics=None):
+            seen.append(tracing.current_request_id())
+            return super().run(prompt, metrics)
+
+    client = make_client(RecordingPipeline())
+    resp = client.post("/workflows", json={"prompt": "Daily digest"}, headers={"X-Request-ID": "req-1"})
+    assert resp.headers["X-Request-ID"] == "req-1"
+    assert resp.get_json()["request_id"] == "req-1"
+    assert seen == ["req-1"]
+
+def test_post_workflow_missing_prompt():
+    client = make_client(DummyPipeline())
+    resp = client.post("/workflows", json={})
+    assert resp.status_code == 400
+
+def test_post_workflow_rejected_prompt():
+    client = make_client(DummyPipeline(PipelineError("moderation", "flagged")))
+    resp = client.post("/workflows", json={"prompt": "bad"})
+    assert resp.status_code == 422
+    assert resp.get_json()["stage"] == "moderation"
+
+def test_post_workflow_creation_failure():
+    client = make_client(DummyPipeline(PipelineError("workflow_creation", "n8n down")))
+    resp = client.post("/workflows", json={"prompt": "ok"})
+    assert resp.status_code == 502
+
+def test_post_workflow_budget_exhausted():
+    tenants = []
+
+    class BudgetPipeline(DummyPipeline):
+        def run(self, prompt, metrics=None):
+            tenants.append(current_tenant())
+            raise PipelineError("budget", "LLM budget exhausted for tenant 'acme'")
+
+    client = make_client(BudgetPipeline(), tenants={"acme"})
+    resp = client.post("/workflows", json={"prompt": "ok"}, headers={"X-Tenant-ID": "acme"})
+    assert resp.status_code == 429
+    assert tenants == ["acme"]
+
+def test_unknown_tenants_share_the_default_tenant():
+    tenants = []
+
+    class TenantPipeline(DummyPipeline):
+        def run(self, prompt, metrics=None):
+            tenants.append(current_tenant())
+            return super().run(prompt, metrics)
+
+    client = make_client(TenantPipeline(), tenants={"acme"})
+    for header in ("acme", "fresh-budget-1", "fresh-budget-2"):
+        client.post("/workflows", json={"prompt": "ok"}, headers={"X-Tenant-ID": header})
+    client.post("/workflows", json={"prompt": "ok"})
+    assert tenants == ["acme", "default", "default", "default"]
+
+def test_service_rejects_when_pool_is_full():
+    release = threading.Event()
+
+    class BlockingPipeline:
+        def run(self, prompt, metrics=None):
+            release.wait(5)
+            return {"id": "wf"}
+
+    service = WorkflowService(BlockingPipeline(), max_workers=1, max_pending=0)
+    first = service.submit("one")
+    with pytest.raises(ServiceBusy):
+        service.submit("two")
+    release.set()
+    assert first.result(timeout=5)["id"] == "wf"
+    # Slot is released once the first prompt completes
+    assert service.submit("three").result(timeout=5)["id"] == "wf"
+    service.shutdown()
+
+def test_patch_workflow_runs_edit_mode():
+    edits = []
+
+    class EditPipeline(DummyPipeline):
+        def modify(self, workflow_id, instruction, metrics=None):
+            edits.append((workflow_id, instruction))
+            return {"id": workflow_id, "name": "Digest"}
+
+    pipeline = EditPipeline()
+    client = make_client(pipeline)
+    resp = client.patch("/workflows/wf9", json={"prompt": "Send it at 9am instead"})
+    assert resp.status_code == 200
+    assert resp.get_json()["id"] == "wf9"
+    assert edits == [("wf9", "Send it at 9am instead")]
+    assert pipeline.prompts == []
+
+def test_serve_uses_waitress_with_bounded_threads(monkeypatch):
+    calls = []
+    fake = type("waitress", (), {"serve": staticmethod(lambda app, **kwargs: calls.append(kwargs))})
+    monkeypatch.setattr(server, "waitress", fake)
+    app = create_app(WorkflowService(DummyPipeline()))
+    server.serve(app, "127.0.0.1", 8000, threads=12)
+    assert calls == [{"host": "127.0.0.1", "port": 8000, "threads": 12}]
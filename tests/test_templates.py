@@ -0,0 +1,101 @@
+import pytest
+from automation_assistant.guardrails import SafetyValidator
+from automation_assistant.llm_parser import LLMParser
+from automation_assistant.metrics import TEMPLATE_REQUESTS
+from automation_assistant.templates import TemplateEngine, WorkflowTemplate, parse_schedule
+
+@pytest.fixture(autouse=True)
+def set_openai_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test-1234567")
+
+class FailingClient:
+    def __init__(self):
+        self.chat = type("Chat", (), {"completions": self})()
+        self.calls = 0
+
+    def create(self, **kwargs):
+        self.calls += 1
+        raise AssertionError("LLM should not be called")
+
+@pytest.mark.parametrize("text,cron", [
+    ("Every Monday at 10:00 AM", "0 10 * * 1"),
+    ("daily at 18:30", "30 18 * * *"),
+    ("every day at 6pm", "0 18 * * *"),
+    ("weekdays at 9am", "0 9 * * 1-5"),
+    ("on Mondays and Fridays at 8:15 am", "15 8 * * 1,5"),
+    ("hourly", "0 * * * *"),
+    ("every week", "0 10 * * 1"),
+    ("monthly at noon", "0 12 1 * *"),
+])
+def test_parse_schedule(text, cron):
+    assert parse_schedule(text)["cronExpression"] == cron
+
+def test_parse_schedule_timezone_and_missing():
+    assert parse_schedule("daily at 7am Europe/Berlin")["timezone"] == "Europe/Berlin"
+    assert parse_schedule("summarize my inbox") is None
+
+def test_template_fills_slots():
+    engine = TemplateEngine()
+    plan = engine.plan_for(
+        'Every day at 6pm send a digest of important emails to a@b.com, c@d.org with subject "Inbox digest"'
+    )
+    nodes = {n["name"]: n for n in plan["nodes"]}
+    assert [n["type"].split(".")[-1] for n in plan["nodes"]] == [
+        "cron", "googleGmail", "code", "aggregate", "openai", "emailSend"
+    ]
+    assert nodes["Schedule Trigger"]["parameters"]["cronExpression"] == "0 18 * * *"
+    assert nodes["Get Emails"]["parameters"]["filters"]["labelIds"] == ["IMPORTANT"]
+    assert nodes["Send Summary"]["parameters"]["toEmail"] == "a@b.com, c@d.org"
+    assert nodes["Send Summary"]["parameters"]["subject"] == "Inbox digest"
+    assert plan["connections"]["Aggregate Emails"]["main"][0][0]["node"] == "Summarize Emails"
+
+def test_template_does_not_mutate_defaults():
+    from automation_assistant.prompts import COMPLETE_PARAMS
+    TemplateEngine().plan_for("Daily digest of starred emails to x@y.com")
+    assert COMPLETE_PARAMS["n8n-nodes-base.emailSend"]["toEmail"] == "user@example.com"
+    assert COMPLETE_PARAMS["n8n-nodes-base.googleGmail"]["filters"]["labelIds"] == ["UNREAD"]
+
+@pytest.mark.parametrize("prompt", [
+    "Summarize my emails and post the summary to Slack every day",
+    "When a new email arrives, forward it to my boss",
+    "Fetch https://example.com every hour and email me if it is down",
+])
+def test_low_confidence_prompts_go_to_llm(prompt):
+    assert TemplateEngine().plan_for(prompt) is None
+
+def test_parser_skips_llm_on_template_hit():
+    parser = LLMParser(templates=TemplateEngine())
+    parser.client = FailingClient()
+    before = TEMPLATE_REQUESTS.value(template="email_digest", result="hit")
+
+    plan = parser.parse("Every Monday at 10:00 AM, send me a summary of unread Gmail emails.")
+    assert parser.client.calls == 0
+    assert TEMPLATE_REQUESTS.value(template="email_digest", result="hit") == before + 1
+    assert parser.templates.stats["hits"] == 1
+    # Enhanced like LLM output and valid for the post-moderation check
+    assert plan["nodes"][1]["credentials"]["googleApi"]["name"] == "Fake Google Account"
+    assert SafetyValidator().validate_plan(plan)
+
+def test_parser_falls_back_to_llm_on_low_confidence():
+    parser = LLMParser(templates=TemplateEngine())
+    parser.client = FailingClient()
+    plan = parser.parse("Summarize my emails and post to Slack daily")
+    # FailingClient raised, so the LLM was tried
+    assert parser.client.calls == 1
+    assert plan.get("fallback") is True
+    assert parser.templates.stats["low_confidence"] == 1
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("TEMPLATE_FAST_PATH", "off")
+    assert TemplateEngine.from_env() is None
+    monkeypatch.setenv("TEMPLATE_FAST_PATH", "on")
+    monkeypatch.setenv("TEMPLATE_MIN_CONFIDENCE", "0.95")
+    assert TemplateEngine.from_env().min_confidence == 0.95
+
+def test_template_subclasses_must_implement_score_and_build():
+    class Partial(WorkflowTemplate):
+        def score(self, prompt):
+            return 0.0, {}
+
+    with pytest.raises(TypeError):
+        Partial()
@@ -0,0 +1,126 @@
+import asyncio
+import json
+import pytest
+from automation_assistant import tracing
+from automation_assistant.tracing import Tracer, OTLPJsonFileExporter
+from automation_assistant.pipeline import WorkflowPipeline, PipelineError
+from automation_assistant.workflow_builder import WorkflowBuilder
+
+@pytest.fixture
+def trace_file(tmp_path, monkeypatch):
+    path = tmp_path / "traces.jsonl"
+    monkeypatch.setattr(tracing, "TRACER", Tracer(OTLPJsonFileExporter(str(path))))
+    return path
+
+def read_spans(path):
+    spans = []
+    for line in path.read_text().splitlines():
+        payload = json.loads(line)
+        for resource in payload["resourceSpans"]:
+            for scope in resource["scopeSpans"]:
+                spans.extend(scope["spans"])
+    return spans
+
+def attrs(span):
+    return {a["key"]: list(a["value"].values())[0] for a in span["attributes"]}
+
+def test_nested_spans_are_exported_as_one_trace(trace_file):
+    with tracing.span("root") as root:
+        with tracing.span("child", {"plan.node_count": 3}):
+            tracing.set_attribute("cache.hit", True)
+    assert len(trace_file.read_text().splitlines()) == 1
+
+    spans = {s["name"]: s for s in read_spans(trace_file)}
+    assert spans["child"]["parentSpanId"] == spans["root"]["spanId"]
+    assert spans["child"]["traceId"] == spans["root"]["traceId"] == root.trace_id
+    assert attrs(spans["child"]) == {"plan.node_count": "3", "cache.hit": True}
+    assert "request.id" in attrs(spans["root"])
+    assert int(spans["root"]["endTimeUnixNano"]) >= int(spans["child"]["endTimeUnixNano"])
+
+def test_error_sets_span_status(trace_file):
+    with pytest.raises(ValueError):
+        with tracing.span("root"):
+            raise ValueError("boom")
+    (span,) = read_spans(trace_file)
+    assert span["status"] == {"code": tracing.STATUS_ERROR, "message": "ValueError: boom"}
+
+def test_request_id_is_propagated(trace_file):
+    with tracing.request_context("req-42"):
+        with tracing.span("root"):
+            assert tracing.current_request_id() == "req-42"
+    assert tracing.current_request_id() is None
+    (span,) = read_spans(trace_file)
+    assert attrs(span)["request.id"] == "req-42"
+
+def test_spans_follow_asyncio_tasks(trace_file):
+    async def work(name):
+        with tracing.span(name):
+            await asyncio.sleep(0.01)
+
+    async def main():
+        with tracing.span("root"):
+            await asyncio.gather(work("a"), work("b"))
+
+    asyncio.run(main())
+    spans = {s["name"]: s for s in read_spans(trace_file)}
+    assert spans["a"]["parentSpanId"] == spans["b"]["parentSpanId"] == spans["root"]["spanId"]
+
+def test_no_exporter_keeps_nothing():
+    tracer = Tracer()
+    with tracer.span("root"):
+        with tracer.span("child"):
+            pass
+    assert tracer._pending == {}
+
+class DummyResponse:
+    status_code = 200
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return {"data": {"id": "wf1", "name": "WF"}}
+
+class DummySession:
+    def post(self, url, json):
+        return DummyResponse()
+
+class DummyParser:
+    def parse(self, prompt):
+        return {
+            "nodes": [{"id": "cron1", "type": "n8n-nodes-base.cron",
+                       "parameters": {"mode": "custom", "cronExpression": "0 10 * * 1", "timezone": "UTC"}}],
+            "connections": {}
+        }
+
+class DummyValidator:
+    def validate_input(self, prompt):
+        return prompt != "bad"
+
+    def moderate_prompt(self, prompt, key):
+        return True
+
+    def validate_plan(self, plan):
+        return True
+
+def test_pipeline_stages_are_traced(trace_file):
+    builder = WorkflowBuilder("http://n8n", DummySession())
+    pipeline = WorkflowPipeline(DummyParser(), DummyValidator(), builder, "sk")
+    pipeline.run("Send me a report")
+
+    spans = {s["name"]: s for s in read_spans(trace_file)}
+    root = spans["workflow.run"]
+    for stage in ("pre_validation", "moderation", "llm_generation", "post_validation", "workflow_creation"):
+        assert spans[f"pipeline.{stage}"]["parentSpanId"] == root["spanId"]
+    assert spans["builder.create_workflow"]["parentSpanId"] == spans["pipeline.workflow_creation"]["spanId"]
+    assert attrs(spans["builder.build_nodes"])["workflow.node_count"] == "1"
+    assert attrs(spans["n8n.create_workflow"])["workflow.id"] == "wf1"
+    assert spans["n8n.create_workflow"]["kind"] == tracing.KIND_CLIENT
+
+def test_failed_stage_is_marked(trace_file):
+    pipeline = WorkflowPipeline(DummyParser(), DummyValidator(), None, "sk")
+    with pytest.raises(PipelineError):
+        pipeline.run("bad")
+    spans = {s["name"]: s for s in read_spans(trace_file)}
+    assert spans["pipeline.pre_validation"]["status"]["code"] == tracing.STATUS_ERROR
+    assert "pipeline.moderation" not in spans
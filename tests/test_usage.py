@@ -0,0 +1,171 @@
+import asyncio
+import json
+import pytest
+from automation_assistant.llm_parser import LLMParser
+from automation_assistant.metrics import LLM_COST, LLM_TOKENS
+from automation_assistant.pipeline import WorkflowPipeline, PipelineError
+from automation_assistant.usage import (
+    BudgetExceededError, BudgetManager, allowed_tenants_from_env, collect_usage, cost_usd, record_usage,
+    summarize, tenant_context,
+)
+
+@pytest.fixture(autouse=True)
+def set_openai_key(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test-1234567")
+
+PLAN = {"nodes": [{"id": "cron1", "type": "n8n-nodes-base.cron", "parameters": {}}], "connections": {}}
+
+class Usage:
+    def __init__(self, prompt_tokens, completion_tokens):
+        self.prompt_tokens = prompt_tokens
+        self.completion_tokens = completion_tokens
+
+class DummyResponse:
+    def __init__(self, content, usage):
+        self.choices = [type("choice", (), {"message": type("msg", (), {"content": content})})()]
+        self.usage = usage
+
+class DummyClient:
+    def __init__(self, usage=None):
+        self.usage = usage or Usage(2000, 300)
+        self.calls = []
+        self.chat = type("Chat", (), {"completions": self})()
+
+    def create(self, **kwargs):
+        self.calls.append(kwargs)
+        return DummyResponse(json.dumps(PLAN), self.usage)
+
+def test_cost_uses_model_pricing():
+    assert cost_usd("gpt-4o-mini", 1_000_000, 0) == pytest.approx(0.15)
+    assert cost_usd("gpt-4o-mini", 0, 1_000_000) == pytest.approx(0.60)
+    # Dated snapshots are priced like their base model
+    assert cost_usd("gpt-4o-mini-2024-07-18", 1_000_000, 0) == pytest.approx(0.15)
+    assert cost_usd("some-local-model", 1000, 1000) == 0
+
+def test_record_usage_updates_metrics_and_collector():
+    before = LLM_TOKENS.value(model="gpt-4o-mini", kind="prompt")
+    with tenant_context("acme"), collect_usage() as calls:
+        record_usage("gpt-4o-mini", Usage(100, 50))
+        record_usage("gpt-4o-mini", Usage(10, 5))
+    assert LLM_TOKENS.value(model="gpt-4o-mini", kind="prompt") == before + 110
+    assert LLM_COST.value(model="gpt-4o-mini", tenant="acme") > 0
+    summary = summarize(calls)
+    assert summary["calls"] == 2
+    assert summary["prompt_tokens"] == 110 and summary["completion_tokens"] == 55
+    assert calls[0].tenant == "acme"
+
+def test_budget_downshifts_then_rejects():
+    # $0.001 pays for ~1666 completion tokens at gpt-4o-mini prices
+    budget = BudgetManager({"acme": 0.001}, min_max_tokens=256)
+    reservation = budget.reserve("acme", "gpt-4o-mini", 0, 3000)
+    assert 256 <= reservation.max_tokens < 3000
+    reservation.release()
+
+    budget.reserve("acme", "gpt-4o-mini", 0, 100).commit(None)
+    spent = budget.reserve("acme", "gpt-4o-mini", 0, 100)
+    spent.commit(record_usage("gpt-4o-mini", Usage(0, 1600)))
+    with pytest.raises(BudgetExceededError):
+        budget.reserve("acme", "gpt-4o-mini", 0, 3000)
+    # Other tenants have no limit configured
+    assert budget.reserve("other", "gpt-4o-mini", 0, 3000).max_tokens == 3000
+
+def test_reservations_count_against_budget():
+    budget = BudgetManager(default_limit=0.002, min_max_tokens=1000)
+    first = budget.reserve("t", "gpt-4o-mini", 0, 3000)
+    assert first.max_tokens == 3000
+    with pytest.raises(BudgetExceededError):
+        budget.reserve("t", "gpt-4o-mini", 0, 3000)
+    first.commit(record_usage("gpt-4o-mini", Usage(0, 100)))
+    assert budget.spent("t") == pytest.approx(0.00006)
+    assert budget.reserve("t", "gpt-4o-mini", 0, 3000).max_tokens == 3000
+
+def test_budget_from_env(monkeypatch):
+    monkeypatch.delenv("LLM_BUDGET_USD", raising=False)
+    monkeypatch.delenv("LLM_TENANT_BUDGETS", raising=False)
+    assert BudgetManager.from_env() is None
+    monkeypatch.setenv("LLM_TENANT_BUDGETS", "acme=5, beta=0.5")
+    budget = BudgetManager.from_env()
+    assert budget.limit("acme") == 5 and budget.limit("beta") == 0.5
+    assert budget.limit("other") is None
+    monkeypatch.setenv("SERVER_TENANTS", "gamma, ")
+    assert allowed_tenants_from_env() == {"acme", "beta", "gamma"}
+
+def test_parser_downshifts_max_tokens_for_tenant():
+    parser = LLMParser(budget=BudgetManager({"acme": 0.0015}))
+    parser.client = DummyClient()
+    with tenant_context("acme"):
+        parser.parse("Send me a daily digest")
+    assert parser.client.calls[0]["max_tokens"] < 3000
+    assert parser.budget.spent("acme") == pytest.approx(cost_usd("gpt-4o-mini", 2000, 300))
+
+def test_parser_rejects_exhausted_budget_without_calling_llm():
+    parser = LLMParser(budget=BudgetManager({"acme": 0.0}))
+    parser.client = DummyClient()
+    with tenant_context("acme"), pytest.raises(BudgetExceededError):
+        parser.parse("Send me a daily digest")
+    assert parser.client.calls == []
+
+def test_aborted_stream_is_charged_the_reservation():
+    class AbortedStream:
+        def __iter__(self):
+            delta = type("delta", (), {"content": "Sorry, I cannot help with that." * 20})
+            yield type("chunk", (), {"usage": None, "choices": [type("choice", (), {"delta": delta})()]})()
+
+        def close(self):
+            pass
+
+    parser = LLMParser(budget=BudgetManager({"acme": 1.0}))
+    parser.client = DummyClient()
+    parser.client.create = lambda **kwargs: AbortedStream()
+    with tenant_context("acme"):
+        assert parser.parse_stream("Send me a daily digest").get("fallback") is True
+    # No usage chunk arrived, so the worst case reserved up front is what it cost
+    assert parser.budget.spent("acme") >= cost_usd("gpt-4o-mini", 0, 3000)
+
+def test_cancelled_generation_is_charged_the_reservation():
+    class SlowCompletions:
+        async def create(self, **kwargs):
+            await asyncio.sleep(5)
+
+    parser = LLMParser(budget=BudgetManager({"acme": 1.0}))
+    parser.async_client = type("Client", (), {"chat": type("Chat", (), {"completions": SlowCompletions()})()})()
+
+    async def cancel_speculative_parse():
+        task = asyncio.ensure_future(parser.aparse("Send me a daily digest"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    with tenant_context("acme"):
+        asyncio.run(cancel_speculative_parse())
+    assert parser.budget.spent("acme") >= cost_usd("gpt-4o-mini", 0, 3000)
+    assert parser.budget.remaining("acme") == pytest.approx(1.0 - parser.budget.spent("acme"))
+
+class DummyValidator:
+    def validate_input(self, prompt):
+        return True
+
+    def moderate_prompt(self, prompt, key):
+        return True
+
+    def validate_plan(self, plan):
+        return True
+
+class DummyBuilder:
+    def create_workflow(self, plan):
+        return {"id": "wf1", "name": "WF"}
+
+def test_pipeline_attaches_usage_and_maps_budget_errors():
+    parser = LLMParser(budget=BudgetManager({"broke": 0.0}))
+    parser.client = DummyClient(Usage(1000, 200))
+    pipeline = WorkflowPipeline(parser, DummyValidator(), DummyBuilder(), "sk")
+
+    result = pipeline.run("Send me a daily digest")
+    assert result["llm_usage"]["calls"] == 1
+    assert result["llm_usage"]["prompt_tokens"] == 1000
+    assert result["llm_usage"]["cost_usd"] == pytest.approx(cost_usd("gpt-4o-mini", 1000, 200))
+
+    with tenant_context("broke"), pytest.raises(PipelineError) as exc:
+        pipeline.run("Send me another digest")
+    assert exc.value.stage == "budget"
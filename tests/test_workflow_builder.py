@@ -54,3 +54,31 @@ def test_create_workflow_api_error(monkeypatch):
     }
     with pytest.raises(Exception):
         builder.create_workflow(plan)
+
+
+def test_built_nodes_own_their_parameters_and_credentials():
+    """
+    Built nodes get mutable copies; editing one never touches the node registry.
+    """
+    from automation_assistant.node_registry import NODES, thaw
+    session = DummySession()
+    builder = WorkflowBuilder(n8n_url="http://fake:5678", session=session)
+    plan = {
+        "nodes": [
+            {"id": "cron1", "type": "n8n-nodes-base.cron"},
+            {"id": "gmail1", "type": "n8n-nodes-base.googleGmail"},
+        ],
+        "connections": {"cron1": ["gmail1"]},
+    }
+    defaults = thaw(NODES.defaults("n8n-nodes-base.googleGmail"))
+    credentials = thaw(NODES.credentials("n8n-nodes-base.googleGmail"))
+    builder.create_workflow(plan)
+    gmail = next(n for n in session.last_payload["nodes"] if n["id"] == "gmail1")
+    for key, value in gmail["parameters"].items():
+        if isinstance(value, dict):
+            value["edited"] = True
+    gmail["parameters"]["edited"] = True
+    for value in gmail["credentials"].values():
+        value["id"] = "other"
+    assert thaw(NODES.defaults("n8n-nodes-base.googleGmail")) == defaults
+    assert thaw(NODES.credentials("n8n-nodes-base.googleGmail")) == credentials
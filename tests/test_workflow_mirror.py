@@ -0,0 +1,118 @@
+import pytest
+import requests
+from automation_assistant.workflow_mirror import WorkflowMirror, iter_workflows
+
+
+class DummyResponse:
+    def __init__(self, data=None, status_code=200, etag=None, count=None):
+        self.status_code = status_code
+        self.headers = {"ETag": etag} if etag else {}
+        self._body = {"data": data or []}
+        if count is not None:
+            self._body["count"] = count
+
+    def raise_for_status(self):
+        if not (200 <= self.status_code < 300):
+            raise requests.HTTPError(f"Status code: {self.status_code}")
+
+    def json(self):
+        return self._body
+
+
+class PagingSession:
+    """
+    /rest/workflows with skip/take and a per-page ETag derived from its contents
+    """
+    def __init__(self, workflows, send_count=False):
+        self.workflows = workflows
+        self.send_count = send_count
+        self.requests = []
+
+    def get(self, url, headers=None):
+        query = dict(part.split("=") for part in url.split("?")[1].split("&"))
+        skip, take = int(query["skip"]), int(query["take"])
+        page = self.workflows[skip:skip + take]
+        etag = '"%x"' % hash(tuple((w["id"], w["updatedAt"]) for w in page))
+        self.requests.append((skip, (headers or {}).get("If-None-Match")))
+        if headers and headers.get("If-None-Match") == etag:
+            return DummyResponse(status_code=304)
+        return DummyResponse(page, etag=etag, count=len(self.workflows) if self.send_count else None)
+
+
+def workflows(n, version="1"):
+    return [{"id": str(i), "name": f"Workflow {i}", "active": i % 2 == 0, "updatedAt": version}
+            for i in range(n)]
+
+
+def test_iter_workflows_pages_until_short_page():
+    session = PagingSession(workflows(25))
+    assert [w["id"] for w in iter_workflows(session, "http://n8n", page_size=10)] == [str(i) for i in range(25)]
+    assert [skip for skip, _ in session.requests] == [0, 10, 20]
+
+    session = PagingSession(workflows(20), send_count=True)
+    assert len(list(iter_workflows(session, "http://n8n", page_size=10))) == 20
+    assert len(session.requests) == 2  # count says we're done, no empty trailing page
+
+
+class UnpagedSession:
+    """
+    An n8n that ignores skip/take: every request returns the same listing, without a count
+    """
+    def __init__(self, workflows):
+        self.workflows = workflows
+        self.requests = 0
+
+    def get(self, url, headers=None):
+        self.requests += 1
+        return DummyResponse(self.workflows[:self.take] if hasattr(self, "take") else self.workflows)
+
+
+def test_paging_stops_when_server_ignores_it():
+    session = UnpagedSession(workflows(150))
+    assert len(list(iter_workflows(session, "http://n8n", page_size=100))) == 150
+    assert session.requests == 1
+
+    # Honours take but not skip: the repeated page ends paging, and sync keeps rows it didn't see
+    session.take = 10
+    assert len(list(iter_workflows(session, "http://n8n", page_size=10))) == 10
+    assert session.requests == 3
+    mirror = WorkflowMirror(page_size=10)
+    mirror.upsert({"id": "999", "name": "Beyond the first page"})
+    assert mirror.sync(session, "http://n8n")["deleted"] == 0
+    assert len(mirror) == 11
+
+
+def test_mirror_sync_is_incremental(tmp_path):
+    session = PagingSession(workflows(25))
+    mirror = WorkflowMirror(str(tmp_path / "mirror.sqlite"), page_size=10)
+    assert mirror.sync(session, "http://n8n") == {"pages": 3, "not_modified": 0, "upserted": 25, "deleted": 0}
+
+    # Nothing changed: every page is answered 304
+    assert mirror.sync(session, "http://n8n") == {"pages": 3, "not_modified": 3, "upserted": 0, "deleted": 0}
+
+    session.workflows[12] = dict(session.workflows[12], name="Renamed", updatedAt="2")
+    del session.workflows[24]
+    stats = WorkflowMirror(str(tmp_path / "mirror.sqlite"), page_size=10).sync(session, "http://n8n")
+    assert stats == {"pages": 3, "not_modified": 1, "upserted": 1, "deleted": 1}  # pages 10 and 20 changed
+    assert len(mirror) == 24
+    assert mirror.get("12")["name"] == "Renamed"
+    assert mirror.get("24") is None
+
+
+def test_mirror_list_and_search():
+    mirror = WorkflowMirror(page_size=10)
+    mirror.sync(PagingSession(workflows(12)), "http://n8n")
+    assert [w["id"] for w in mirror.search("workflow 1")] == ["1", "10", "11"]
+    assert mirror.search("100%") == []
+    assert len(mirror.list(active=True)) == 6
+    mirror.upsert({"id": "99", "name": "Just created", "active": False})
+    assert mirror.search("just")[0]["id"] == "99"
+
+
+def test_sync_propagates_http_errors():
+    class BrokenSession:
+        def get(self, url, headers=None):
+            return DummyResponse(status_code=500)
+
+    with pytest.raises(requests.HTTPError):
+        WorkflowMirror().sync(BrokenSession(), "http://n8n")